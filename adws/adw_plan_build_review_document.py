@@ -9,52 +9,114 @@ ADW Plan + Build + Review + Document Workflow
 Orquesta las fases completas de SDLC para issues de GitHub.
 
 Uso: uv run adw_plan_build_review_document.py <issue-number> [adw-id]
+     uv run adw_plan_build_review_document.py resume <adw-id>
 
 Flujo de trabajo:
 1. Obtener issue desde GitHub
 2. Clasificar tipo de issue (/feature, /bug, o /chore)
-3. Generar nombre de rama
-4. Crear y cambiar a la rama
-5. Generar plan (basado en el tipo de issue)
-6. Implementar plan
-7. Revisar implementación contra especificación (con screenshots)
-8. Generar documentación (usando screenshots de revisión)
-9. Hacer commit de cambios (código + documentación)
-10. Crear pull request con revisión y documentación
+3. Generar nombre de rama y crear la rama (en el worktree aislado trees/{adw-id}),
+   en paralelo con la clasificación
+4. Generar plan (basado en el tipo de issue)
+5. Implementar plan
+6. Revisar implementación contra especificación (con screenshots)
+7. Generar documentación (usando screenshots de revisión), en paralelo con el
+   commit local de los screenshots
+8. Hacer commit de cambios (código + documentación) y un único push
+9. Crear pull request con revisión y documentación
+
+Las fases se ejecutan como un grafo de dependencias (ver pipeline.py); el reporte
+de camino crítico queda en agents/{adw-id}/pipeline_report.json. Los outputs de
+cada fase completada se guardan en agents/{adw-id}/journal.jsonl; `resume` retoma
+la ejecución desde la primera fase incompleta sobre la rama existente.
+
+Al recibir SIGTERM (cancelación desde la cola de jobs) se terminan los procesos
+de Claude en curso, se dejan de programar fases y el journal registra la
+ejecución como cancelada, de modo que puede reanudarse más tarde.
 
 Ejemplo:
     uv run adws/adw_plan_build_review_document.py 123
     uv run adws/adw_plan_build_review_document.py 123 abc1234
+    uv run adws/adw_plan_build_review_document.py resume abc1234
 """
 
 import sys
 import os
 import json
 import re
-import subprocess
+import signal
+import threading
+import time
 from pathlib import Path
+from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 
 # Agregar directorio adws al path para imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from utils import make_adw_id, setup_logger
-from agent import execute_template
+from utils import make_adw_id, setup_logger, get_run_root, get_project_root
+from agent import execute_template, cancel_agents
+from worktree import USE_WORKTREES, create_worktree, checkout_branch, switch_branch
 from github import (
     get_issue_details,
-    post_comment,
     commit_screenshots_to_repo,
-    post_pr_comment_with_screenshots
+    build_pr_screenshot_comment,
+    parse_pr_url,
+    wait_for_pr_for_branch,
+    StatusBoard,
+    STATUS_MODE
 )
-from data_types import AgentTemplateRequest, WorkflowResult
+from outbox import Outbox
+from pipeline import Phase, Pipeline, PipelineReport, PhaseAborted, PipelineCancelled
+from journal import RunJournal, JournalState
+from metrics import record_phase
+from run_logging import set_phase
+from screenshots import load_manifest, screenshot_captions
+from spec_index import SpecIndex, written_plan, written_doc
+from git_ops import push_branch, get_git_stats
+from local_classifier import LOCAL_CLASSIFIER_ENABLED, classify_issue_locally, generate_branch_name_locally
+from data_types import AgentTemplateRequest
 
 load_dotenv()
 
+# Fases del workflow tal como se muestran en el comentario de estado
+WORKFLOW_PHASES = [
+    ("issue", "Fetch issue"),
+    ("classify", "Classify issue"),
+    ("branch", "Create branch"),
+    ("plan", "Plan"),
+    ("implement", "Implement"),
+    ("review", "Review"),
+    ("document", "Document"),
+    ("screenshots", "Screenshots"),
+    ("commit", "Commit"),
+    ("push", "Push"),
+    ("pull_request", "Pull request"),
+]
+
+# Claves de contexto disponibles para todas las fases desde el inicio
+WORKFLOW_CONTEXT_KEYS = ["issue_number", "adw_id", "run_root", "logger", "outbox", "board"]
+
+# Máximo de fases independientes ejecutándose a la vez
+PIPELINE_MAX_WORKERS = int(os.getenv("ADW_PIPELINE_MAX_WORKERS", "2"))
+
+# Se activa al recibir SIGTERM; el pipeline deja de programar fases
+CANCEL_EVENT = threading.Event()
+
+
+def handle_cancel_signal(signum, frame) -> None:
+    """Cancelar la ejecución: detener el pipeline y terminar los procesos de Claude."""
+    if CANCEL_EVENT.is_set():
+        return
+    CANCEL_EVENT.set()
+    # Terminar los procesos fuera del handler para no bloquear el hilo principal
+    threading.Thread(target=cancel_agents, name="adw-cancel", daemon=True).start()
+
 
 def main():
     """Ejecución principal del flujo de trabajo."""
-    if len(sys.argv) < 2:
+    if len(sys.argv) < 2 or (sys.argv[1] == "resume" and len(sys.argv) < 3):
         print("Usage: uv run adw_plan_build_review_document.py <issue-number> [adw-id]")
+        print("       uv run adw_plan_build_review_document.py resume <adw-id>")
         print("\nExecutes complete SDLC workflow:")
         print("  1. Classify issue")
         print("  2. Generate branch name")
@@ -64,478 +126,844 @@ def main():
         print("  6. Generate documentation")
         print("  7. Commit changes")
         print("  8. Create PR")
+        print("\n'resume' restarts a previous run from its first incomplete phase.")
         sys.exit(1)
 
-    issue_number = int(sys.argv[1])
-    adw_id = sys.argv[2] if len(sys.argv) > 2 else make_adw_id()
+    resume_state = None
+    if sys.argv[1] == "resume":
+        adw_id = sys.argv[2]
+        resume_state = RunJournal(adw_id).load()
+        if resume_state is None:
+            print(f"No journal found for ADW ID {adw_id}; nothing to resume")
+            sys.exit(1)
+        if resume_state.finished == "success":
+            print(f"ADW ID {adw_id} already completed successfully; nothing to resume")
+            return
+        issue_number = resume_state.issue_number
+    else:
+        issue_number = int(sys.argv[1])
+        adw_id = sys.argv[2] if len(sys.argv) > 2 else make_adw_id()
+
+    # Crear worktree aislado para esta ejecución antes de escribir logs
+    worktree_error = None
+    if USE_WORKTREES:
+        try:
+            create_worktree(adw_id)
+        except RuntimeError as e:
+            worktree_error = e
+    run_root = get_run_root(adw_id)
+
+    signal.signal(signal.SIGTERM, handle_cancel_signal)
 
     # Configurar logging
     logger = setup_logger(adw_id, "adw_plan_build_review_document")
-    logger.info(f"Starting ADW Plan + Build + Review + Document workflow for issue #{issue_number}")
+    logger.info(f"{'Resuming' if resume_state else 'Starting'} ADW Plan + Build + Review + Document workflow for issue #{issue_number}")
     logger.info(f"ADW ID: {adw_id}")
+    logger.info(f"Working directory: {run_root}")
 
-    try:
-        # Paso 1: Obtener detalles del issue
-        logger.info("Step 1: Fetching issue details from GitHub")
-        issue = get_issue_details(issue_number)
-        logger.info(f"Issue title: {issue['title']}")
-
-        # Publicar comentario inicial
-        post_comment(
-            issue_number,
-            f"🤖 **ADW Workflow Started** (ID: `{adw_id}`)\n\nStarting complete SDLC workflow (plan → build → review → document → PR)..."
-        )
+    # Los comentarios se encolan en el outbox y se envían en segundo plano
+    outbox = Outbox(adw_id)
+    outbox.start()
 
-        # Paso 2: Clasificar issue
-        logger.info("Step 2: Classifying issue type")
-        # Pasar número, título y cuerpo del issue al clasificador
-        issue_title = issue['title']
-        issue_body = issue['body']
-        classify_result = execute_template(AgentTemplateRequest(
-            slash_command="/classify_issue",
-            args=[str(issue_number), issue_title, issue_body],
-            adw_id=adw_id,
-            agent_name="classifier",
-            model="sonnet"
-        ))
-
-        if not classify_result.success:
-            raise RuntimeError(f"Classification failed: {classify_result.output}")
-
-        # Extraer solo el comando de la salida (buscar /feature, /bug, /chore, o 0)
-        issue_type_raw = classify_result.output.strip()
-        issue_type = None
-        for line in issue_type_raw.split('\n'):
-            line = line.strip().strip('`')
-            if line in ['/feature', '/bug', '/chore', '0']:
-                issue_type = line
-                break
-
-        if not issue_type:
-            # Fallback: buscar cualquier línea que empiece con /
-            for line in issue_type_raw.split('\n'):
-                line = line.strip().strip('`')
-                if line.startswith('/'):
-                    issue_type = line
-                    break
-
-        if not issue_type:
-            issue_type = issue_type_raw.strip().strip('`')
-
-        logger.info(f"Issue classified as: {issue_type}")
-
-        if issue_type == "0":
-            logger.warning("Issue could not be classified")
-            post_comment(
+    try:
+        if worktree_error:
+            logger.error(f"Could not create worktree: {worktree_error}")
+            outbox.post_comment(
                 issue_number,
-                f"⚠️ **Classification Failed** (ADW ID: `{adw_id}`)\n\nCould not automatically classify this issue. Please add more details or manually label it."
+                f"❌ **Workflow Failed** (ADW ID: `{adw_id}`)\n\nError: Could not create worktree: {worktree_error}"
             )
             sys.exit(1)
 
-        post_comment(
+        # En modo board el progreso se reporta en un único comentario editado en el lugar
+        board = StatusBoard(
             issue_number,
-            f"🔍 **Step 2: Issue Classified** (ADW ID: `{adw_id}`)\n\nIssue type: `{issue_type}`\n\nGenerating branch name..."
+            adw_id,
+            WORKFLOW_PHASES,
+            sink=outbox.post_status if STATUS_MODE == "board" else None
         )
-
-        # Paso 3: Generar nombre de rama
-        logger.info("Step 3: Generating branch name")
-        branch_result = execute_template(AgentTemplateRequest(
-            slash_command="/generate_branch_name",
-            args=[str(issue_number), issue['title']],
-            adw_id=adw_id,
-            agent_name="branch_generator",
-            model="haiku"
-        ))
-
-        if not branch_result.success:
-            raise RuntimeError(f"Branch name generation failed: {branch_result.output}")
-
-        # Extraer solo el nombre de rama (última línea no vacía, o línea con patrón de rama)
-        branch_name_raw = branch_result.output.strip()
-        branch_name = None
-        for line in reversed(branch_name_raw.split('\n')):
-            line = line.strip().strip('`')
-            if line and '-' in line and not line.startswith('Based on'):
-                branch_name = line
-                break
-
-        if not branch_name:
-            branch_name = branch_name_raw.split('\n')[-1].strip().strip('`')
-
-        logger.info(f"Branch name: {branch_name}")
-
-        # Crear y cambiar a la nueva rama
-        logger.info(f"Creating and switching to branch: {branch_name}")
-        subprocess.run(
-            ["git", "checkout", "-b", branch_name],
-            cwd=str(Path(__file__).parent.parent),
-            check=True,
-            capture_output=True
+        try:
+            run_workflow(issue_number, adw_id, run_root, logger, outbox, board, resume_state)
+        finally:
+            board.flush()
+    finally:
+        # Dar tiempo a que se entreguen los comentarios; lo pendiente queda persistido
+        outbox.close()
+
+
+def _post_step(ctx: Dict[str, Any], comment: str) -> None:
+    """Publicar un comentario de paso (solo si no se usa el comentario de estado)."""
+    if not ctx["board"].enabled:
+        ctx["outbox"].post_comment(ctx["issue_number"], comment)
+
+
+def _check_cancelled() -> None:
+    """Detener la fase sin reportar el fallo si el workflow fue cancelado."""
+    if CANCEL_EVENT.is_set():
+        raise PipelineCancelled("Workflow cancelled")
+
+
+def phase_issue(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Obtener los detalles del issue desde GitHub."""
+    logger, board = ctx["logger"], ctx["board"]
+    issue_number, adw_id = ctx["issue_number"], ctx["adw_id"]
+
+    logger.info("Step 1: Fetching issue details from GitHub")
+    issue = get_issue_details(issue_number)
+    logger.info(f"Issue title: {issue['title']}")
+    board.complete_phase("issue", f"#{issue_number}")
+
+    # Publicar comentario inicial (el board ya crea su propio comentario)
+    if board.enabled:
+        board.flush()
+    else:
+        ctx["outbox"].post_comment(
+            issue_number,
+            f"🤖 **ADW Workflow Started** (ID: `{adw_id}`)\n\nStarting complete SDLC workflow (plan → build → review → document → PR)..."
         )
-        logger.info(f"Switched to new branch: {branch_name}")
+    return {"issue": issue}
+
+
+def _classify_with_agent(issue_number: int, adw_id: str, issue: Dict[str, Any]) -> str:
+    """Clasificar el issue con /classify_issue y extraer el comando de la salida."""
+    # Pasar número, título y cuerpo del issue al clasificador
+    classify_result = execute_template(AgentTemplateRequest(
+        slash_command="/classify_issue",
+        args=[str(issue_number), issue['title'], issue['body']],
+        adw_id=adw_id,
+        agent_name="classifier",
+        model="sonnet"
+    ))
+
+    if not classify_result.success:
+        raise RuntimeError(f"Classification failed: {classify_result.output}")
+
+    # Extraer solo el comando de la salida (buscar /feature, /bug, /chore, o 0)
+    issue_type_raw = classify_result.output.strip()
+    for line in issue_type_raw.split('\n'):
+        line = line.strip().strip('`')
+        if line in ['/feature', '/bug', '/chore', '0']:
+            return line
+
+    # Fallback: buscar cualquier línea que empiece con /
+    for line in issue_type_raw.split('\n'):
+        line = line.strip().strip('`')
+        if line.startswith('/'):
+            return line
+
+    return issue_type_raw.strip().strip('`')
+
+
+def phase_classify(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Clasificar el issue como /feature, /bug o /chore."""
+    logger, board = ctx["logger"], ctx["board"]
+    issue_number, adw_id, issue = ctx["issue_number"], ctx["adw_id"], ctx["issue"]
+
+    logger.info("Step 2: Classifying issue type")
+    local = classify_issue_locally(issue) if LOCAL_CLASSIFIER_ENABLED else None
+    if local and local.confident:
+        # Ruta rápida: el título, las etiquetas o las palabras clave alcanzan
+        issue_type = local.command
+        logger.info(f"Issue classified locally as: {issue_type} ({local.reason})")
+    else:
+        if local:
+            logger.info(f"Local classification not confident ({local.reason}), asking the agent")
+        issue_type = _classify_with_agent(issue_number, adw_id, issue)
+        logger.info(f"Issue classified as: {issue_type}")
 
-        post_comment(
+    if issue_type == "0":
+        _check_cancelled()
+        logger.warning("Issue could not be classified")
+        board.fail_phase("classify", "Could not classify issue")
+        ctx["outbox"].post_comment(
             issue_number,
-            f"🌿 **Step 3: Branch Created** (ADW ID: `{adw_id}`)\n\nBranch `{branch_name}` created and active.\n\nCreating implementation plan..."
+            f"⚠️ **Classification Failed** (ADW ID: `{adw_id}`)\n\nCould not automatically classify this issue. Please add more details or manually label it."
+        )
+        raise PhaseAborted("Issue could not be classified")
+
+    board.complete_phase("classify", f"`{issue_type}`")
+    _post_step(ctx, f"🔍 **Step 2: Issue Classified** (ADW ID: `{adw_id}`)\n\nIssue type: `{issue_type}`")
+    return {"issue_type": issue_type}
+
+
+def _generate_branch_name_with_agent(issue_number: int, adw_id: str, issue: Dict[str, Any]) -> str:
+    """Generar el nombre de rama con /generate_branch_name y extraerlo de la salida."""
+    branch_result = execute_template(AgentTemplateRequest(
+        slash_command="/generate_branch_name",
+        args=[str(issue_number), issue['title']],
+        adw_id=adw_id,
+        agent_name="branch_generator",
+        model="haiku"
+    ))
+
+    if not branch_result.success:
+        raise RuntimeError(f"Branch name generation failed: {branch_result.output}")
+
+    # Extraer solo el nombre de rama (última línea no vacía, o línea con patrón de rama)
+    branch_name_raw = branch_result.output.strip()
+    for line in reversed(branch_name_raw.split('\n')):
+        line = line.strip().strip('`')
+        if line and '-' in line and not line.startswith('Based on'):
+            return line
+
+    return branch_name_raw.split('\n')[-1].strip().strip('`')
+
+
+def phase_branch(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Generar el nombre de rama y crearla en el worktree de la ejecución."""
+    logger, board = ctx["logger"], ctx["board"]
+    issue_number, adw_id, issue = ctx["issue_number"], ctx["adw_id"], ctx["issue"]
+
+    logger.info("Step 3: Generating branch name")
+    branch_name = None
+    if LOCAL_CLASSIFIER_ENABLED:
+        # Corre en paralelo con la clasificación: el prefijo sale de las reglas locales
+        local = classify_issue_locally(issue)
+        branch_name = generate_branch_name_locally(
+            issue_number, issue['title'], adw_id, local.command if local.confident else None
         )
+    if branch_name:
+        logger.info(f"Branch name generated locally: {branch_name}")
+    else:
+        branch_name = _generate_branch_name_with_agent(issue_number, adw_id, issue)
+        logger.info(f"Branch name: {branch_name}")
 
-        # Paso 4: Crear plan
-        logger.info(f"Step 4: Creating plan using {issue_type}")
-        plan_result = execute_template(AgentTemplateRequest(
-            slash_command=issue_type,
-            args=[str(issue_number)],
-            adw_id=adw_id,
-            agent_name="planner",
-            model="sonnet"
-        ))
-
-        if not plan_result.success:
-            raise RuntimeError(f"Planning failed: {plan_result.output}")
-
-        logger.info("Plan created successfully")
-
-        # Extraer ruta del archivo de plan desde la salida
-        plan_file = None
-        for line in plan_result.output.split('\n'):
-            if 'specs/' in line and '.md' in line:
-                parts = line.split('specs/')
-                if len(parts) > 1:
-                    plan_file = f"specs/{parts[1].split()[0].rstrip('`').rstrip('.')}"
-                    break
+    # Crear y cambiar a la nueva rama dentro del worktree de la ejecución
+    logger.info(f"Creating and switching to branch: {branch_name}")
+    checkout_branch(ctx["run_root"], branch_name)
+    logger.info(f"Switched to new branch: {branch_name}")
+
+    board.complete_phase("branch", f"`{branch_name}`")
+    _post_step(ctx, f"🌿 **Step 3: Branch Created** (ADW ID: `{adw_id}`)\n\nBranch `{branch_name}` created and active.")
+    return {"branch_name": branch_name}
+
+
+def phase_plan(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Generar el plan de implementación según el tipo de issue."""
+    logger, board = ctx["logger"], ctx["board"]
+    issue_number, adw_id, run_root = ctx["issue_number"], ctx["adw_id"], ctx["run_root"]
+    issue_type = ctx["issue_type"]
+
+    logger.info(f"Step 4: Creating plan using {issue_type}")
+    issue = ctx["issue"]
+    plan_result = execute_template(AgentTemplateRequest(
+        slash_command=issue_type,
+        args=[str(issue_number)],
+        adw_id=adw_id,
+        agent_name="planner",
+        model="sonnet",
+        # El planificador lee el issue por su número: la caché debe invalidarse si cambia
+        cache_context=json.dumps({"title": issue["title"], "body": issue["body"]}, sort_keys=True)
+    ))
+
+    if not plan_result.success:
+        raise RuntimeError(f"Planning failed: {plan_result.output}")
+
+    logger.info("Plan created successfully")
+
+    # Extraer ruta del archivo de plan desde la salida
+    plan_file = None
+    for line in plan_result.output.split('\n'):
+        if 'specs/' in line and '.md' in line:
+            parts = line.split('specs/')
+            if len(parts) > 1:
+                plan_file = f"specs/{parts[1].split()[0].rstrip('`').rstrip('.')}"
+                break
 
+    spec_index = ctx["spec_index"]
+    if not plan_file:
+        # La spec que el planificador escribió para este issue (número exacto)
+        # o, si no dejó cambios, la última registrada en el índice
+        plan_file = written_plan(run_root, issue_number)
         if not plan_file:
-            project_root = Path(__file__).parent.parent
-            specs_dir = project_root / "specs"
-            if specs_dir.exists():
-                plan_files = list(specs_dir.glob(f"*{issue_number}*.md"))
-                if plan_files:
-                    plan_file = str(plan_files[0].relative_to(project_root))
-
-        if plan_file:
-            logger.info(f"Plan file: {plan_file}")
-        else:
-            logger.warning("Could not determine plan file path")
-            plan_file = f"specs/{issue_type.strip('/')}-{issue_number}-plan.md"
-
-        post_comment(
+            indexed = spec_index.plan_for_issue(issue_number)
+            if indexed and (run_root / indexed).is_file():
+                plan_file = indexed
+
+    if plan_file:
+        logger.info(f"Plan file: {plan_file}")
+        if (run_root / plan_file).is_file():
+            spec_index.record_plan(issue_number, adw_id, plan_file)
+    else:
+        logger.warning("Could not determine plan file path")
+        plan_file = f"specs/{issue_type.strip('/')}-{issue_number}-plan.md"
+
+    board.complete_phase("plan", f"`{plan_file}`")
+    _post_step(ctx, f"📋 **Step 4: Plan Created** (ADW ID: `{adw_id}`)\n\nImplementation plan: `{plan_file}`\n\nStarting implementation...")
+    return {"plan_file": plan_file}
+
+
+def phase_implement(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Implementar el plan."""
+    logger, board = ctx["logger"], ctx["board"]
+    issue_number, adw_id = ctx["issue_number"], ctx["adw_id"]
+
+    logger.info("Step 5: Implementing plan")
+    implement_result = execute_template(AgentTemplateRequest(
+        slash_command="/implement",
+        args=[ctx["plan_file"]],
+        adw_id=adw_id,
+        agent_name="implementor",
+        model="opus"
+    ))
+
+    if not implement_result.success:
+        _check_cancelled()
+        logger.error(f"Implementation failed: {implement_result.output}")
+        board.fail_phase("implement", "Implementation encountered errors")
+        ctx["outbox"].post_comment(
             issue_number,
-            f"📋 **Step 4: Plan Created** (ADW ID: `{adw_id}`)\n\nImplementation plan: `{plan_file}`\n\nStarting implementation..."
+            f"❌ **Implementation Failed** (ADW ID: `{adw_id}`)\n\nImplementation encountered errors. Check logs for details."
         )
+        raise PhaseAborted("Implementation failed")
 
-        # Paso 5: Implementar plan
-        logger.info("Step 5: Implementing plan")
-        implement_result = execute_template(AgentTemplateRequest(
-            slash_command="/implement",
-            args=[plan_file],
-            adw_id=adw_id,
-            agent_name="implementor",
-            model="opus"
-        ))
-
-        if not implement_result.success:
-            logger.error(f"Implementation failed: {implement_result.output}")
-            post_comment(
-                issue_number,
-                f"❌ **Implementation Failed** (ADW ID: `{adw_id}`)\n\nImplementation encountered errors. Check logs for details."
-            )
-            sys.exit(1)
+    logger.info("Implementation completed successfully")
 
-        logger.info("Implementation completed successfully")
+    board.complete_phase("implement")
+    _post_step(ctx, f"⚙️ **Step 5: Implementation Complete** (ADW ID: `{adw_id}`)\n\nCode implemented successfully. Starting review against spec...")
+    return {"implemented": True}
 
-        post_comment(
-            issue_number,
-            f"⚙️ **Step 5: Implementation Complete** (ADW ID: `{adw_id}`)\n\nCode implemented successfully. Starting review against spec..."
-        )
 
-        # Paso 6: Revisar implementación
-        logger.info("Step 6: Reviewing implementation against spec")
-        review_result = execute_template(AgentTemplateRequest(
-            slash_command="/review",
-            args=[adw_id, plan_file],
-            adw_id=adw_id,
-            agent_name="reviewer",
-            model="sonnet"
-        ))
-
-        review_success = review_result.success
-        review_data = None
-
-        if review_success:
-            try:
-                # Intentar parsear salida JSON directamente
-                review_data = json.loads(review_result.output)
-            except json.JSONDecodeError:
-                # Fallback 1: limpiar markdown code blocks y reintentar
-                logger.warning("Direct JSON parse failed, attempting to strip markdown and retry")
-                try:
-                    clean_output = re.sub(r'```(?:json)?', '', review_result.output).strip()
-                    review_data = json.loads(clean_output)
-                    logger.info("Successfully parsed JSON after stripping markdown")
-                except json.JSONDecodeError:
-                    # Fallback 2: extraer JSON del contenido mixto buscando el bloque { ... }
-                    logger.warning("Markdown strip failed, attempting to extract JSON block from output")
-                    try:
-                        match = re.search(r'\{.*\}', clean_output, re.DOTALL)
-                        if match:
-                            review_data = json.loads(match.group())
-                            logger.info("Successfully extracted JSON from mixed output")
-                        else:
-                            logger.warning("Could not find JSON block in review output")
-                            review_data = None
-                    except json.JSONDecodeError:
-                        logger.warning("Could not parse review output as JSON")
-                        review_data = None
-
-            if review_data:
-                logger.info(f"Review completed: {'SUCCESS' if review_data.get('success') else 'FAILED'}")
-                logger.info(f"Review summary: {review_data.get('review_summary', 'N/A')}")
-
-                if review_data.get('review_issues'):
-                    logger.info(f"Review found {len(review_data['review_issues'])} issues")
-                    for issue_item in review_data['review_issues']:
-                        logger.info(f"  - [{issue_item['issue_severity']}] {issue_item['issue_description']}")
-
-                if review_data.get('screenshots'):
-                    logger.info(f"Review captured {len(review_data['screenshots'])} screenshots")
+def _parse_review_output(output: str, logger) -> Optional[Dict[str, Any]]:
+    """Parsear el JSON de la revisión, tolerando bloques markdown y texto alrededor."""
+    try:
+        # Intentar parsear salida JSON directamente
+        return json.loads(output)
+    except json.JSONDecodeError:
+        pass
+
+    # Fallback 1: limpiar markdown code blocks y reintentar
+    logger.warning("Direct JSON parse failed, attempting to strip markdown and retry")
+    clean_output = re.sub(r'```(?:json)?', '', output).strip()
+    try:
+        review_data = json.loads(clean_output)
+        logger.info("Successfully parsed JSON after stripping markdown")
+        return review_data
+    except json.JSONDecodeError:
+        pass
+
+    # Fallback 2: extraer JSON del contenido mixto buscando el bloque { ... }
+    logger.warning("Markdown strip failed, attempting to extract JSON block from output")
+    match = re.search(r'\{.*\}', clean_output, re.DOTALL)
+    if not match:
+        logger.warning("Could not find JSON block in review output")
+        return None
+    try:
+        review_data = json.loads(match.group())
+        logger.info("Successfully extracted JSON from mixed output")
+        return review_data
+    except json.JSONDecodeError:
+        logger.warning("Could not parse review output as JSON")
+        return None
+
+
+def _resolve_plan_file(ctx: Dict[str, Any]) -> str:
+    """Spec de la ejecución: la que dejó el plan o, si no existe, la registrada en el índice."""
+    plan_file, run_root = ctx["plan_file"], ctx["run_root"]
+    if (run_root / plan_file).is_file():
+        return plan_file
+    spec_index = ctx["spec_index"]
+    indexed = spec_index.plan_for_run(ctx["adw_id"]) or spec_index.plan_for_issue(ctx["issue_number"])
+    if indexed and (run_root / indexed).is_file():
+        ctx["logger"].info(f"Plan file {plan_file} not found, using indexed spec {indexed}")
+        return indexed
+    return plan_file
+
+
+def phase_review(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Revisar la implementación contra la especificación (con screenshots)."""
+    logger, board = ctx["logger"], ctx["board"]
+    adw_id, run_root = ctx["adw_id"], ctx["run_root"]
+
+    logger.info("Step 6: Reviewing implementation against spec")
+    review_result = execute_template(AgentTemplateRequest(
+        slash_command="/review",
+        args=[adw_id, _resolve_plan_file(ctx)],
+        adw_id=adw_id,
+        agent_name="reviewer",
+        model="sonnet"
+    ))
+
+    review_data = None
+    if review_result.success:
+        review_data = _parse_review_output(review_result.output, logger)
 
         if review_data:
-            review_comment_parts = [
-                f"🔎 **Step 6: Review Complete** (ADW ID: `{adw_id}`)",
-                "",
-                review_data.get('review_summary', 'Review completed'),
-                ""
-            ]
+            logger.info(f"Review completed: {'SUCCESS' if review_data.get('success') else 'FAILED'}")
+            logger.info(f"Review summary: {review_data.get('review_summary', 'N/A')}")
+
             if review_data.get('review_issues'):
-                review_comment_parts.append("**Issues Found:**")
+                logger.info(f"Review found {len(review_data['review_issues'])} issues")
                 for issue_item in review_data['review_issues']:
-                    severity_emoji = {
-                        'blocker': '🔴',
-                        'tech_debt': '🟡',
-                        'skippable': '🟢'
-                    }.get(issue_item['issue_severity'], '⚪')
-                    review_comment_parts.append(
-                        f"{severity_emoji} **{issue_item['issue_severity'].upper()}**: {issue_item['issue_description']}"
-                    )
-            else:
-                review_comment_parts.append("✅ No issues found.")
-            post_comment(issue_number, "\n".join(review_comment_parts))
-        else:
-            post_comment(
-                issue_number,
-                f"🔎 **Step 6: Review Complete** (ADW ID: `{adw_id}`)\n\nReview finished. Generating documentation..."
-            )
+                    logger.info(f"  - [{issue_item['issue_severity']}] {issue_item['issue_description']}")
 
-        # Paso 7: Generar documentación
-        logger.info("Step 7: Generating documentation")
-
-        # Determinar directorio de screenshots de revisión
-        # Intentar ambas ubicaciones posibles (reviewer o review_agent)
-        project_root = Path(__file__).parent.parent
-        screenshots_dir = project_root / "agents" / adw_id / "reviewer" / "review_img"
-        if not screenshots_dir.exists():
-            screenshots_dir = project_root / "agents" / adw_id / "review_agent" / "review_img"
-
-        # Crear directorio app_docs si no existe
-        app_docs_dir = project_root / "app_docs"
-        app_docs_dir.mkdir(exist_ok=True)
-
-        # Ejecutar comando de documentación
-        doc_args = [adw_id, plan_file]
-        if screenshots_dir.exists():
-            doc_args.append(str(screenshots_dir))
-            logger.info(f"Using screenshots from: {screenshots_dir}")
-
-        document_result = execute_template(AgentTemplateRequest(
-            slash_command="/document",
-            args=doc_args,
-            adw_id=adw_id,
-            agent_name="documenter",
-            model="sonnet"
-        ))
-
-        doc_file = None
-        if document_result.success:
-            # El comando /document retorna la ruta del archivo creado
-            doc_file = document_result.output.strip()
-            logger.info(f"Documentation created: {doc_file}")
-            post_comment(
-                issue_number,
-                f"📄 **Step 7: Documentation Generated** (ADW ID: `{adw_id}`)\n\nDocumentation created: `{doc_file}`\n\nCommitting all changes..."
-            )
-        else:
-            logger.warning(f"Documentation generation had issues: {document_result.output}")
-            post_comment(
-                issue_number,
-                f"⚠️ **Step 7: Documentation Warning** (ADW ID: `{adw_id}`)\n\nDocumentation generation had issues but workflow will continue."
-            )
+            if review_data.get('screenshots'):
+                logger.info(f"Review captured {len(review_data['screenshots'])} screenshots")
 
-        # Paso 8: Hacer commit de cambios (código + documentación)
-        logger.info("Step 8: Committing changes")
-        commit_result = execute_template(AgentTemplateRequest(
-            slash_command="/commit",
-            args=[],
-            adw_id=adw_id,
-            agent_name="committer",
-            model="haiku"
-        ))
-
-        if not commit_result.success:
-            logger.error(f"Commit failed: {commit_result.output}")
-            post_comment(
-                issue_number,
-                f"⚠️ **Commit Issues** (ADW ID: `{adw_id}`)\n\nChanges implemented but commit had issues. Manual intervention may be needed."
-            )
-        else:
-            post_comment(
-                issue_number,
-                f"💾 **Step 8: Changes Committed** (ADW ID: `{adw_id}`)\n\nAll changes committed and pushing to remote..."
-            )
+    if review_data:
+        issue_count = len(review_data.get('review_issues') or [])
+        board.complete_phase("review", f"{issue_count} issues found" if issue_count else "No issues found")
+    else:
+        board.warn_phase("review", "Review output could not be parsed")
 
-        logger.info("Changes committed")
+    if review_data:
+        review_comment_parts = [
+            f"🔎 **Step 6: Review Complete** (ADW ID: `{adw_id}`)",
+            "",
+            review_data.get('review_summary', 'Review completed'),
+            ""
+        ]
+        if review_data.get('review_issues'):
+            review_comment_parts.append("**Issues Found:**")
+            review_comment_parts.extend(_format_review_issues(review_data))
+        else:
+            review_comment_parts.append("✅ No issues found.")
+        _post_step(ctx, "\n".join(review_comment_parts))
+    else:
+        _post_step(ctx, f"🔎 **Step 6: Review Complete** (ADW ID: `{adw_id}`)\n\nReview finished. Generating documentation...")
+
+    # Determinar directorio de screenshots de revisión
+    # Intentar ambas ubicaciones posibles (reviewer o review_agent)
+    screenshots_dir = run_root / "agents" / adw_id / "reviewer" / "review_img"
+    if not screenshots_dir.exists():
+        screenshots_dir = run_root / "agents" / adw_id / "review_agent" / "review_img"
+
+    return {"review_data": review_data, "screenshots_dir": screenshots_dir}
+
+
+def _format_review_issues(review_data: Dict[str, Any]) -> List[str]:
+    """Formatear los problemas de la revisión como líneas markdown con severidad."""
+    lines = []
+    for issue_item in review_data.get('review_issues') or []:
+        severity_emoji = {
+            'blocker': '🔴',
+            'tech_debt': '🟡',
+            'skippable': '🟢'
+        }.get(issue_item['issue_severity'], '⚪')
+        lines.append(
+            f"{severity_emoji} **{issue_item['issue_severity'].upper()}**: {issue_item['issue_description']}"
+        )
+    return lines
+
+
+def phase_document(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Generar la documentación usando los screenshots de la revisión."""
+    logger, board = ctx["logger"], ctx["board"]
+    adw_id, run_root, screenshots_dir = ctx["adw_id"], ctx["run_root"], ctx["screenshots_dir"]
+
+    logger.info("Step 7: Generating documentation")
+
+    # Crear directorio app_docs si no existe
+    app_docs_dir = run_root / "app_docs"
+    app_docs_dir.mkdir(exist_ok=True)
+
+    # Ejecutar comando de documentación
+    doc_args = [adw_id, _resolve_plan_file(ctx)]
+    if screenshots_dir.exists():
+        doc_args.append(str(screenshots_dir))
+        logger.info(f"Using screenshots from: {screenshots_dir}")
+
+    document_result = execute_template(AgentTemplateRequest(
+        slash_command="/document",
+        args=doc_args,
+        adw_id=adw_id,
+        agent_name="documenter",
+        model="sonnet"
+    ))
+
+    doc_file = None
+    if document_result.success:
+        # El comando /document retorna la ruta del archivo creado
+        doc_file = document_result.output.strip()
+        # os.path.isfile no lanza con salidas que no son rutas (ej. demasiado largas)
+        if not os.path.isfile(run_root / doc_file):
+            doc_file = written_doc(run_root, adw_id) or doc_file
+        if os.path.isfile(run_root / doc_file):
+            ctx["spec_index"].record_doc(adw_id, doc_file, ctx["issue_number"])
+        logger.info(f"Documentation created: {doc_file}")
+        board.complete_phase("document", f"`{doc_file}`")
+        _post_step(ctx, f"📄 **Step 7: Documentation Generated** (ADW ID: `{adw_id}`)\n\nDocumentation created: `{doc_file}`")
+    else:
+        logger.warning(f"Documentation generation had issues: {document_result.output}")
+        board.warn_phase("document", "Documentation generation had issues")
+        _post_step(ctx, f"⚠️ **Step 7: Documentation Warning** (ADW ID: `{adw_id}`)\n\nDocumentation generation had issues but workflow will continue.")
+    return {"doc_file": doc_file}
+
+
+def phase_screenshots(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copiar los screenshots de la revisión al repositorio y hacer commit local.
+
+    Corre en paralelo con /document: solo lee los screenshots ya capturados y
+    agrega sus propios archivos, que se publican con el push único posterior.
+    """
+    logger, board = ctx["logger"], ctx["board"]
+    screenshots_dir = ctx["screenshots_dir"]
+
+    logger.info("Step 7.5: Committing review screenshots to repository")
+    if not screenshots_dir.exists():
+        logger.info("No screenshots directory found, skipping screenshot commit")
+        board.skip_phase("screenshots", "No screenshots")
+        return {"screenshot_paths": None}
 
-        # Push de la rama al remote
-        logger.info(f"Pushing branch {branch_name} to remote")
-        subprocess.run(
-            ["git", "push", "-u", "origin", branch_name],
-            cwd=str(Path(__file__).parent.parent),
-            check=True,
-            capture_output=True
+    try:
+        screenshot_paths = commit_screenshots_to_repo(
+            adw_id=ctx["adw_id"],
+            screenshots_source_dir=screenshots_dir,
+            branch_name=ctx["branch_name"]
         )
-        logger.info(f"Branch {branch_name} pushed to remote")
-
-        # Paso 8.5: Commit screenshots to repository
-        logger.info("Step 8.5: Committing review screenshots to repository")
-        screenshot_paths = None
-        if screenshots_dir.exists():
-            try:
-                screenshot_paths = commit_screenshots_to_repo(
-                    adw_id=adw_id,
-                    screenshots_source_dir=screenshots_dir,
-                    branch_name=branch_name
+    except Exception as e:
+        logger.warning(f"Failed to commit screenshots: {e}")
+        board.warn_phase("screenshots", "Failed to commit screenshots")
+        return {"screenshot_paths": None}
+
+    if screenshot_paths:
+        logger.info(f"Committed {len(screenshot_paths)} screenshots to repository")
+        manifest = load_manifest(ctx["run_root"], ctx["adw_id"]) or {}
+        saved_kb = manifest.get("saved_bytes", 0) / 1024
+        board.complete_phase("screenshots", f"{len(screenshot_paths)} screenshots, {saved_kb:.0f} KB saved")
+    else:
+        logger.info("No screenshots to commit")
+        board.skip_phase("screenshots", "No screenshots")
+    return {"screenshot_paths": screenshot_paths}
+
+
+def phase_commit(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Hacer commit de los cambios (código + documentación)."""
+    logger, board = ctx["logger"], ctx["board"]
+    adw_id = ctx["adw_id"]
+
+    logger.info("Step 8: Committing changes")
+    commit_result = execute_template(AgentTemplateRequest(
+        slash_command="/commit",
+        args=[],
+        adw_id=adw_id,
+        agent_name="committer",
+        model="haiku"
+    ))
+
+    if not commit_result.success:
+        logger.error(f"Commit failed: {commit_result.output}")
+        board.warn_phase("commit", "Commit had issues, manual intervention may be needed")
+        _post_step(ctx, f"⚠️ **Commit Issues** (ADW ID: `{adw_id}`)\n\nChanges implemented but commit had issues. Manual intervention may be needed.")
+    else:
+        board.complete_phase("commit")
+        _post_step(ctx, f"💾 **Step 8: Changes Committed** (ADW ID: `{adw_id}`)\n\nAll changes committed and pushing to remote...")
+
+    logger.info("Changes committed")
+    return {"committed": commit_result.success}
+
+
+def phase_push(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Push único de la rama (código, documentación y screenshots) al remote."""
+    logger, branch_name = ctx["logger"], ctx["branch_name"]
+
+    logger.info(f"Pushing branch {branch_name} to remote")
+    push_branch(ctx["run_root"], branch_name)
+    logger.info(f"Branch {branch_name} pushed to remote")
+    ctx["board"].complete_phase("push", f"`{branch_name}`")
+    return {"pushed": True}
+
+
+def phase_pull_request(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Crear el pull request y comentar los screenshots en él."""
+    logger, board, outbox = ctx["logger"], ctx["board"], ctx["outbox"]
+    adw_id, branch_name = ctx["adw_id"], ctx["branch_name"]
+    screenshot_paths = ctx["screenshot_paths"]
+
+    logger.info("Step 9: Creating pull request")
+    pr_result = execute_template(AgentTemplateRequest(
+        slash_command="/pull_request",
+        args=[],
+        adw_id=adw_id,
+        agent_name="pr_creator",
+        model="sonnet"
+    ))
+
+    if not pr_result.success:
+        _check_cancelled()
+        logger.error(f"PR creation failed: {pr_result.output}")
+        board.fail_phase("pull_request", "PR creation failed, create it manually")
+        outbox.post_comment(
+            ctx["issue_number"],
+            f"⚠️ **PR Creation Failed** (ADW ID: `{adw_id}`)\n\nChanges committed but PR creation failed. You may need to create it manually."
+        )
+        return {"pr_created": False, "pr_number": None, "pr_url": None}
+
+    # Tomar el PR de la salida del agente; si no la reporta, buscarlo por rama
+    pr_info = parse_pr_url(pr_result.output)
+    if not pr_info:
+        try:
+            pr_info = wait_for_pr_for_branch(branch_name)
+        except Exception as e:
+            logger.warning(f"Failed to look up PR for branch {branch_name}: {e}")
+    if pr_info:
+        logger.info(f"Pull request #{pr_info['number']}: {pr_info['url']}")
+        board.complete_phase("pull_request", f"[#{pr_info['number']}]({pr_info['url']})")
+    else:
+        logger.warning("PR created but its number could not be determined")
+        board.complete_phase("pull_request")
+
+    # Paso 9.5: Post PR comment with screenshots
+    if screenshot_paths:
+        logger.info("Step 9.5: Posting PR comment with screenshots")
+        if pr_info:
+            outbox.post_comment(
+                pr_info['number'],
+                build_pr_screenshot_comment(
+                    screenshot_paths=screenshot_paths,
+                    branch_name=branch_name,
+                    review_data=ctx["review_data"],
+                    captions=screenshot_captions(ctx["run_root"], adw_id, screenshot_paths)
                 )
-                if screenshot_paths:
-                    logger.info(f"Committed {len(screenshot_paths)} screenshots to repository")
-                    # Push screenshots commit
-                    subprocess.run(
-                        ["git", "push"],
-                        cwd=str(Path(__file__).parent.parent),
-                        check=True,
-                        capture_output=True
-                    )
-                    logger.info("Screenshots pushed to remote")
-                else:
-                    logger.info("No screenshots to commit")
-            except Exception as e:
-                logger.warning(f"Failed to commit screenshots: {e}")
-                screenshot_paths = None
-        else:
-            logger.info("No screenshots directory found, skipping screenshot commit")
-
-        # Paso 9: Crear pull request
-        logger.info("Step 9: Creating pull request")
-        pr_result = execute_template(AgentTemplateRequest(
-            slash_command="/pull_request",
-            args=[],
-            adw_id=adw_id,
-            agent_name="pr_creator",
-            model="sonnet"
-        ))
-
-        if not pr_result.success:
-            logger.error(f"PR creation failed: {pr_result.output}")
-            post_comment(
-                issue_number,
-                f"⚠️ **PR Creation Failed** (ADW ID: `{adw_id}`)\n\nChanges committed but PR creation failed. You may need to create it manually."
             )
+            logger.info(f"Queued screenshot comment for PR #{pr_info['number']}")
+        else:
+            logger.warning("Could not find PR to post screenshot comment")
+
+    return {
+        "pr_created": True,
+        "pr_number": pr_info["number"] if pr_info else None,
+        "pr_url": pr_info["url"] if pr_info else None,
+    }
+
+
+def build_workflow_pipeline() -> Pipeline:
+    """
+    Construir el grafo de fases del workflow.
+
+    La clasificación y el nombre de rama dependen solo del issue y corren en
+    paralelo; los screenshots se copian mientras se genera la documentación, y el
+    commit espera a ambos antes del push único.
+    """
+    return Pipeline(
+        [
+            Phase("issue", phase_issue, outputs=["issue"]),
+            Phase("classify", phase_classify, inputs=["issue"], outputs=["issue_type"]),
+            Phase("branch", phase_branch, inputs=["issue"], outputs=["branch_name"]),
+            Phase("plan", phase_plan, inputs=["issue", "issue_type", "branch_name"], outputs=["plan_file"]),
+            Phase("implement", phase_implement, inputs=["plan_file"], outputs=["implemented"]),
+            Phase("review", phase_review, inputs=["plan_file", "implemented"], outputs=["review_data", "screenshots_dir"]),
+            Phase("document", phase_document, inputs=["plan_file", "screenshots_dir"], outputs=["doc_file"]),
+            Phase("screenshots", phase_screenshots, inputs=["screenshots_dir", "branch_name"], outputs=["screenshot_paths"]),
+            Phase("commit", phase_commit, inputs=["doc_file", "screenshot_paths"], outputs=["committed"]),
+            Phase("push", phase_push, inputs=["committed", "branch_name"], outputs=["pushed"]),
+            Phase(
+                "pull_request", phase_pull_request,
+                inputs=["pushed", "screenshot_paths", "review_data"],
+                outputs=["pr_created", "pr_number", "pr_url"]
+            ),
+        ],
+        initial_keys=WORKFLOW_CONTEXT_KEYS
+    )
+
+
+def build_final_comment(ctx: Dict[str, Any], report: PipelineReport) -> str:
+    """Construir el comentario final con resultados completos y tiempos del pipeline."""
+    review_data = ctx.get("review_data")
+    screenshot_paths = ctx.get("screenshot_paths")
+    doc_file = ctx.get("doc_file")
+
+    comment_parts = [
+        f"✅ **Workflow Complete** (ADW ID: `{ctx['adw_id']}`)",
+        "",
+        f"- Issue classified as: `{ctx['issue_type']}`",
+        f"- Branch created: `{ctx['branch_name']}`",
+        f"- Plan: `{ctx['plan_file']}`",
+        f"- Changes implemented and committed",
+        ""
+    ]
+
+    # Agregar resultados de revisión
+    if review_data:
+        comment_parts.append("## 📋 Review Results")
+        comment_parts.append("")
+        comment_parts.append(review_data.get('review_summary', 'Review completed'))
+        comment_parts.append("")
 
-        # Paso 9.5: Post PR comment with screenshots
-        if pr_result.success and screenshot_paths:
-            logger.info("Step 9.5: Posting PR comment with screenshots")
-            try:
-                import time
-                from github import get_pr_for_branch
-                # Esperar 3 segundos para que GitHub indexe el PR
-                time.sleep(3)
-                pr_info = get_pr_for_branch(branch_name)
-
-                if pr_info:
-                    post_pr_comment_with_screenshots(
-                        pr_number=pr_info['number'],
-                        screenshot_paths=screenshot_paths,
-                        branch_name=branch_name,
-                        review_data=review_data
-                    )
-                    logger.info(f"Posted screenshot comment on PR #{pr_info['number']}")
-                else:
-                    logger.warning("Could not find PR to post screenshot comment")
-            except Exception as e:
-                logger.warning(f"Failed to post PR screenshot comment: {e}")
-
-        # Construir comentario final con resultados completos
-        comment_parts = [
-            f"✅ **Workflow Complete** (ADW ID: `{adw_id}`)",
-            "",
-            f"- Issue classified as: `{issue_type}`",
-            f"- Branch created: `{branch_name}`",
-            f"- Plan: `{plan_file}`",
-            f"- Changes implemented and committed",
-            ""
-        ]
-
-        # Agregar resultados de revisión
-        if review_data:
-            comment_parts.append("## 📋 Review Results")
-            comment_parts.append("")
-            comment_parts.append(review_data.get('review_summary', 'Review completed'))
+        if review_data.get('review_issues'):
+            comment_parts.append("### Issues Found")
+            comment_parts.extend(_format_review_issues(review_data))
             comment_parts.append("")
 
-            if review_data.get('review_issues'):
-                comment_parts.append("### Issues Found")
-                for issue_item in review_data['review_issues']:
-                    severity_emoji = {
-                        'blocker': '🔴',
-                        'tech_debt': '🟡',
-                        'skippable': '🟢'
-                    }.get(issue_item['issue_severity'], '⚪')
-                    comment_parts.append(
-                        f"{severity_emoji} **{issue_item['issue_severity'].upper()}**: {issue_item['issue_description']}"
-                    )
-                comment_parts.append("")
-
-            if review_data.get('screenshots') or screenshot_paths:
-                comment_parts.append(f"### 📸 Screenshots")
-                if screenshot_paths:
-                    comment_parts.append(f"{len(screenshot_paths)} screenshots uploaded to PR")
-                else:
-                    comment_parts.append(f"{len(review_data.get('screenshots', []))} screenshots captured during review")
-                comment_parts.append("")
-
-        # Agregar información de documentación
-        if doc_file:
-            comment_parts.append("## 📄 Documentation")
-            comment_parts.append("")
-            comment_parts.append(f"- Documentation generated: `{doc_file}`")
+        if review_data.get('screenshots') or screenshot_paths:
+            comment_parts.append(f"### 📸 Screenshots")
+            if screenshot_paths:
+                comment_parts.append(f"{len(screenshot_paths)} screenshots uploaded to PR")
+            else:
+                comment_parts.append(f"{len(review_data.get('screenshots', []))} screenshots captured during review")
             comment_parts.append("")
 
-        comment_parts.append("- Pull request created")
+    # Agregar información de documentación
+    if doc_file:
+        comment_parts.append("## 📄 Documentation")
+        comment_parts.append("")
+        comment_parts.append(f"- Documentation generated: `{doc_file}`")
         comment_parts.append("")
-        comment_parts.append("Please review the PR and merge when ready!")
 
-        final_comment = "\n".join(comment_parts)
-        post_comment(issue_number, final_comment)
+    if ctx.get("pr_url"):
+        comment_parts.append(f"- Pull request created: {ctx['pr_url']}")
+    else:
+        comment_parts.append("- Pull request created")
+    comment_parts.append("")
+    comment_parts.append("Please review the PR and merge when ready!")
 
-        logger.info("Workflow completed successfully!")
+    # Agregar tiempos por fase, camino crítico y ahorro por paralelismo
+    summary = report.to_dict()
+    if summary["phases"]:
+        labels = dict(WORKFLOW_PHASES)
+        comment_parts.append("")
+        comment_parts.append("<details><summary>⏱️ Phase timings</summary>")
+        comment_parts.append("")
+        for name, label in WORKFLOW_PHASES:
+            if name in summary["phases"]:
+                comment_parts.append(f"- {label}: {summary['phases'][name]:.1f}s")
+        comment_parts.append("")
+        comment_parts.append(
+            f"Critical path: {' → '.join(labels[name] for name in summary['critical_path'])} "
+            f"({summary['critical_path_seconds']:.1f}s)"
+        )
+        comment_parts.append(
+            f"Wall time: {summary['wall_seconds']:.1f}s "
+            f"(saved {summary['saved_seconds']:.1f}s by running independent phases in parallel)"
+        )
+        comment_parts.append("</details>")
+
+    return "\n".join(comment_parts)
+
+
+def run_workflow(
+    issue_number: int,
+    adw_id: str,
+    run_root: Path,
+    logger,
+    outbox: Outbox,
+    board: StatusBoard,
+    resume_state: Optional[JournalState] = None
+) -> None:
+    """
+    Ejecutar las fases del flujo de trabajo para un issue.
+
+    Con resume_state se restauran los outputs del journal y solo se ejecutan las
+    fases que no se completaron en la ejecución anterior.
+    """
+    ctx: Dict[str, Any] = {
+        "issue_number": issue_number,
+        "adw_id": adw_id,
+        "run_root": run_root,
+        "logger": logger,
+        "outbox": outbox,
+        "board": board,
+        "spec_index": SpecIndex(),
+    }
+
+    journal = RunJournal(adw_id)
+    completed = set()
+    if resume_state:
+        completed = resume_state.completed
+        ctx.update(resume_state.outputs)
+        for name, _ in WORKFLOW_PHASES:
+            if name in completed:
+                board.complete_phase(name, "Done in a previous run")
+        logger.info(f"Resuming from journal, completed phases: {', '.join(sorted(completed)) or 'none'}")
+
+        # Volver a la rama del issue (en el checkout compartido puede haber otra activa)
+        if "branch_name" in ctx:
+            switch_branch(run_root, ctx["branch_name"])
+
+        remaining = [label for name, label in WORKFLOW_PHASES if name not in completed]
+        _post_step(
+            ctx,
+            f"🔁 **ADW Workflow Resumed** (ID: `{adw_id}`)\n\nResuming from: {remaining[0] if remaining else 'end'}"
+        )
+        board.flush()
+    journal.run_started(issue_number, resumed=bool(resume_state))
+
+    # Duración de cada fase para /metrics
+    phase_started: Dict[str, float] = {}
+
+    def on_phase_start(name: str) -> None:
+        # Se ejecuta en el hilo de la fase: sus logs quedan etiquetados con ella
+        set_phase(name)
+        phase_started[name] = time.monotonic()
+        board.start_phase(name)
+
+    def on_phase_complete(name: str, outputs: Dict[str, Any]) -> None:
+        record_phase(name, "success", time.monotonic() - phase_started[name])
+        journal.phase_completed(name, outputs)
+
+    def on_phase_error(name: str, error: BaseException) -> None:
+        if CANCEL_EVENT.is_set():
+            status = "cancelled"
+        elif isinstance(error, PhaseAborted):
+            status = "aborted"
+        else:
+            status = "failed"
+            board.fail_phase(name, str(error)[:200])
+        record_phase(name, status, time.monotonic() - phase_started[name])
 
+    try:
+        report = build_workflow_pipeline().run(
+            ctx,
+            max_workers=PIPELINE_MAX_WORKERS,
+            completed=completed,
+            on_phase_start=on_phase_start,
+            on_phase_complete=on_phase_complete,
+            on_phase_error=on_phase_error,
+            cancel_event=CANCEL_EVENT
+        )
+    except PipelineCancelled:
+        logger.warning("Workflow cancelled")
+        journal.run_finished("cancelled")
+        board.flush()
+        outbox.post_comment(
+            issue_number,
+            f"🛑 **Workflow Cancelled** (ADW ID: `{adw_id}`)\n\n"
+            f"Comment `adw resume {adw_id}` to continue from the first incomplete phase."
+        )
+        sys.exit(1)
+    except PhaseAborted as e:
+        # La fase ya reportó el motivo en el issue
+        logger.warning(f"Workflow stopped: {e}")
+        journal.run_finished("aborted")
+        board.flush()
+        sys.exit(1)
     except Exception as e:
         logger.error(f"Workflow failed with error: {e}", exc_info=True)
-        post_comment(
+        journal.run_finished("failed")
+        board.flush()
+        log_file = run_root / "agents" / adw_id / "adw_plan_build_review_document" / "execution.log"
+        outbox.post_comment(
             issue_number,
             f"❌ **Workflow Failed** (ADW ID: `{adw_id}`)\n\n"
             f"Error: {str(e)}\n\n"
-            f"Check logs at `agents/{adw_id}/adw_plan_build_review_document/execution.log` for details."
+            f"Check logs at `{log_file.relative_to(get_project_root()).as_posix()}` for details.\n\n"
+            f"Comment `adw resume {adw_id}` to retry from the failed phase."
         )
         sys.exit(1)
 
+    # Guardar el reporte del pipeline junto a los demás artefactos de la ejecución
+    summary = report.to_dict()
+    summary["git"] = get_git_stats()
+    report_file = run_root / "agents" / adw_id / "pipeline_report.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    logger.info(
+        f"Pipeline finished in {summary['wall_seconds']:.1f}s "
+        f"(serial {summary['serial_seconds']:.1f}s, saved {summary['saved_seconds']:.1f}s); "
+        f"critical path: {' -> '.join(summary['critical_path'])}"
+    )
+    logger.info(
+        "Git operations: " + ", ".join(
+            f"{op} x{stats['count']} {stats['seconds']:.2f}s" for op, stats in summary["git"].items()
+        )
+    )
+
+    journal.run_finished("success")
+    board.flush()
+    outbox.post_comment(issue_number, build_final_comment(ctx, report))
+
+    logger.info("Workflow completed successfully!")
+
 
 if __name__ == "__main__":
     main()
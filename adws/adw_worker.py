@@ -0,0 +1,118 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["python-dotenv", "pydantic", "requests"]
+# ///
+
+"""
+Nodo worker de ADW: ejecuta los trabajos de una cola compartida.
+
+El servidor de webhooks encola los disparos y este proceso, en un host con un
+checkout del repositorio, los toma y ejecuta. Cada trabajo se toma con
+un lease de ADW_LEASE_SECONDS que el nodo renueva con heartbeats mientras el
+workflow corre; si el nodo se cae el lease vence y otro nodo lo vuelve a tomar.
+
+La cola es la base SQLite de ADW_QUEUE_DB. Por defecto usa WAL y es de un solo
+host: los nodos son procesos en la misma máquina. Para repartir los trabajos
+entre máquinas la base debe estar en un volumen con bloqueos POSIX confiables
+(nunca SMB/CIFS) y todos los nodos deben usar ADW_QUEUE_SHARED=true, que cambia
+WAL por el journal clásico de SQLite. Con ADW_MAX_WORKERS=0 el servidor de
+webhooks solo encola y los trabajos los ejecutan los nodos.
+
+Cada nodo usa ADW_REPOS_CONFIG (o GITHUB_REPO_OWNER/GITHUB_REPO_NAME sobre este
+checkout) con las rutas de sus propios checkouts, y entrega los comentarios de
+sus ejecuciones con su propio outbox.
+
+Uso:
+    uv run adws/adw_worker.py [--repo owner/name ...] [--workers N]
+
+La primera señal SIGINT/SIGTERM deja de tomar trabajos y espera a que terminen
+los que están en curso; la segunda los devuelve a la cola y sale.
+"""
+
+import argparse
+import signal
+import sys
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Agregar directorio adws al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Cargar variables de entorno
+load_dotenv()
+
+from job_queue import JobQueue, QUEUE_DB_PATH, JOB_PENDING, JOB_RUNNING
+from repos import RepoRouter, load_repos
+from retention import RETENTION_ENABLED
+
+
+def main() -> int:
+    """Arrancar los pools de los repositorios seleccionados hasta recibir una señal."""
+    parser = argparse.ArgumentParser(description="Run ADW jobs from a shared queue")
+    parser.add_argument(
+        "--repo", action="append", default=[],
+        help="Only run jobs of this repository (owner/name, repeatable; default: all configured)"
+    )
+    parser.add_argument("--workers", type=int, help="Workflows in parallel per repository (default: ADW_MAX_WORKERS)")
+    args = parser.parse_args()
+
+    repos = load_repos()
+    if args.repo:
+        selected = {name.lower() for name in args.repo}
+        unknown = selected - set(repos)
+        if unknown:
+            print(f"Repositories not configured: {', '.join(sorted(unknown))}")
+            return 1
+        repos = {key: config for key, config in repos.items() if key in selected}
+    if args.workers is not None:
+        repos = {key: config.model_copy(update={"max_workers": args.workers}) for key, config in repos.items()}
+
+    queue = JobQueue(QUEUE_DB_PATH)
+
+    def is_active(adw_id: str) -> bool:
+        job = queue.get_job(adw_id)
+        return job is not None and job["state"] in (JOB_PENDING, JOB_RUNNING)
+
+    router = RepoRouter(queue, is_active=is_active, repos=repos)
+    print(f"ADW worker using queue {QUEUE_DB_PATH}")
+    for runtime in router.all():
+        runtime.start(retention=RETENTION_ENABLED)
+
+    stopping = threading.Event()
+    forced = threading.Event()
+
+    def handle_signal(signum, frame):
+        if stopping.is_set():
+            forced.set()
+        else:
+            print("Stopping: no new jobs will be claimed, waiting for running jobs (signal again to release them)")
+            stopping.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    while not stopping.wait(timeout=1):
+        pass
+
+    def drain() -> None:
+        for runtime in router.all():
+            runtime.stop(drain=True)
+
+    # Drenar en un hilo para seguir atendiendo la segunda señal
+    drained = threading.Thread(target=drain, name="adw-worker-drain", daemon=True)
+    drained.start()
+    while drained.is_alive() and not forced.is_set():
+        drained.join(timeout=0.5)
+
+    if forced.is_set():
+        for runtime in router.all():
+            runtime.pool.release_all()
+        drained.join(timeout=10)
+    print("ADW worker stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,115 @@
 """Módulo de agente de Claude Code para ejecutar prompts programáticamente."""
 
 import subprocess
-import sys
 import os
 import json
 import re
-from typing import Optional, List, Dict, Any, Tuple
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Optional, List, Dict, Any, Tuple, Callable, Set
 from pathlib import Path
 from dotenv import load_dotenv
+from utils import get_run_root, new_process_group_kwargs, terminate_process_tree
+from metrics import record_agent_call
+from run_logging import get_logger
+from transcript import TranscriptWriter, TranscriptReader
+from sessions import SessionStore, session_chain, record_session_call
+from context_index import context_for_command
+from phase_cache import (
+    PhaseCache,
+    cache_policy,
+    cache_key,
+    tree_hash,
+    snapshot_changes,
+    changed_files,
+    restore_artifacts,
+)
 from data_types import (
     AgentPromptRequest,
     AgentPromptResponse,
     AgentTemplateRequest,
-    ClaudeCodeResultMessage,
 )
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Los mensajes de este módulo van al log de la ejecución en curso
+logger = get_logger("agent")
+
 # Obtener ruta del CLI de Claude Code desde las variables de entorno
 CLAUDE_PATH = os.getenv("CLAUDE_CODE_PATH", "claude")
 
+# Callback invocado por cada mensaje stream-json a medida que llega
+MessageCallback = Callable[[Dict[str, Any]], None]
+
+# Cantidad máxima de líneas de stderr conservadas para mensajes de error
+STDERR_TAIL_LINES = 200
+
+# Presupuesto de tiempo de pared (segundos) por comando slash. Se puede
+# sobreescribir con ADW_TIMEOUT_<COMANDO> (ej. ADW_TIMEOUT_IMPLEMENT=5400) y
+# ADW_TIMEOUT_DEFAULT para los comandos que no figuran aquí.
+DEFAULT_TIMEOUT = float(os.getenv("ADW_TIMEOUT_DEFAULT", "1800"))
+COMMAND_TIMEOUTS: Dict[str, float] = {
+    "/classify_issue": 300,
+    "/generate_branch_name": 180,
+    "/feature": 1200,
+    "/bug": 1200,
+    "/chore": 1200,
+    "/implement": 3600,
+    "/review": 1800,
+    "/document": 1200,
+    "/commit": 600,
+    "/pull_request": 600,
+}
+
+# Segundos entre SIGTERM y SIGKILL al terminar un proceso de Claude
+KILL_GRACE_SECONDS = 5.0
+
+# Error del CLI cuando la sesión de --resume no existe o expiró
+RESUME_REJECTED_PATTERN = re.compile(
+    r"no conversation found|session\b.*\b(not found|expired|does not exist)", re.IGNORECASE
+)
+
+# Procesos de Claude en ejecución en este proceso, para poder terminarlos al cancelar
+_active_processes: Set[subprocess.Popen] = set()
+_active_lock = threading.Lock()
+_cancelled = threading.Event()
+
+
+def get_command_timeout(slash_command: str) -> float:
+    """Obtener el presupuesto de tiempo de pared de un comando slash en segundos."""
+    override = os.getenv(f"ADW_TIMEOUT_{slash_command.lstrip('/').upper()}")
+    if override:
+        return float(override)
+    return COMMAND_TIMEOUTS.get(slash_command, DEFAULT_TIMEOUT)
+
+
+def cancel_agents(grace: float = KILL_GRACE_SECONDS) -> int:
+    """
+    Terminar todos los procesos de Claude en ejecución (y sus hijos) e impedir
+    que se inicien otros.
+
+    Se usa al cancelar un workflow: las fases que esperaban a esos procesos
+    reciben una respuesta fallida y el pipeline deja de programar fases.
+
+    Returns:
+        int: Cantidad de procesos terminados
+    """
+    with _active_lock:
+        _cancelled.set()
+        processes = list(_active_processes)
+    threads = [
+        threading.Thread(target=terminate_process_tree, args=(process, grace), daemon=True)
+        for process in processes
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=grace + 5)
+    return len(processes)
+
 
 def check_claude_installed() -> Optional[str]:
     """Verificar si el CLI de Claude Code está instalado. Retornar mensaje de error si no lo está."""
@@ -38,47 +127,31 @@ def check_claude_installed() -> Optional[str]:
 def parse_jsonl_output(output_file: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
     """Parsear archivo de salida JSONL y retornar todos los mensajes y el mensaje de resultado.
 
+    Acepta transcripciones comprimidas (.gz/.zst). Para acceder solo al resultado
+    o a las llamadas a herramientas conviene usar transcript.TranscriptReader.
+
     Returns:
         Tupla de (all_messages, result_message) donde result_message es None si no se encuentra
     """
     try:
-        with open(output_file, "r", encoding="utf-8") as f:
-            # Read all lines and parse each as JSON
-            messages = [json.loads(line) for line in f if line.strip()]
-
-            # Find the result message (should be the last one)
-            result_message = None
-            for message in reversed(messages):
-                if message.get("type") == "result":
-                    result_message = message
-                    break
-
-            return messages, result_message
+        reader = TranscriptReader(output_file)
+        return list(reader.iter_messages()), reader.result()
     except Exception as e:
-        print(f"Error parsing JSONL file: {e}", file=sys.stderr)
+        logger.error(f"Error parsing JSONL file: {e}")
         return [], None
 
 
 def convert_jsonl_to_json(jsonl_file: str) -> str:
     """Convertir archivo JSONL a archivo de arreglo JSON.
 
-    Crea un archivo .json con el mismo nombre que el archivo .jsonl,
-    conteniendo todos los mensajes como un arreglo JSON.
+    Ya no se ejecuta en cada llamada al agente; exporta la vista de arreglo
+    JSON bajo demanda a partir de la transcripción indexada.
 
     Returns:
         Ruta al archivo JSON creado
     """
-    # Crear nombre de archivo JSON reemplazando .jsonl con .json
-    json_file = jsonl_file.replace('.jsonl', '.json')
-
-    # Parsear el archivo JSONL
-    messages, _ = parse_jsonl_output(jsonl_file)
-
-    # Escribir como arreglo JSON
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(messages, f, indent=2)
-
-    print(f"Created JSON file: {json_file}")
+    json_file = TranscriptReader(jsonl_file).export_json()
+    logger.info(f"Created JSON file: {json_file}")
     return json_file
 
 
@@ -128,10 +201,8 @@ def save_prompt(prompt: str, adw_id: str, agent_name: str = "ops") -> None:
     # Eliminar barra diagonal inicial para el nombre de archivo
     command_name = slash_command[1:]
 
-    # Crear estructura de directorio en la raíz del proyecto (padre de adws)
-    current_file = Path(__file__).resolve()
-    project_root = current_file.parent.parent
-    prompt_dir = project_root / "agents" / adw_id / agent_name / "prompts"
+    # Crear estructura de directorio en la raíz de la ejecución (worktree o proyecto)
+    prompt_dir = get_run_root(adw_id) / "agents" / adw_id / agent_name / "prompts"
     prompt_dir.mkdir(parents=True, exist_ok=True)
 
     # Guardar prompt a archivo
@@ -139,11 +210,31 @@ def save_prompt(prompt: str, adw_id: str, agent_name: str = "ops") -> None:
     with open(prompt_file, "w", encoding="utf-8") as f:
         f.write(prompt)
 
-    print(f"Saved prompt to: {prompt_file}")
+    logger.info(f"Saved prompt to: {prompt_file}")
+
+
+def _drain_stream(stream, sink: deque) -> None:
+    """Leer un stream de texto hasta EOF guardando sus últimas líneas en sink."""
+    for line in stream:
+        sink.append(line)
+    stream.close()
+
 
+def prompt_claude_code(
+    request: AgentPromptRequest,
+    on_message: Optional[MessageCallback] = None
+) -> AgentPromptResponse:
+    """Ejecutar Claude Code con la configuración de prompt dada.
 
-def prompt_claude_code(request: AgentPromptRequest) -> AgentPromptResponse:
-    """Ejecutar Claude Code con la configuración de prompt dada."""
+    La salida stream-json se consume línea por línea a medida que el proceso la
+    emite: cada línea se copia a request.output_file, se decodifica una sola vez,
+    se entrega a on_message y se retiene solo el mensaje de resultado, de modo
+    que la memoria no crece con el largo de la transcripción.
+
+    Args:
+        request: Solicitud de prompt a ejecutar
+        on_message: Callback opcional invocado con cada mensaje decodificado
+    """
 
     # Verificar si el CLI de Claude Code está instalado
     error_msg = check_claude_installed()
@@ -163,6 +254,14 @@ def prompt_claude_code(request: AgentPromptRequest) -> AgentPromptResponse:
     cmd.extend(["--output-format", "stream-json"])
     cmd.append("--verbose")
 
+    # Reanudar una sesión previa para conservar el contexto entre fases
+    if request.resume_session_id:
+        cmd.extend(["--resume", request.resume_session_id])
+
+    # Agregar el índice del repositorio al system prompt
+    if request.append_system_prompt:
+        cmd.extend(["--append-system-prompt", request.append_system_prompt])
+
     # Agregar flag de skip permissions peligroso si está habilitado
     if request.dangerously_skip_permissions:
         cmd.append("--dangerously-skip-permissions")
@@ -170,26 +269,83 @@ def prompt_claude_code(request: AgentPromptRequest) -> AgentPromptResponse:
     # Configurar entorno con variables requeridas
     env = get_claude_env()
 
+    process = None
+    watchdog = None
+    timed_out = threading.Event()
     try:
-        # Ejecutar Claude Code y redirigir salida a archivo
-        with open(request.output_file, "w", encoding="utf-8") as f:
-            result = subprocess.run(
-                cmd,
-                stdout=f,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env,
-                shell=False  # Windows: Usar shell=False para mejor seguridad
-            )
+        # Ejecutar Claude Code leyendo stdout de forma incremental, en su propio
+        # grupo de procesos para poder terminar también a sus hijos
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            env=env,
+            cwd=request.working_dir,
+            shell=False,  # Windows: Usar shell=False para mejor seguridad
+            **new_process_group_kwargs()
+        )
+        with _active_lock:
+            _active_processes.add(process)
+            cancelled = _cancelled.is_set()
+        if cancelled:
+            terminate_process_tree(process, KILL_GRACE_SECONDS)
+            return AgentPromptResponse(output="Error: Claude Code command cancelled", success=False, session_id=None)
+
+        # Terminar el árbol de procesos si se agota el presupuesto de tiempo
+        if request.timeout_seconds:
+            def on_timeout() -> None:
+                timed_out.set()
+                terminate_process_tree(process, KILL_GRACE_SECONDS)
+
+            watchdog = threading.Timer(request.timeout_seconds, on_timeout)
+            watchdog.daemon = True
+            watchdog.start()
+
+        # Drenar stderr en segundo plano para que no bloquee al proceso
+        stderr_tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+        stderr_thread = threading.Thread(target=_drain_stream, args=(process.stderr, stderr_tail), daemon=True)
+        stderr_thread.start()
+
+        result_message = None
+        with TranscriptWriter(request.output_file) as transcript:
+            for line in process.stdout:
+                stripped = line.strip()
+                if not stripped:
+                    continue
+                try:
+                    message = json.loads(stripped)
+                except json.JSONDecodeError:
+                    message = None
+
+                # Copiar la línea tal cual a la transcripción indexada
+                transcript.write_line(line, message)
+                if message is None:
+                    continue
+
+                # Retener el mensaje de resultado a medida que pasa
+                if message.get("type") == "result":
+                    result_message = message
+
+                if on_message:
+                    try:
+                        on_message(message)
+                    except Exception as e:
+                        logger.error(f"Error in message callback: {e}")
 
-        if result.returncode == 0:
-            print(f"Output saved to: {request.output_file}")
+        returncode = process.wait()
+        stderr_thread.join()
 
-            # Parsear el archivo JSONL
-            messages, result_message = parse_jsonl_output(request.output_file)
+        if timed_out.is_set():
+            error_msg = f"Error: Claude Code command timed out after {request.timeout_seconds:.0f}s"
+            logger.error(error_msg)
+            return AgentPromptResponse(output=error_msg, success=False, session_id=None)
+        if returncode != 0 and _cancelled.is_set():
+            return AgentPromptResponse(output="Error: Claude Code command cancelled", success=False, session_id=None)
 
-            # Convertir JSONL a archivo de arreglo JSON
-            json_file = convert_jsonl_to_json(request.output_file)
+        if returncode == 0:
+            logger.info(f"Output saved to: {transcript.data_path}")
 
             if result_message:
                 # Extraer session_id del mensaje de resultado
@@ -202,46 +358,106 @@ def prompt_claude_code(request: AgentPromptRequest) -> AgentPromptResponse:
                 return AgentPromptResponse(
                     output=result_text,
                     success=not is_error,
-                    session_id=session_id
+                    session_id=session_id,
+                    resume_rejected=bool(
+                        is_error and request.resume_session_id and not result_message.get("num_turns")
+                        and RESUME_REJECTED_PATTERN.search(result_text or "")
+                    ),
+                    duration_ms=result_message.get("duration_ms"),
+                    duration_api_ms=result_message.get("duration_api_ms"),
+                    num_turns=result_message.get("num_turns"),
+                    total_cost_usd=result_message.get("total_cost_usd"),
+                    usage=result_message.get("usage")
                 )
             else:
                 # No se encontró mensaje de resultado, retornar salida cruda
-                with open(request.output_file, "r", encoding="utf-8") as f:
-                    raw_output = f.read()
+                raw_output = TranscriptReader(request.output_file).read_text()
                 return AgentPromptResponse(
                     output=raw_output,
                     success=True,
                     session_id=None
                 )
         else:
-            error_msg = f"Claude Code error: {result.stderr}"
-            print(error_msg, file=sys.stderr)
-            return AgentPromptResponse(output=error_msg, success=False, session_id=None)
+            stderr_text = ''.join(stderr_tail)
+            error_msg = f"Claude Code error: {stderr_text}"
+            logger.error(error_msg)
+            return AgentPromptResponse(
+                output=error_msg,
+                success=False,
+                session_id=None,
+                resume_rejected=bool(request.resume_session_id and RESUME_REJECTED_PATTERN.search(stderr_text))
+            )
 
-    except subprocess.TimeoutExpired:
-        error_msg = "Error: Claude Code command timed out"
-        print(error_msg, file=sys.stderr)
-        return AgentPromptResponse(output=error_msg, success=False, session_id=None)
     except Exception as e:
         error_msg = f"Error executing Claude Code: {e}"
-        print(error_msg, file=sys.stderr)
+        logger.error(error_msg)
         return AgentPromptResponse(output=error_msg, success=False, session_id=None)
-
-
-def execute_template(request: AgentTemplateRequest) -> AgentPromptResponse:
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        if process:
+            with _active_lock:
+                _active_processes.discard(process)
+
+
+def execute_template(
+    request: AgentTemplateRequest,
+    on_message: Optional[MessageCallback] = None
+) -> AgentPromptResponse:
     """Ejecutar una plantilla de Claude Code con comando slash y argumentos."""
     # Construir prompt desde comando slash y args
     prompt = f"{request.slash_command} {' '.join(request.args)}"
 
-    # Crear directorio de salida con adw_id en la raíz del proyecto
-    current_file = Path(__file__).resolve()
-    project_root = current_file.parent.parent
-    output_dir = project_root / "agents" / request.adw_id / request.agent_name
+    # Crear directorio de salida con adw_id en la raíz de la ejecución
+    # (el worktree del adw_id si existe, o la raíz del proyecto)
+    run_root = get_run_root(request.adw_id)
+    output_dir = run_root / "agents" / request.adw_id / request.agent_name
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Construir ruta del archivo de salida
     output_file = output_dir / "raw_output.jsonl"
 
+    # Consultar la caché de fases antes de lanzar Claude
+    policy = cache_policy(request.slash_command) if request.use_cache else None
+    cache = None
+    cache_entry_key = None
+    current_tree = None
+    changes_before: Dict[str, Any] = {}
+    if policy:
+        current_tree = tree_hash(run_root) if policy["tree"] else None
+        cache_entry_key = cache_key(
+            request.slash_command,
+            request.args,
+            request.model,
+            context=request.cache_context,
+            tree=current_tree
+        )
+        # Un error de la caché no debe detener la fase: se trata como un fallo
+        try:
+            cache = PhaseCache()
+            cached = cache.get(cache_entry_key, request.slash_command)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Phase cache lookup failed for {request.slash_command}, running without cache: {e}")
+            cache = cached = None
+        if cached:
+            restored = restore_artifacts(cached["artifacts"], run_root)
+            logger.info(f"Phase cache hit for {request.slash_command} (restored {len(restored)} files)")
+            record_agent_call(request.slash_command, request.model, True, 0.0, cached=True)
+            return AgentPromptResponse(output=cached["output"], success=True, session_id=None)
+        if policy["artifacts"]:
+            changes_before = snapshot_changes(run_root)
+
+    # Buscar la sesión a reanudar si la fase pertenece a una cadena de sesión
+    chain = session_chain(request.slash_command)
+    session_store = SessionStore(request.adw_id) if chain else None
+    resume_session_id = session_store.get(chain) if session_store else None
+
+    # Índice del repositorio para planificador e implementador (reutiliza la
+    # huella del checkout ya calculada para la caché)
+    system_context = context_for_command(request.slash_command, run_root, tree=current_tree)
+    if system_context:
+        logger.info(f"Appending repository context index to {request.slash_command} ({len(system_context)} chars)")
+
     # Crear solicitud de prompt con parámetros específicos
     prompt_request = AgentPromptRequest(
         prompt=prompt,
@@ -250,7 +466,62 @@ def execute_template(request: AgentTemplateRequest) -> AgentPromptResponse:
         model=request.model,
         dangerously_skip_permissions=True,
         output_file=str(output_file),
+        working_dir=str(run_root),
+        resume_session_id=resume_session_id,
+        timeout_seconds=get_command_timeout(request.slash_command),
+        append_system_prompt=system_context,
     )
 
-    # Ejecutar y retornar respuesta
-    return prompt_claude_code(prompt_request)
+    # Retener el mensaje de resultado para medir tokens de entrada
+    captured: Dict[str, Any] = {}
+
+    def capture_result(message: Dict[str, Any]) -> None:
+        if message.get("type") == "result":
+            captured["result"] = message
+        if on_message:
+            on_message(message)
+
+    def run_attempt() -> AgentPromptResponse:
+        """Ejecutar una llamada y registrar sus métricas (cada intento cuenta)."""
+        captured.clear()
+        start_time = time.monotonic()
+        response = prompt_claude_code(prompt_request, on_message=capture_result)
+        wall_ms = int((time.monotonic() - start_time) * 1000)
+        record_session_call(
+            request.adw_id,
+            request.slash_command,
+            request.model,
+            resumed=prompt_request.resume_session_id is not None,
+            wall_ms=wall_ms,
+            result_message=captured.get("result")
+        )
+        record_agent_call(
+            request.slash_command,
+            request.model,
+            response.success,
+            wall_ms / 1000,
+            cost_usd=response.total_cost_usd,
+            usage=response.usage
+        )
+        return response
+
+    response = run_attempt()
+
+    if response.resume_rejected:
+        # Solo si el CLI rechazó la sesión (no existe o expiró) se reintenta en
+        # frío; un timeout, una cancelación o un error del agente no se repiten
+        logger.warning(f"Session {resume_session_id} rejected for {request.slash_command}, retrying with a new session")
+        prompt_request.resume_session_id = None
+        response = run_attempt()
+
+    if session_store and response.success and response.session_id:
+        session_store.set(chain, response.session_id)
+
+    if cache and response.success:
+        artifacts = changed_files(changes_before, run_root) if policy["artifacts"] else {}
+        try:
+            cache.put(cache_entry_key, request.slash_command, request.model, response.output, artifacts)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Could not store {request.slash_command} in the phase cache: {e}")
+
+    return response
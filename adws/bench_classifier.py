@@ -0,0 +1,118 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["python-dotenv", "pydantic"]
+# ///
+
+"""
+Benchmark del clasificador local contra el agente sobre los issues de issues.md.
+
+Mide la latencia de classify_issue_locally / generate_branch_name_locally y, con
+--agent, ejecuta /classify_issue para cada issue y reporta el acuerdo entre ambos.
+Las respuestas del agente se guardan en agents/classifier_bench/agent_results.json
+para poder repetir la comparación sin volver a invocarlo (--cached).
+
+Uso:
+    uv run adws/bench_classifier.py [--agent | --cached] [issues.md]
+"""
+
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# Agregar directorio adws al path para imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import get_project_root, make_adw_id
+from local_classifier import classify_issue_locally, generate_branch_name_locally, parse_issues_markdown
+
+RESULTS_FILE = get_project_root() / "agents" / "classifier_bench" / "agent_results.json"
+
+
+def run_agent(issue: Dict[str, Any], adw_id: str) -> Dict[str, Any]:
+    """Clasificar un issue con /classify_issue y medir su latencia."""
+    from agent import execute_template
+    from data_types import AgentTemplateRequest
+
+    start = time.perf_counter()
+    result = execute_template(AgentTemplateRequest(
+        slash_command="/classify_issue",
+        args=[str(issue["number"]), issue["title"], issue["body"]],
+        adw_id=adw_id,
+        agent_name="classifier",
+        model="sonnet",
+        use_cache=False
+    ))
+    elapsed = time.perf_counter() - start
+
+    command = None
+    for line in result.output.strip().split("\n"):
+        line = line.strip().strip("`")
+        if line in ("/feature", "/bug", "/chore", "0"):
+            command = line
+            break
+    return {"command": command, "seconds": elapsed, "success": result.success}
+
+
+def main() -> None:
+    """Ejecutar el benchmark e imprimir la tabla comparativa."""
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    use_agent = "--agent" in sys.argv
+    use_cached = "--cached" in sys.argv
+    issues_file = Path(args[0]) if args else get_project_root() / "issues.md"
+
+    issues = parse_issues_markdown(issues_file.read_text(encoding="utf-8"))
+    if not issues:
+        print(f"No issues found in {issues_file}")
+        sys.exit(1)
+
+    agent_results: Dict[str, Any] = {}
+    if use_cached and RESULTS_FILE.exists():
+        agent_results = json.loads(RESULTS_FILE.read_text(encoding="utf-8"))
+    elif use_agent:
+        adw_id = make_adw_id()
+        for issue in issues:
+            print(f"Classifying issue {issue['number']} with the agent...")
+            agent_results[str(issue["number"])] = run_agent(issue, adw_id)
+        RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS_FILE.write_text(json.dumps(agent_results, indent=2), encoding="utf-8")
+
+    local_us = []
+    agreed = compared = confident_count = 0
+    print(f"{'#':>3} {'local':<9} {'conf':<5} {'local us':>9} {'agent':<9} {'agent s':>8}  branch")
+    for issue in issues:
+        start = time.perf_counter()
+        local = classify_issue_locally(issue)
+        branch = generate_branch_name_locally(
+            issue["number"], issue["title"], make_adw_id(), local.command if local.confident else None
+        )
+        elapsed_us = (time.perf_counter() - start) * 1_000_000
+        local_us.append(elapsed_us)
+        confident_count += local.confident
+
+        agent: Optional[Dict[str, Any]] = agent_results.get(str(issue["number"]))
+        agent_command = agent["command"] if agent else None
+        if agent and local.confident:
+            compared += 1
+            agreed += local.command == agent_command
+
+        print(
+            f"{issue['number']:>3} {local.command or '-':<9} {'yes' if local.confident else 'no':<5} "
+            f"{elapsed_us:>9.0f} {agent_command or '-':<9} {agent['seconds'] if agent else 0:>8.1f}  {branch or '-'}"
+        )
+
+    print()
+    print(f"Issues: {len(issues)}")
+    print(f"Local answers confident: {confident_count}/{len(issues)} (the rest fall back to the agent)")
+    print(f"Local latency: median {statistics.median(local_us):.0f} us, max {max(local_us):.0f} us")
+    if agent_results:
+        agent_seconds = [result["seconds"] for result in agent_results.values()]
+        print(f"Agent latency: median {statistics.median(agent_seconds):.1f} s, max {max(agent_seconds):.1f} s")
+        if compared:
+            print(f"Agreement on confident answers: {agreed}/{compared} ({agreed / compared:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+CLI de Claude Code simulado para el benchmark del orquestador.
+
+Acepta los mismos argumentos que `claude -p <prompt> --output-format stream-json`
+y emite stream-json realista (init, mensajes de assistant con tool_use de tamaño
+configurable y un mensaje result con duración, uso de tokens y costo) durante la
+latencia configurada. Además produce los efectos secundarios que el workflow
+espera de cada comando slash: la spec en specs/, cambios de código, la
+documentación en app_docs/, el commit y el PR en el stub de GitHub.
+
+No lee variables de entorno (agent.py filtra el entorno del proceso de Claude):
+bench_orchestrator.py genera un lanzador que pasa --bench-config con la ruta de un
+JSON con la configuración.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, Any, List, Tuple
+
+# Configuración por defecto (se sobreescribe con el JSON de --bench-config)
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "latency": 0.5,            # segundos por llamada
+    "latencies": {},           # comando slash -> segundos (sobreescribe latency)
+    "messages": 8,             # mensajes de assistant por llamada
+    "message_bytes": 2048,     # tamaño del input de cada tool_use
+    "github_api_base": None,   # URL del stub de GitHub
+    "repo": "bench/bench",     # owner/name
+    "log_file": None,          # JSONL con una línea por invocación
+}
+
+PLANNERS = ("/feature", "/bug", "/chore")
+
+
+def parse_args(argv: List[str]) -> Tuple[Dict[str, Any], str]:
+    """Obtener la configuración y el prompt de los argumentos."""
+    config = dict(DEFAULT_CONFIG)
+    prompt = ""
+    index = 0
+    while index < len(argv):
+        arg = argv[index]
+        if arg == "--bench-config":
+            with open(argv[index + 1], "r", encoding="utf-8") as f:
+                config.update(json.load(f))
+            index += 2
+        elif arg == "-p":
+            prompt = argv[index + 1]
+            index += 2
+        else:
+            index += 1
+    return config, prompt
+
+
+def git(*args: str) -> str:
+    """Ejecutar git en el directorio actual y retornar stdout."""
+    result = subprocess.run(["git", *args], capture_output=True, encoding="utf-8")
+    return result.stdout.strip()
+
+
+def slug_for(prompt: str) -> str:
+    """Identificador estable y corto para los archivos que produce una llamada."""
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+
+
+def github_request(config: Dict[str, Any], method: str, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Hacer un request JSON al stub de GitHub."""
+    request = urllib.request.Request(
+        f"{config['github_api_base']}{endpoint}",
+        data=json.dumps(data).encode("utf-8"),
+        method=method,
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def run_command(config: Dict[str, Any], command: str, args: List[str], prompt: str) -> str:
+    """Producir los efectos secundarios de un comando slash y retornar su resultado."""
+    issue_number = args[0] if args and args[0].isdigit() else "0"
+    slug = slug_for(prompt)
+
+    if command == "/classify_issue":
+        return "/feature"
+    if command == "/generate_branch_name":
+        return f"feature-issue-{issue_number}-bench-{slug}"
+    if command in PLANNERS:
+        os.makedirs("specs", exist_ok=True)
+        spec = f"specs/issue-{issue_number}-bench-{slug}.md"
+        with open(spec, "w", encoding="utf-8") as f:
+            f.write(f"# Bench plan {slug}\n\n" + "- step\n" * 40)
+        return f"Plan created at {spec}"
+    if command == "/implement":
+        os.makedirs("js", exist_ok=True)
+        with open(f"js/bench-{slug}.js", "w", encoding="utf-8") as f:
+            f.write("// bench\n" + "console.log('bench');\n" * 40)
+        return "Implementation complete"
+    if command == "/review":
+        return json.dumps({
+            "success": True,
+            "review_summary": "Bench review",
+            "review_issues": [],
+            "screenshots": [],
+        })
+    if command == "/document":
+        os.makedirs("app_docs", exist_ok=True)
+        doc = f"app_docs/bench-{slug}.md"
+        with open(doc, "w", encoding="utf-8") as f:
+            f.write(f"# Bench docs {slug}\n")
+        return doc
+    if command == "/commit":
+        git("add", "-A")
+        git("commit", "-q", "-m", f"bench: changes {slug}")
+        return "Committed"
+    if command == "/pull_request":
+        branch = git("rev-parse", "--abbrev-ref", "HEAD")
+        if config["github_api_base"]:
+            pr = github_request(config, "POST", f"/repos/{config['repo']}/pulls", {
+                "title": f"Bench PR {slug}", "body": "bench", "head": branch, "base": "main",
+            })
+            return pr["html_url"]
+        return f"https://github.com/{config['repo']}/pull/1"
+    return "ok"
+
+
+def emit(message: Dict[str, Any]) -> None:
+    """Escribir un mensaje stream-json."""
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main() -> None:
+    """Simular una ejecución de `claude -p`."""
+    if "--version" in sys.argv:
+        print("0.0.0 (bench fake)")
+        return
+
+    config, prompt = parse_args(sys.argv[1:])
+    parts = prompt.split()
+    command = parts[0] if parts else ""
+    latency = float(config["latencies"].get(command, config["latency"]))
+    start = time.monotonic()
+    session_id = f"bench-{slug_for(prompt + str(start))}"
+
+    emit({"type": "system", "subtype": "init", "session_id": session_id, "cwd": os.getcwd()})
+    messages = max(1, int(config["messages"]))
+    payload = "x" * int(config["message_bytes"])
+    for index in range(messages):
+        time.sleep(latency / messages)
+        emit({
+            "type": "assistant",
+            "session_id": session_id,
+            "message": {"content": [{"type": "tool_use", "name": "Read", "input": {"index": index, "data": payload}}]},
+        })
+
+    result = run_command(config, command, parts[1:], prompt)
+    elapsed = time.monotonic() - start
+    output_tokens = len(result) // 4 + 50
+    input_tokens = messages * int(config["message_bytes"]) // 4
+    emit({
+        "type": "result",
+        "subtype": "success",
+        "is_error": False,
+        "result": result,
+        "session_id": session_id,
+        "duration_ms": int(elapsed * 1000),
+        "duration_api_ms": int(elapsed * 1000),
+        "num_turns": messages,
+        "total_cost_usd": round((input_tokens * 3 + output_tokens * 15) / 1_000_000, 6),
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+        },
+    })
+
+    if config["log_file"]:
+        with open(config["log_file"], "a", encoding="utf-8") as f:
+            f.write(json.dumps({"cwd": os.getcwd(), "command": command, "seconds": elapsed}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita los endpoints de la API de GitHub usados por ADW.
+
+Mantiene issues, comentarios y pull requests en memoria, responde GETs
+condicionales con ETag/304 como la API real y cuenta los requests por método y
+ruta para el benchmark del orquestador. Se usa apuntando GITHUB_API_BASE a la
+URL del servidor.
+
+Uso:
+    python adws/bench_github_stub.py [puerto]
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+# Rutas soportadas: (método, patrón, nombre de la ruta para las estadísticas)
+ROUTES: List[Tuple[str, re.Pattern, str]] = [
+    ("GET", re.compile(r"^/repos/[^/]+/[^/]+/issues/(\d+)$"), "get_issue"),
+    ("PATCH", re.compile(r"^/repos/[^/]+/[^/]+/issues/(\d+)$"), "update_issue"),
+    ("GET", re.compile(r"^/repos/[^/]+/[^/]+/issues/(\d+)/comments$"), "list_comments"),
+    ("POST", re.compile(r"^/repos/[^/]+/[^/]+/issues/(\d+)/comments$"), "create_comment"),
+    ("PATCH", re.compile(r"^/repos/[^/]+/[^/]+/issues/comments/(\d+)$"), "update_comment"),
+    ("POST", re.compile(r"^/repos/[^/]+/[^/]+/issues/(\d+)/labels$"), "add_labels"),
+    ("GET", re.compile(r"^/repos/[^/]+/[^/]+/pulls$"), "list_pulls"),
+    ("POST", re.compile(r"^/repos/[^/]+/[^/]+/pulls$"), "create_pull"),
+    ("PATCH", re.compile(r"^/repos/[^/]+/[^/]+/pulls/(\d+)$"), "update_pull"),
+]
+
+
+class GitHubStub:
+    """Estado en memoria del stub y servidor HTTP que lo expone."""
+
+    def __init__(self, port: int = 0, latency: float = 0.0):
+        """
+        Args:
+            port: Puerto local (0 elige uno libre)
+            latency: Segundos de espera agregados a cada respuesta
+        """
+        self.latency = latency
+        self.issues: Dict[int, Dict[str, Any]] = {}
+        self.comments: Dict[int, Dict[str, Any]] = {}
+        self.pulls: List[Dict[str, Any]] = []
+        self.counts: Counter = Counter()
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL base para GITHUB_API_BASE."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_issue(self, number: int, title: str, body: str, labels: Optional[List[str]] = None) -> None:
+        """Crear un issue abierto."""
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.issues[number] = {
+            "number": number,
+            "title": title,
+            "body": body,
+            "state": "open",
+            "user": {"login": "bench"},
+            "created_at": now,
+            "updated_at": now,
+            "labels": [{"name": label} for label in labels or []],
+            "html_url": f"https://github.com/bench/bench/issues/{number}",
+        }
+
+    def start(self) -> "GitHubStub":
+        """Servir en un hilo en segundo plano."""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="github-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Detener el servidor."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        """Requests recibidos por ruta (y el total)."""
+        with self._lock:
+            counts = dict(self.counts)
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: Any) -> Tuple[int, Any]:
+        """Resolver un request y retornar (status, payload)."""
+        for route_method, pattern, name in ROUTES:
+            match = pattern.match(path)
+            if route_method != method or not match:
+                continue
+            with self._lock:
+                self.counts[name] += 1
+                return self._dispatch(name, match, query, body or {})
+        with self._lock:
+            self.counts["not_found"] += 1
+        return 404, {"message": "Not Found"}
+
+    def _dispatch(self, name: str, match: re.Match, query: Dict[str, List[str]], body: Dict[str, Any]) -> Tuple[int, Any]:
+        """Aplicar una ruta al estado en memoria (se llama con el lock tomado)."""
+        if name in ("get_issue", "update_issue", "list_comments", "create_comment", "add_labels"):
+            issue = self.issues.get(int(match.group(1)))
+            if issue is None:
+                return 404, {"message": "Not Found"}
+            if name == "get_issue":
+                return 200, issue
+            if name == "update_issue":
+                issue.update({key: value for key, value in body.items() if key in ("state", "title", "body")})
+                return 200, issue
+            if name == "list_comments":
+                page = int(query.get("page", ["1"])[0])
+                per_page = int(query.get("per_page", ["30"])[0])
+                comments = [c for c in self.comments.values() if c["issue_number"] == issue["number"]]
+                return 200, comments[(page - 1) * per_page:page * per_page]
+            if name == "create_comment":
+                comment = {"id": self._new_id(), "issue_number": issue["number"], "body": body.get("body", "")}
+                self.comments[comment["id"]] = comment
+                return 201, comment
+            issue["labels"].extend({"name": label} for label in body.get("labels", []))
+            return 200, issue["labels"]
+
+        if name == "update_comment":
+            comment = self.comments.get(int(match.group(1)))
+            if comment is None:
+                return 404, {"message": "Not Found"}
+            comment["body"] = body.get("body", "")
+            return 200, comment
+
+        if name == "list_pulls":
+            head = query.get("head", [""])[0].split(":")[-1]
+            return 200, [pull for pull in self.pulls if not head or pull["head"]["ref"] == head]
+
+        if name == "create_pull":
+            number = self._new_id()
+            pull = {
+                "number": number,
+                "title": body.get("title", ""),
+                "body": body.get("body", ""),
+                "state": "open",
+                "head": {"ref": body.get("head", "")},
+                "base": {"ref": body.get("base", "main")},
+                "html_url": f"https://github.com/bench/bench/pull/{number}",
+            }
+            self.pulls.append(pull)
+            return 201, pull
+
+        # update_pull
+        for pull in self.pulls:
+            if pull["number"] == int(match.group(1)):
+                pull.update({key: value for key, value in body.items() if key in ("title", "body")})
+                return 200, pull
+        return 404, {"message": "Not Found"}
+
+    def _handler_class(self):
+        """Crear la clase de handler HTTP ligada a este stub."""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self) -> None:
+                if stub.latency:
+                    time.sleep(stub.latency)
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                status, payload = stub.handle(self.command, parsed.path, parse_qs(parsed.query), body)
+
+                data = json.dumps(payload).encode("utf-8")
+                etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+                if self.command == "GET" and status == 200 and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if self.command == "GET":
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = _respond
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    stub = GitHubStub(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    stub.add_issue(1, "feat: bench issue", "Agregar un botón para reiniciar el juego.")
+    print(f"GitHub stub listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,368 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["python-dotenv", "pydantic", "requests"]
+# ///
+
+"""
+Benchmark de punta a punta del orquestador sin agentes reales ni api.github.com.
+
+Crea un sandbox temporal con una copia del proyecto (adws/ y la app), un remote
+git bare local, el stub de GitHub (bench_github_stub.py) y un lanzador del CLI
+simulado (bench_fake_claude.py). Ejecuta N veces adw_plan_build_review_document.py
+con la concurrencia indicada y reporta:
+
+- Duración de cada fase y su overhead de orquestación (duración de la fase menos
+  el tiempo de las llamadas al agente simulado de esa fase)
+- Pico de memoria (max RSS) de los procesos de workflow
+- Requests a la API de GitHub por ruta y por ejecución
+- Throughput (ejecuciones por minuto) con N ejecuciones concurrentes
+
+El reporte se guarda en JSON (agents/bench/orchestrator.json por defecto) para
+seguir regresiones; --compare muestra la variación contra un reporte anterior.
+
+Uso:
+    uv run adws/bench_orchestrator.py [--runs 4] [--concurrency 2] [--latency 0.5]
+        [--messages 8] [--message-bytes 2048] [--github-latency 0]
+        [--output archivo.json] [--compare baseline.json] [--keep]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+# Agregar directorio adws al path para imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+from utils import get_project_root, make_adw_id
+from bench_github_stub import GitHubStub
+
+ADWS_DIR = Path(__file__).parent
+DEFAULT_OUTPUT = get_project_root() / "agents" / "bench" / "orchestrator.json"
+
+# Archivos del proyecto copiados al sandbox
+PROJECT_FILES = ["adws", "index.html", "css", "js"]
+
+# Fase del workflow -> comandos slash que ejecuta
+PHASE_COMMANDS: Dict[str, List[str]] = {
+    "classify": ["/classify_issue"],
+    "branch": ["/generate_branch_name"],
+    "plan": ["/feature", "/bug", "/chore"],
+    "implement": ["/implement"],
+    "review": ["/review"],
+    "document": ["/document"],
+    "commit": ["/commit"],
+    "pull_request": ["/pull_request"],
+}
+
+# Métricas comparadas con --compare: clave -> (descripción, True si más alto es mejor)
+COMPARED_METRICS = {
+    "run_wall_seconds_mean": ("Mean run wall time (s)", False),
+    "overhead_seconds_mean": ("Mean orchestration overhead per run (s)", False),
+    "throughput_runs_per_minute": ("Throughput (runs/min)", True),
+    "peak_rss_mb": ("Peak workflow RSS (MB)", False),
+    "github_requests_per_run": ("GitHub requests per run", False),
+}
+
+
+def git(cwd: Path, *args: str) -> None:
+    """Ejecutar git en el sandbox y fallar si el comando falla."""
+    subprocess.run(["git", *args], cwd=str(cwd), check=True, capture_output=True)
+
+
+def create_sandbox(root: Path) -> Path:
+    """
+    Crear una copia del proyecto con su propio repositorio y remote bare.
+
+    Returns:
+        Path: Raíz del proyecto dentro del sandbox
+    """
+    project = root / "project"
+    project.mkdir(parents=True)
+    for name in PROJECT_FILES:
+        source = get_project_root() / name
+        if source.is_dir():
+            shutil.copytree(source, project / name, ignore=shutil.ignore_patterns("__pycache__", ".env"))
+        elif source.exists():
+            shutil.copy2(source, project / name)
+    (project / ".gitignore").write_text("agents/\ntrees/\n", encoding="utf-8")
+
+    git(project, "init", "-q", "-b", "main")
+    git(project, "config", "user.name", "ADW Bench")
+    git(project, "config", "user.email", "bench@example.com")
+    git(project, "add", "-A")
+    git(project, "commit", "-q", "-m", "bench: initial commit")
+
+    origin = root / "origin.git"
+    git(root, "init", "-q", "--bare", str(origin))
+    git(project, "remote", "add", "origin", str(origin))
+    git(project, "push", "-q", "origin", "main")
+    return project
+
+
+def write_fake_claude(root: Path, config: Dict[str, Any]) -> Path:
+    """Escribir la configuración del CLI simulado y un lanzador ejecutable."""
+    config_file = root / "fake_claude.json"
+    config_file.write_text(json.dumps(config, indent=2), encoding="utf-8")
+    launcher = root / "bin" / "claude"
+    launcher.parent.mkdir(parents=True, exist_ok=True)
+    launcher.write_text(
+        f'#!/bin/sh\nexec "{sys.executable}" "{ADWS_DIR / "bench_fake_claude.py"}" '
+        f'--bench-config "{config_file}" "$@"\n',
+        encoding="utf-8"
+    )
+    launcher.chmod(0o755)
+    return launcher
+
+
+def run_workflow(project: Path, env: Dict[str, str], issue_number: int, adw_id: str) -> Dict[str, Any]:
+    """Ejecutar un workflow y medir su tiempo de pared y su pico de memoria."""
+    log_file = project / "agents" / f"bench-{adw_id}.log"
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    start = time.monotonic()
+    with open(log_file, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(
+            [sys.executable, str(project / "adws" / "adw_plan_build_review_document.py"), str(issue_number), adw_id],
+            cwd=str(project),
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT
+        )
+        # wait4 retorna el uso de recursos de este hijo (incluye a sus descendientes)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.monotonic() - start
+
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    report_file = project / "trees" / adw_id / "agents" / adw_id / "pipeline_report.json"
+    report = json.loads(report_file.read_text(encoding="utf-8")) if report_file.exists() else None
+    return {
+        "adw_id": adw_id,
+        "issue_number": issue_number,
+        "exit_code": process.returncode,
+        "wall_seconds": wall,
+        "rss_mb": rss_mb,
+        "pipeline": report,
+        "log": str(log_file),
+    }
+
+
+def agent_seconds_by_run(log_file: Path) -> Dict[str, Dict[str, float]]:
+    """Sumar el tiempo del agente simulado por adw_id y comando slash."""
+    totals: Dict[str, Dict[str, float]] = {}
+    if not log_file.exists():
+        return totals
+    for line in log_file.read_text(encoding="utf-8").splitlines():
+        record = json.loads(line)
+        # El agente corre en trees/{adw_id}
+        adw_id = Path(record["cwd"]).name
+        commands = totals.setdefault(adw_id, {})
+        commands[record["command"]] = commands.get(record["command"], 0.0) + record["seconds"]
+    return totals
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por el método del rango más cercano."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def summarize(
+    runs: List[Dict[str, Any]],
+    agent_seconds: Dict[str, Dict[str, float]],
+    github_stats: Dict[str, int],
+    total_wall: float,
+    settings: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Construir el reporte del benchmark."""
+    successful = [run for run in runs if run["exit_code"] == 0 and run["pipeline"]]
+
+    phases: Dict[str, Dict[str, List[float]]] = {}
+    run_overheads = []
+    for run in successful:
+        commands = agent_seconds.get(run["adw_id"], {})
+        overhead_total = 0.0
+        for phase, seconds in run["pipeline"]["phases"].items():
+            agent = sum(commands.get(command, 0.0) for command in PHASE_COMMANDS.get(phase, []))
+            overhead = max(0.0, seconds - agent)
+            overhead_total += overhead
+            entry = phases.setdefault(phase, {"seconds": [], "agent_seconds": [], "overhead_seconds": []})
+            entry["seconds"].append(seconds)
+            entry["agent_seconds"].append(agent)
+            entry["overhead_seconds"].append(overhead)
+        run_overheads.append(overhead_total)
+
+    phase_summary = {
+        phase: {
+            "seconds_mean": statistics.mean(values["seconds"]),
+            "seconds_p95": percentile(values["seconds"], 0.95),
+            "agent_seconds_mean": statistics.mean(values["agent_seconds"]),
+            "overhead_seconds_mean": statistics.mean(values["overhead_seconds"]),
+            "overhead_seconds_max": max(values["overhead_seconds"]),
+        }
+        for phase, values in phases.items()
+    }
+    walls = [run["wall_seconds"] for run in successful]
+    return {
+        "settings": settings,
+        "runs": len(runs),
+        "succeeded": len(successful),
+        "total_wall_seconds": total_wall,
+        "throughput_runs_per_minute": len(successful) / total_wall * 60 if total_wall else 0.0,
+        "run_wall_seconds_mean": statistics.mean(walls) if walls else None,
+        "run_wall_seconds_p95": percentile(walls, 0.95) if walls else None,
+        "overhead_seconds_mean": statistics.mean(run_overheads) if run_overheads else None,
+        "peak_rss_mb": max(run["rss_mb"] for run in runs) if runs else None,
+        "github_requests": github_stats,
+        "github_requests_per_run": github_stats.get("total", 0) / len(runs) if runs else 0.0,
+        "phases": phase_summary,
+        "failed_runs": [
+            {"adw_id": run["adw_id"], "exit_code": run["exit_code"], "log": run["log"]}
+            for run in runs if run not in successful
+        ],
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Imprimir el reporte en formato de tabla."""
+    print(f"\n{'phase':<14} {'mean s':>8} {'p95 s':>8} {'agent s':>8} {'overhead s':>11} {'max ovh s':>10}")
+    for phase, values in report["phases"].items():
+        print(
+            f"{phase:<14} {values['seconds_mean']:>8.3f} {values['seconds_p95']:>8.3f} "
+            f"{values['agent_seconds_mean']:>8.3f} {values['overhead_seconds_mean']:>11.3f} "
+            f"{values['overhead_seconds_max']:>10.3f}"
+        )
+    print()
+    print(f"Runs: {report['succeeded']}/{report['runs']} succeeded "
+          f"(concurrency {report['settings']['concurrency']})")
+    if report["run_wall_seconds_mean"] is not None:
+        print(f"Run wall time: mean {report['run_wall_seconds_mean']:.2f}s, p95 {report['run_wall_seconds_p95']:.2f}s")
+        print(f"Orchestration overhead per run: mean {report['overhead_seconds_mean']:.2f}s")
+    print(f"Throughput: {report['throughput_runs_per_minute']:.2f} runs/min "
+          f"({report['total_wall_seconds']:.1f}s total)")
+    print(f"Peak workflow RSS: {report['peak_rss_mb']:.1f} MB")
+    routes = ", ".join(f"{route}={count}" for route, count in sorted(report["github_requests"].items()) if route != "total")
+    print(f"GitHub requests: {report['github_requests'].get('total', 0)} "
+          f"({report['github_requests_per_run']:.1f}/run): {routes}")
+    for failed in report["failed_runs"]:
+        print(f"FAILED {failed['adw_id']} (exit {failed['exit_code']}), log: {failed['log']}")
+    if report["failed_runs"] and not report["settings"].get("keep"):
+        print("Rerun with --keep to inspect the logs of failed runs")
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Imprimir la variación de las métricas principales contra un reporte anterior."""
+    print("\nComparison against baseline:")
+    for key, (label, higher_is_better) in COMPARED_METRICS.items():
+        current, previous = report.get(key), baseline.get(key)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous * 100
+        worse = change < 0 if higher_is_better else change > 0
+        marker = "  <-- regression" if worse and abs(change) >= 10 else ""
+        print(f"  {label:<42} {previous:>9.2f} -> {current:>9.2f} ({change:+.1f}%){marker}")
+
+
+def main() -> None:
+    """Ejecutar el benchmark."""
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the ADW orchestrator")
+    parser.add_argument("--runs", type=int, default=4, help="Number of workflow runs")
+    parser.add_argument("--concurrency", type=int, default=2, help="Runs executing at the same time")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per fake Claude call")
+    parser.add_argument("--messages", type=int, default=8, help="Assistant messages per fake Claude call")
+    parser.add_argument("--message-bytes", type=int, default=2048, help="Payload bytes per assistant message")
+    parser.add_argument("--github-latency", type=float, default=0.0, help="Seconds added to each stub response")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="JSON report path")
+    parser.add_argument("--compare", type=Path, help="Previous JSON report to compare against")
+    parser.add_argument("--keep", action="store_true", help="Keep the sandbox directory")
+    args = parser.parse_args()
+
+    settings = {
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "latency": args.latency,
+        "messages": args.messages,
+        "message_bytes": args.message_bytes,
+        "github_latency": args.github_latency,
+        "keep": args.keep,
+    }
+
+    root = Path(tempfile.mkdtemp(prefix="adw-bench-"))
+    stub = GitHubStub(latency=args.github_latency).start()
+    try:
+        project = create_sandbox(root)
+        for issue_number in range(1, args.runs + 1):
+            stub.add_issue(
+                issue_number,
+                f"feat: bench issue {issue_number}",
+                "Agregar un botón para reiniciar el juego y mostrar el puntaje final."
+            )
+
+        agent_log = root / "fake_claude.jsonl"
+        launcher = write_fake_claude(root, {
+            "latency": args.latency,
+            "messages": args.messages,
+            "message_bytes": args.message_bytes,
+            "github_api_base": stub.url,
+            "repo": "bench/bench",
+            "log_file": str(agent_log),
+        })
+
+        env = dict(os.environ)
+        env.update({
+            "CLAUDE_CODE_PATH": str(launcher),
+            "ANTHROPIC_API_KEY": "bench",
+            "GITHUB_API_BASE": stub.url,
+            "GITHUB_REPO_OWNER": "bench",
+            "GITHUB_REPO_NAME": "bench",
+            "GITHUB_PAT": "bench",
+            "ADW_USE_WORKTREES": "true",
+            "ADW_PHASE_CACHE": "false",
+            "ADW_OUTBOX_DB": str(project / "agents" / "adw_outbox.sqlite3"),
+            "ADW_PHASE_CACHE_DB": str(project / "agents" / "adw_phase_cache.sqlite3"),
+            "ADW_METRICS_FILE": str(project / "agents" / "adw_metrics.jsonl"),
+        })
+
+        print(f"Running {args.runs} workflows with concurrency {args.concurrency} in {root}")
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+            futures = [
+                executor.submit(run_workflow, project, env, issue_number, make_adw_id())
+                for issue_number in range(1, args.runs + 1)
+            ]
+            runs = [future.result() for future in futures]
+        total_wall = time.monotonic() - start
+
+        report = summarize(runs, agent_seconds_by_run(agent_log), stub.stats(), total_wall, settings)
+    finally:
+        stub.stop()
+        if args.keep:
+            print(f"Sandbox kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_report(report)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport saved to {args.output}")
+
+    if args.compare:
+        baseline: Optional[Dict[str, Any]] = json.loads(args.compare.read_text(encoding="utf-8"))
+        print_comparison(report, baseline)
+
+    if report["succeeded"] < report["runs"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
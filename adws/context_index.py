@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Índice de contexto del repositorio para los agentes planificadores e implementador.
+
+En lugar de que cada agente explore index.html, js/*.js y css/styles.css con
+llamadas a herramientas, el orquestador arma un resumen compacto del proyecto
+(archivos y tamaños, funciones de nivel superior, IDs del HTML, selectores CSS y
+los últimos commits) y se lo pasa al agente con --append-system-prompt.
+
+El índice completo se guarda por hash del árbol (el mismo que usa la caché de
+fases: árbol de HEAD más cambios sin commitear), y el resumen de cada archivo
+por su blob id de git, así que un árbol nuevo solo vuelve a parsear los archivos
+que cambiaron.
+
+Uso:
+    python adws/context_index.py     # imprimir el índice del checkout actual
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from git_ops import git_output
+from phase_cache import tree_hash
+from run_logging import get_logger
+from utils import get_project_root
+
+logger = get_logger("context_index")
+
+# Configuración del índice
+CONTEXT_INDEX_ENABLED = os.getenv("ADW_CONTEXT_INDEX", "true").lower() in ("1", "true", "yes")
+CONTEXT_INDEX_DB_PATH = os.getenv("ADW_CONTEXT_INDEX_DB") or str(get_project_root() / "agents" / "adw_context_index.sqlite3")
+# Tamaño máximo del índice renderizado (caracteres)
+CONTEXT_INDEX_MAX_CHARS = int(os.getenv("ADW_CONTEXT_INDEX_MAX_CHARS") or "12000")
+# Índices completos conservados (uno por árbol)
+CONTEXT_INDEX_MAX_TREES = 50
+
+# Comandos slash que reciben el índice
+CONTEXT_INDEX_COMMANDS = {"/feature", "/bug", "/chore", "/implement"}
+
+# Archivos que se indexan y directorios que no son parte de la aplicación
+INDEXED_EXTENSIONS = {".html", ".js", ".css"}
+EXCLUDED_DIRS = ("adws/", "agents/", "trees/", ".github/", ".claude/", "specs/", "app_docs/", "node_modules/")
+
+# Símbolos máximos listados por archivo
+MAX_SYMBOLS_PER_FILE = 80
+
+# Versión del formato de los resúmenes (cambiarla invalida los guardados)
+SUMMARY_VERSION = 1
+
+JS_FUNCTION_PATTERNS = [
+    re.compile(r"^\s*(?:export\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*\("),
+    re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)"),
+    re.compile(r"^\s*(?:export\s+)?class\s+([A-Za-z_$][\w$]*)"),
+]
+JS_IMPORT_PATTERN = re.compile(r"^\s*import\s+.*?from\s+['\"]([^'\"]+)['\"]")
+JS_EXPORT_PATTERN = re.compile(r"^\s*export\s+(?:default\s+)?(?:\{([^}]*)\}|(?:async\s+)?(?:function|class|const|let|var)\s+([A-Za-z_$][\w$]*))")
+HTML_ID_PATTERN = re.compile(r"\bid=[\"']([^\"']+)[\"']")
+HTML_ASSET_PATTERN = re.compile(r"<(?:script|link)\b[^>]*\b(?:src|href)=[\"']([^\"']+)[\"']")
+CSS_COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.S)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_summaries (
+    blob_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (blob_id, version)
+);
+CREATE TABLE IF NOT EXISTS indexes (
+    tree TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+
+
+def blob_id(data: bytes) -> str:
+    """Blob id de git (SHA-1 de "blob <tamaño>\\0<contenido>") de un contenido."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _summarize_js(text: str) -> Dict[str, Any]:
+    """Funciones, clases, imports y exports de un archivo JavaScript."""
+    symbols: List[str] = []
+    imports: List[str] = []
+    exports: List[str] = []
+    for number, line in enumerate(text.splitlines(), 1):
+        for pattern in JS_FUNCTION_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                symbols.append(f"{match.group(1)}:{number}")
+                break
+        match = JS_IMPORT_PATTERN.match(line)
+        if match:
+            imports.append(match.group(1))
+        match = JS_EXPORT_PATTERN.match(line)
+        if match:
+            names = match.group(1) or match.group(2) or ""
+            exports.extend(name.strip().split(" as ")[-1] for name in names.split(",") if name.strip())
+    return {"symbols": symbols, "imports": imports, "exports": exports}
+
+
+def _summarize_html(text: str) -> Dict[str, Any]:
+    """IDs de elementos y scripts/hojas de estilo de un HTML."""
+    return {
+        "symbols": list(dict.fromkeys(f"#{element_id}" for element_id in HTML_ID_PATTERN.findall(text))),
+        "imports": list(dict.fromkeys(HTML_ASSET_PATTERN.findall(text))),
+    }
+
+
+def _summarize_css(text: str) -> Dict[str, Any]:
+    """Selectores de clase e ID y media queries de una hoja de estilo."""
+    text = CSS_COMMENT_PATTERN.sub("", text)
+    selectors: Dict[str, None] = {}
+    media = 0
+    for block in re.findall(r"([^{}]+)\{", text):
+        block = " ".join(block.split())
+        if block.startswith("@media"):
+            media += 1
+            continue
+        if block.startswith("@"):
+            continue
+        for selector in block.split(","):
+            # Quedarse con el primer selector de clase/ID de cada regla
+            match = re.search(r"[.#][A-Za-z_-][\w-]*", selector)
+            if match:
+                selectors[match.group(0)] = None
+    return {"symbols": list(selectors), "media_queries": media}
+
+
+SUMMARIZERS = {".js": _summarize_js, ".html": _summarize_html, ".css": _summarize_css}
+
+
+def summarize_file(path: str, data: bytes) -> Dict[str, Any]:
+    """Resumir un archivo según su extensión."""
+    text = data.decode("utf-8", errors="replace")
+    summary = SUMMARIZERS[Path(path).suffix](text)
+    summary["lines"] = text.count("\n") + 1
+    return summary
+
+
+class ContextIndex:
+    """Índice de contexto cacheado por árbol, con resúmenes por blob id."""
+
+    def __init__(self, db_path: str = CONTEXT_INDEX_DB_PATH):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva (una por operación, segura entre hilos)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _list_files(self, cwd: Path) -> List[Tuple[str, Optional[str]]]:
+        """
+        Archivos a indexar con su blob id (None si tienen cambios sin commitear).
+
+        Los blob ids salen del índice de git, sin leer los archivos.
+        """
+        dirty = set()
+        for line in git_output(["status", "--porcelain", "-uall"], cwd).splitlines():
+            path = line[3:].strip().strip('"')
+            dirty.add(path.split(" -> ", 1)[-1])
+
+        files: Dict[str, Optional[str]] = {}
+        for line in git_output(["ls-files", "-s"], cwd).splitlines():
+            meta, _, path = line.partition("\t")
+            files[path] = None if path in dirty else meta.split()[1]
+        for path in dirty:
+            files.setdefault(path, None)
+
+        return sorted(
+            (path, blob) for path, blob in files.items()
+            if Path(path).suffix in INDEXED_EXTENSIONS
+            and not path.startswith(EXCLUDED_DIRS)
+            and (cwd / path).is_file()
+        )
+
+    def _recent_changes(self, cwd: Path, limit: int = 5) -> List[str]:
+        """Últimos commits con los archivos que tocaron."""
+        output = git_output(["log", f"-{limit}", "--format=%x00%h %ad %s", "--date=short", "--name-only"], cwd)
+        changes = []
+        for entry in output.split("\x00")[1:]:
+            lines = [line for line in entry.strip().splitlines() if line]
+            if not lines:
+                continue
+            files = [name for name in lines[1:] if not name.startswith(EXCLUDED_DIRS)]
+            suffix = f" ({', '.join(files[:5])}{', ...' if len(files) > 5 else ''})" if files else ""
+            changes.append(lines[0] + suffix)
+        return changes
+
+    def build(self, cwd: Path, tree: Optional[str] = None) -> Tuple[str, Dict[str, int]]:
+        """
+        Obtener el índice de un checkout, reutilizando lo ya calculado.
+
+        Args:
+            cwd: Raíz del checkout (worktree de la ejecución o raíz del proyecto)
+            tree: Hash del árbol si ya se calculó
+
+        Returns:
+            tuple: (texto del índice, estadísticas: files, parsed, cached_index)
+        """
+        tree = tree or tree_hash(cwd)
+        with self._connect() as conn:
+            row = conn.execute("SELECT text FROM indexes WHERE tree = ?", (tree,)).fetchone()
+        if row:
+            return row["text"], {"files": 0, "parsed": 0, "cached_index": 1}
+
+        entries: List[Tuple[str, int, Dict[str, Any]]] = []
+        parsed = 0
+        with self._connect() as conn:
+            for path, blob in self._list_files(cwd):
+                data = None
+                if blob is None:
+                    data = (cwd / path).read_bytes()
+                    blob = blob_id(data)
+                row = conn.execute(
+                    "SELECT summary FROM file_summaries WHERE blob_id = ? AND version = ?", (blob, SUMMARY_VERSION)
+                ).fetchone()
+                if row:
+                    summary = json.loads(row["summary"])
+                else:
+                    data = data if data is not None else (cwd / path).read_bytes()
+                    summary = summarize_file(path, data)
+                    summary["bytes"] = len(data)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO file_summaries (blob_id, version, summary) VALUES (?, ?, ?)",
+                        (blob, SUMMARY_VERSION, json.dumps(summary))
+                    )
+                    parsed += 1
+                entries.append((path, summary["bytes"], summary))
+
+        text = render_index(entries, self._recent_changes(cwd))
+        with _lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO indexes (tree, text, created_at) VALUES (?, ?, ?)",
+                (tree, text, time.time())
+            )
+            conn.execute(
+                "DELETE FROM indexes WHERE tree NOT IN "
+                "(SELECT tree FROM indexes ORDER BY created_at DESC LIMIT ?)",
+                (CONTEXT_INDEX_MAX_TREES,)
+            )
+        return text, {"files": len(entries), "parsed": parsed, "cached_index": 0}
+
+
+def render_index(entries: List[Tuple[str, int, Dict[str, Any]]], recent_changes: List[str]) -> str:
+    """
+    Renderizar el índice como texto compacto para el system prompt.
+
+    Si excede CONTEXT_INDEX_MAX_CHARS se recortan los símbolos de cada archivo
+    antes que la lista de archivos.
+    """
+    def render(max_symbols: int) -> str:
+        lines = [
+            "# Repository context index",
+            "Generated by the orchestrator from the current checkout. Use it to locate code; "
+            "read a file only when you need its contents.",
+            "",
+            "## Files",
+        ]
+        for path, size, summary in entries:
+            lines.append(f"- {path} ({size} bytes, {summary.get('lines', 0)} lines)")
+        for path, _, summary in entries:
+            symbols = summary.get("symbols", [])
+            if not symbols and not summary.get("imports"):
+                continue
+            lines.append("")
+            lines.append(f"## {path}")
+            if summary.get("imports"):
+                lines.append(f"imports: {', '.join(summary['imports'])}")
+            if summary.get("exports"):
+                lines.append(f"exports: {', '.join(summary['exports'])}")
+            if symbols:
+                shown = symbols[:max_symbols]
+                more = f" (+{len(symbols) - len(shown)} more)" if len(symbols) > len(shown) else ""
+                label = "name:line" if path.endswith(".js") else "selectors" if path.endswith(".css") else "ids"
+                lines.append(f"{label}: {', '.join(shown)}{more}")
+        if recent_changes:
+            lines.append("")
+            lines.append("## Recent changes")
+            lines.extend(f"- {change}" for change in recent_changes)
+        return "\n".join(lines) + "\n"
+
+    max_symbols = MAX_SYMBOLS_PER_FILE
+    text = render(max_symbols)
+    while len(text) > CONTEXT_INDEX_MAX_CHARS and max_symbols > 5:
+        max_symbols //= 2
+        text = render(max_symbols)
+    return text[:CONTEXT_INDEX_MAX_CHARS]
+
+
+def context_for_command(slash_command: str, cwd: Path, tree: Optional[str] = None) -> Optional[str]:
+    """
+    Índice de contexto para un comando slash, o None si el comando no lo usa.
+
+    Nunca lanza excepciones: sin índice el agente explora el repositorio como antes.
+    """
+    if not CONTEXT_INDEX_ENABLED or slash_command not in CONTEXT_INDEX_COMMANDS:
+        return None
+    try:
+        text, _ = ContextIndex().build(cwd, tree)
+        return text
+    except (OSError, sqlite3.Error, ValueError) as e:
+        logger.warning(f"Could not build context index: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    index_text, stats = ContextIndex().build(get_project_root())
+    print(index_text)
+    print(f"# {len(index_text)} chars, {json.dumps(stats)}")
@@ -1,6 +1,6 @@
 """Tipos de datos para ADW (Agent Development Workflow)"""
 
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 
 
@@ -13,6 +13,12 @@ class AgentPromptRequest(BaseModel):
     model: str = "sonnet"
     dangerously_skip_permissions: bool = True
     output_file: str
+    working_dir: Optional[str] = None
+    resume_session_id: Optional[str] = None
+    # Presupuesto de tiempo de pared; al agotarse se termina el árbol de procesos
+    timeout_seconds: Optional[float] = None
+    # Contexto extra para el system prompt (índice del repositorio)
+    append_system_prompt: Optional[str] = None
 
 
 class AgentPromptResponse(BaseModel):
@@ -21,6 +27,14 @@ class AgentPromptResponse(BaseModel):
     output: str
     success: bool
     session_id: Optional[str] = None
+    # Datos del mensaje de resultado stream-json (None si no llegó)
+    duration_ms: Optional[int] = None
+    duration_api_ms: Optional[int] = None
+    num_turns: Optional[int] = None
+    total_cost_usd: Optional[float] = None
+    usage: Optional[Dict[str, Any]] = None
+    # El CLI rechazó la sesión a reanudar (no existe o expiró)
+    resume_rejected: bool = False
 
 
 class AgentTemplateRequest(BaseModel):
@@ -31,6 +45,10 @@ class AgentTemplateRequest(BaseModel):
     adw_id: str
     agent_name: str = "ops"
     model: str = "sonnet"
+    # Contexto extra para la clave de caché cuando los args no lo incluyen
+    # (ej. título y cuerpo del issue para los planificadores)
+    cache_context: Optional[str] = None
+    use_cache: bool = True
 
 
 class ClaudeCodeResultMessage(BaseModel):
@@ -40,6 +58,11 @@ class ClaudeCodeResultMessage(BaseModel):
     result: str
     is_error: bool = False
     session_id: Optional[str] = None
+    duration_ms: Optional[int] = None
+    duration_api_ms: Optional[int] = None
+    num_turns: Optional[int] = None
+    total_cost_usd: Optional[float] = None
+    usage: Optional[Dict[str, Any]] = None
 
 
 class GitHubIssue(BaseModel):
@@ -64,3 +87,18 @@ class WorkflowResult(BaseModel):
     issue_number: int
     message: str
     details: Optional[dict] = None
+
+
+class RepoConfig(BaseModel):
+    """Configuración de un repositorio atendido por el servidor de webhooks."""
+
+    # owner/nombre, como llega en repository.full_name del webhook
+    full_name: str
+    # Checkout local donde corren los workflows del repositorio
+    path: str
+    # Workflows del repositorio en paralelo (None = ADW_MAX_WORKERS)
+    max_workers: Optional[int] = None
+    # Variable de entorno con el token de este repositorio (None = GITHUB_PAT)
+    pat_env: Optional[str] = None
+    # Variables de entorno extra para sus workflows
+    env: Dict[str, str] = {}
@@ -0,0 +1,132 @@
+"""
+Operaciones git de los flujos ADW con medición de tiempos.
+
+Todas las llamadas a git del workflow (worktrees, ramas, huellas del checkout
+para la caché de fases, el commit de screenshots y el push único) pasan por
+run_git(), que mide cada operación, la acumula por subcomando para el reporte
+del pipeline y la registra como evento de métricas.
+"""
+
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, List
+
+from metrics import record_git_op
+from run_logging import get_logger
+
+logger = get_logger("git")
+
+# Tiempos acumulados por subcomando en este proceso
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+class GitError(RuntimeError):
+    """Un comando git terminó con error; el mensaje incluye su stderr."""
+
+    def __init__(self, args: List[str], returncode: int, stderr: str):
+        super().__init__(f"git {' '.join(args)} failed: {stderr.strip()}")
+        self.args_list = args
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+def _record(op: str, seconds: float, ok: bool) -> None:
+    """Acumular el tiempo de una operación."""
+    with _stats_lock:
+        entry = _stats.setdefault(op, {"count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0})
+        entry["count"] += 1
+        entry["errors"] += 0 if ok else 1
+        entry["seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+    record_git_op(op, ok, seconds)
+
+
+def run_git(
+    args: List[str],
+    cwd: Path,
+    check: bool = True,
+    timeout: Optional[float] = None
+) -> subprocess.CompletedProcess:
+    """
+    Ejecutar un comando git midiendo su duración.
+
+    Args:
+        args: Argumentos de git (ej. ["push", "-u", "origin", "rama"])
+        cwd: Directorio del checkout (worktree de la ejecución o raíz del proyecto)
+        check: Lanzar GitError si el comando falla
+        timeout: Segundos máximos de ejecución
+
+    Returns:
+        subprocess.CompletedProcess: Resultado con stdout y stderr como texto
+
+    Raises:
+        GitError: Si check es True y git termina con error (o excede el timeout)
+    """
+    op = args[0] if args else "git"
+    start = time.monotonic()
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=str(cwd),
+            capture_output=True,
+            encoding="utf-8",
+            timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        _record(op, time.monotonic() - start, False)
+        raise GitError(args, -1, f"timed out after {timeout}s")
+
+    seconds = time.monotonic() - start
+    ok = result.returncode == 0
+    _record(op, seconds, ok)
+    logger.debug(f"git {op} took {seconds:.3f}s (exit {result.returncode})")
+    if check and not ok:
+        raise GitError(args, result.returncode, result.stderr)
+    return result
+
+
+def git_output(args: List[str], cwd: Path) -> str:
+    """Ejecutar un comando git de solo lectura y retornar su salida ('' si falla)."""
+    result = run_git(args, cwd, check=False)
+    return result.stdout if result.returncode == 0 else ""
+
+
+def commit_paths(cwd: Path, paths: List[str], message: str) -> None:
+    """
+    Agregar rutas al índice y hacer commit solo de ellas.
+
+    El commit se limita a esas rutas aunque haya otros cambios en el índice,
+    así no se lleva cambios de fases que corren en paralelo.
+
+    Raises:
+        GitError: Si git add o git commit fallan
+    """
+    run_git(["add", "--", *paths], cwd)
+    run_git(["commit", "-m", message, "--only", "--", *paths], cwd)
+
+
+def push_branch(cwd: Path, branch_name: str, remote: str = "origin") -> None:
+    """
+    Publicar la rama con sus commits locales (código, documentación y screenshots).
+
+    Raises:
+        GitError: Si el push falla
+    """
+    run_git(["push", "-u", remote, branch_name], cwd)
+
+
+def get_git_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Obtener los tiempos acumulados por subcomando en este proceso.
+
+    Returns:
+        dict: subcomando -> count, errors, seconds y max_seconds
+    """
+    with _stats_lock:
+        return {
+            op: {key: round(value, 3) if isinstance(value, float) else value for key, value in entry.items()}
+            for op, entry in sorted(_stats.items())
+        }
@@ -5,29 +5,104 @@
 
 """Operaciones de API de GitHub para flujos de trabajo ADW."""
 
+import contextvars
 import os
+import re
 import sys
-import shutil
-import subprocess
-from typing import Optional, Dict, Any, List
+import random
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 
 load_dotenv()
 
+from metrics import record_github_request
+from run_logging import get_logger
+from screenshots import store_screenshots, manifest_path
+from git_ops import commit_paths, GitError
+
+# Los mensajes de este módulo van al log de la ejecución en curso
+logger = get_logger("github")
+
 # Obtener configuración de GitHub
 GITHUB_REPO_OWNER = os.getenv("GITHUB_REPO_OWNER", "")
 GITHUB_REPO_NAME = os.getenv("GITHUB_REPO_NAME", "")
 GITHUB_PAT = os.getenv("GITHUB_PAT", "")
 
-# API base URL
-GITHUB_API_BASE = "https://api.github.com"
+# API base URL (se puede apuntar a un stub local, ver bench_orchestrator.py)
+GITHUB_API_BASE = (os.getenv("GITHUB_API_BASE") or "https://api.github.com").rstrip("/")
+
+# Configuración del cliente HTTP
+GITHUB_CONNECT_TIMEOUT = float(os.getenv("GITHUB_CONNECT_TIMEOUT", "5"))
+GITHUB_READ_TIMEOUT = float(os.getenv("GITHUB_READ_TIMEOUT", "30"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "4"))
+GITHUB_BACKOFF_BASE = float(os.getenv("GITHUB_BACKOFF_BASE", "1"))
+GITHUB_BACKOFF_MAX = float(os.getenv("GITHUB_BACKOFF_MAX", "30"))
+# Espera máxima ante un rate limit antes de rendirse (segundos)
+GITHUB_RATE_LIMIT_MAX_SLEEP = float(os.getenv("GITHUB_RATE_LIMIT_MAX_SLEEP", "120"))
+
+# Códigos HTTP que se reintentan
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+# Métodos que se pueden repetir sin efectos duplicados. Un POST (ej. crear un
+# comentario) solo se reintenta si no llegó a enviarse o si GitHub lo rechazó
+# por rate limit: tras un read timeout o un 5xx pudo haberse aplicado.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+
+# Búsqueda del PR de una rama cuando el agente no reporta su URL:
+# intentos y espera inicial (se duplica en cada intento)
+GITHUB_PR_LOOKUP_ATTEMPTS = int(os.getenv("GITHUB_PR_LOOKUP_ATTEMPTS", "5"))
+GITHUB_PR_LOOKUP_DELAY = float(os.getenv("GITHUB_PR_LOOKUP_DELAY", "0.5"))
+
+# URL de un PR en texto libre (ej. la salida de /pull_request)
+PR_URL_PATTERN = re.compile(r"https://github\.com/([\w.-]+)/([\w.-]+)/pull/(\d+)")
+
+# Repositorio de las llamadas del contexto actual (owner, nombre, PAT); si no se
+# fijó se usan GITHUB_REPO_OWNER/GITHUB_REPO_NAME/GITHUB_PAT. El servidor de
+# webhooks atiende varios repositorios y lo fija por hilo (ver repos.py).
+_repo_var: contextvars.ContextVar[Optional[Tuple[str, str, str]]] = contextvars.ContextVar(
+    "github_repo", default=None
+)
+
+# Sesión compartida con keep-alive y pool de conexiones
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Caché de ETags para GETs condicionales: url+params -> (etag, json)
+_etag_cache: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+
+# Contadores del cliente HTTP
+_stats_lock = threading.Lock()
+REQUEST_STATS: Dict[str, int] = {
+    "requests": 0,
+    "retries": 0,
+    "rate_limit_sleeps": 0,
+    "not_modified": 0,
+    "errors": 0,
+}
+
+
+def use_repo(owner: str, name: str, pat: str = "") -> None:
+    """
+    Dirigir las llamadas del contexto actual (y de los hilos que copien su
+    contexto, como el sender del outbox) a otro repositorio.
+
+    Args:
+        owner: Propietario del repositorio
+        name: Nombre del repositorio
+        pat: Token para ese repositorio (vacío para usar GITHUB_PAT)
+    """
+    _repo_var.set((owner, name, pat))
 
 
 def get_repo_info() -> tuple[str, str]:
     """
-    Obtener propietario y nombre de repositorio desde variables de entorno.
+    Obtener propietario y nombre de repositorio del contexto o de las variables de entorno.
 
     Returns:
         tuple: (owner, repo_name)
@@ -35,6 +110,9 @@ def get_repo_info() -> tuple[str, str]:
     Raises:
         ValueError: Si las variables no están configuradas
     """
+    override = _repo_var.get()
+    if override:
+        return override[0], override[1]
     if not GITHUB_REPO_OWNER:
         raise ValueError("GITHUB_REPO_OWNER not configured in .env")
     if not GITHUB_REPO_NAME:
@@ -55,23 +133,109 @@ def get_headers() -> Dict[str, str]:
         "X-GitHub-Api-Version": "2022-11-28"
     }
 
-    if GITHUB_PAT:
-        headers["Authorization"] = f"Bearer {GITHUB_PAT}"
+    override = _repo_var.get()
+    token = (override[2] if override else "") or GITHUB_PAT
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
 
     return headers
 
 
+def get_session() -> requests.Session:
+    """
+    Obtener la sesión HTTP compartida (keep-alive, pool de conexiones).
+
+    Returns:
+        requests.Session: Sesión reutilizada por todos los requests a GitHub
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _count(counter: str, amount: int = 1) -> None:
+    """Incrementar un contador del cliente HTTP."""
+    with _stats_lock:
+        REQUEST_STATS[counter] += amount
+
+
+def get_request_stats() -> Dict[str, int]:
+    """
+    Obtener los contadores del cliente HTTP de GitHub.
+
+    Returns:
+        dict: requests, retries, rate_limit_sleeps, not_modified y errors
+    """
+    with _stats_lock:
+        return dict(REQUEST_STATS)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Calcular la espera exponencial con jitter completo para un reintento."""
+    return random.uniform(0, min(GITHUB_BACKOFF_MAX, GITHUB_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _rate_limit_delay(response: requests.Response) -> Optional[float]:
+    """
+    Detectar si una respuesta es un rate limit y calcular cuánto esperar.
+
+    Returns:
+        float: Segundos a esperar, o None si la respuesta no es un rate limit
+    """
+    if response.status_code not in (403, 429):
+        return None
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = response.headers.get("X-RateLimit-Reset")
+        if reset:
+            return max(0.0, float(reset) - time.time()) + 1
+
+    # Rate limit secundario sin headers: GitHub lo indica en el mensaje
+    if response.status_code == 429 or "rate limit" in response.text.lower():
+        return 60.0
+
+    return None
+
+
+def _request_not_sent(error: requests.RequestException) -> bool:
+    """Indicar si un error ocurrió al conectar, antes de enviar el request."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.Timeout):
+        return False
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
 def make_github_request(method: str, endpoint: str, **kwargs) -> requests.Response:
     """
     Hacer request a la API de GitHub.
 
+    Usa la sesión compartida con timeouts, reintenta errores 5xx y de conexión con
+    backoff exponencial con jitter, y respeta Retry-After/X-RateLimit-* ante rate limits.
+    Los métodos no idempotentes (POST) solo se reintentan ante errores al conectar
+    y rate limits, para no duplicar comentarios.
+
     Args:
         method: Método HTTP (GET, POST, PATCH, etc.)
         endpoint: Endpoint de la API (sin el base URL)
         **kwargs: Argumentos adicionales para requests
 
     Returns:
-        requests.Response: Respuesta de la API
+        requests.Response: Respuesta de la API (incluye 304 si se envió If-None-Match)
 
     Raises:
         RuntimeError: Si el request falla
@@ -84,9 +248,49 @@ def make_github_request(method: str, endpoint: str, **kwargs) -> requests.Respon
         headers.update(kwargs['headers'])
         del kwargs['headers']
 
-    response = requests.request(method, url, headers=headers, **kwargs)
+    kwargs.setdefault("timeout", (GITHUB_CONNECT_TIMEOUT, GITHUB_READ_TIMEOUT))
+    session = get_session()
+    idempotent = method.upper() in IDEMPOTENT_METHODS
 
-    if not response.ok:
+    attempt = 0
+    while True:
+        _count("requests")
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, headers=headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            record_github_request(method, 0, time.monotonic() - started)
+            if attempt >= GITHUB_MAX_RETRIES or not (idempotent or _request_not_sent(e)):
+                _count("errors")
+                raise RuntimeError(f"GitHub API request failed: {e}")
+            delay = _backoff_delay(attempt)
+            logger.warning(f"GitHub request error ({e}), retrying in {delay:.1f}s")
+            _count("retries")
+            attempt += 1
+            time.sleep(delay)
+            continue
+        record_github_request(method, response.status_code, time.monotonic() - started)
+
+        if response.ok or response.status_code == 304:
+            return response
+
+        rate_limit_delay = _rate_limit_delay(response)
+        if rate_limit_delay is not None and rate_limit_delay <= GITHUB_RATE_LIMIT_MAX_SLEEP and attempt < GITHUB_MAX_RETRIES:
+            logger.warning(f"GitHub rate limit hit, sleeping {rate_limit_delay:.1f}s")
+            _count("rate_limit_sleeps")
+            attempt += 1
+            time.sleep(rate_limit_delay)
+            continue
+
+        if idempotent and response.status_code in RETRYABLE_STATUS_CODES and attempt < GITHUB_MAX_RETRIES:
+            delay = _backoff_delay(attempt)
+            logger.warning(f"GitHub API returned {response.status_code}, retrying in {delay:.1f}s")
+            _count("retries")
+            attempt += 1
+            time.sleep(delay)
+            continue
+
+        _count("errors")
         error_msg = f"GitHub API request failed: {response.status_code}"
         try:
             error_data = response.json()
@@ -96,7 +300,39 @@ def make_github_request(method: str, endpoint: str, **kwargs) -> requests.Respon
             error_msg += f" - {response.text}"
         raise RuntimeError(error_msg)
 
-    return response
+
+def get_json_cached(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Hacer un GET condicional con ETag y retornar el JSON de la respuesta.
+
+    Si GitHub responde 304 Not Modified se reutiliza el cuerpo cacheado; estos
+    requests no consumen cuota de rate limit.
+
+    Args:
+        endpoint: Endpoint de la API (sin el base URL)
+        params: Parámetros de query opcionales
+
+    Returns:
+        Cuerpo JSON de la respuesta
+
+    Raises:
+        RuntimeError: Si el request falla
+    """
+    cache_key = (endpoint, repr(sorted((params or {}).items())))
+    cached = _etag_cache.get(cache_key)
+
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    response = make_github_request("GET", endpoint, params=params, headers=headers)
+
+    if response.status_code == 304 and cached:
+        _count("not_modified")
+        return cached[1]
+
+    data = response.json()
+    etag = response.headers.get("ETag")
+    if etag:
+        _etag_cache[cache_key] = (etag, data)
+    return data
 
 
 def get_issue_details(issue_number: int) -> Dict[str, Any]:
@@ -115,9 +351,7 @@ def get_issue_details(issue_number: int) -> Dict[str, Any]:
     owner, repo = get_repo_info()
 
     endpoint = f"/repos/{owner}/{repo}/issues/{issue_number}"
-    response = make_github_request("GET", endpoint)
-
-    issue_data = response.json()
+    issue_data = get_json_cached(endpoint)
 
     # Transformar al formato esperado
     return {
@@ -133,7 +367,7 @@ def get_issue_details(issue_number: int) -> Dict[str, Any]:
     }
 
 
-def post_comment(issue_number: int, comment: str) -> None:
+def post_comment(issue_number: int, comment: str) -> int:
     """
     Publicar un comentario en un issue de GitHub.
 
@@ -141,15 +375,276 @@ def post_comment(issue_number: int, comment: str) -> None:
         issue_number: Número de issue en el que comentar
         comment: Texto del comentario a publicar
 
+    Returns:
+        int: ID del comentario creado
+
     Raises:
         RuntimeError: Si la publicación falla
     """
     owner, repo = get_repo_info()
 
     endpoint = f"/repos/{owner}/{repo}/issues/{issue_number}/comments"
-    make_github_request("POST", endpoint, json={"body": comment})
+    response = make_github_request("POST", endpoint, json={"body": comment})
+
+    logger.info(f"Posted comment on issue #{issue_number}")
+    return response.json().get("id")
+
+
+def update_comment(comment_id: int, comment: str) -> None:
+    """
+    Editar un comentario existente de un issue o PR.
+
+    Args:
+        comment_id: ID del comentario
+        comment: Nuevo texto del comentario
+
+    Raises:
+        RuntimeError: Si la edición falla
+    """
+    owner, repo = get_repo_info()
+
+    endpoint = f"/repos/{owner}/{repo}/issues/comments/{comment_id}"
+    make_github_request("PATCH", endpoint, json={"body": comment})
+
+
+def find_comment(issue_number: int, marker: str) -> Optional[int]:
+    """
+    Buscar el comentario de un issue que contiene un marcador.
+
+    Args:
+        issue_number: Número de issue
+        marker: Texto a buscar en el cuerpo del comentario
+
+    Returns:
+        int: ID del comentario si se encuentra, None en caso contrario
+    """
+    owner, repo = get_repo_info()
+
+    endpoint = f"/repos/{owner}/{repo}/issues/{issue_number}/comments"
+    page = 1
+    while True:
+        comments = make_github_request("GET", endpoint, params={"per_page": 100, "page": page}).json()
+        for comment in comments:
+            if marker in (comment.get("body") or ""):
+                return comment["id"]
+        if len(comments) < 100:
+            return None
+        page += 1
+
+
+def status_marker(adw_id: str) -> str:
+    """Marcador oculto que identifica el comentario de estado de un adw_id."""
+    return f"<!-- adw-status:{adw_id} -->"
+
+
+# Caché de IDs de comentarios de estado: adw_id -> comment_id
+_status_comment_ids: Dict[str, int] = {}
+
+
+def upsert_status_comment(issue_number: int, adw_id: str, body: str) -> int:
+    """
+    Crear o editar en el lugar el comentario de estado de una ejecución ADW.
+
+    Args:
+        issue_number: Número de issue
+        adw_id: ID del workflow ADW
+        body: Cuerpo del comentario (debe incluir status_marker(adw_id))
+
+    Returns:
+        int: ID del comentario de estado
+    """
+    comment_id = _status_comment_ids.get(adw_id) or find_comment(issue_number, status_marker(adw_id))
+    if comment_id:
+        update_comment(comment_id, body)
+        logger.info(f"Updated status comment on issue #{issue_number}")
+    else:
+        comment_id = post_comment(issue_number, body)
+    _status_comment_ids[adw_id] = comment_id
+    return comment_id
+
+
+# Modo de reporte de progreso: "board" (un comentario editado en el lugar) o
+# "comments" (un comentario por paso)
+STATUS_MODE = os.getenv("ADW_STATUS_MODE", "board").lower()
+# Intervalo mínimo entre ediciones del comentario de estado (segundos)
+STATUS_DEBOUNCE = float(os.getenv("ADW_STATUS_DEBOUNCE", "10"))
+
+PHASE_PENDING = "pending"
+PHASE_RUNNING = "running"
+PHASE_DONE = "done"
+PHASE_WARNING = "warning"
+PHASE_FAILED = "failed"
+PHASE_SKIPPED = "skipped"
+
+_PHASE_ICONS = {
+    PHASE_PENDING: "⬜",
+    PHASE_RUNNING: "⏳",
+    PHASE_DONE: "✅",
+    PHASE_WARNING: "⚠️",
+    PHASE_FAILED: "❌",
+    PHASE_SKIPPED: "⏭️",
+}
+
+
+def _format_duration(seconds: float) -> str:
+    """Formatear una duración como '42s' o '3m 10s'."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+
+class StatusBoard:
+    """
+    Comentario de estado único por adw_id que se edita a medida que avanzan las fases.
+
+    Las actualizaciones se agrupan: como máximo se publica una cada `debounce`
+    segundos y la última siempre se publica al vencer el intervalo o con flush().
+    """
 
-    print(f"Posted comment on issue #{issue_number}")
+    def __init__(
+        self,
+        issue_number: int,
+        adw_id: str,
+        phases: List[Tuple[str, str]],
+        sink: Optional[Any] = upsert_status_comment,
+        debounce: float = STATUS_DEBOUNCE
+    ):
+        """
+        Args:
+            issue_number: Número de issue
+            adw_id: ID del workflow ADW
+            phases: Lista ordenada de (nombre, etiqueta) de las fases
+            sink: Función (issue_number, adw_id, body) que publica el comentario;
+                None desactiva la publicación (solo se registran tiempos)
+            debounce: Intervalo mínimo entre publicaciones
+        """
+        self.issue_number = issue_number
+        self.adw_id = adw_id
+        self.sink = sink
+        self.debounce = debounce
+        self.started_at = time.time()
+        self.phases: Dict[str, Dict[str, Any]] = {
+            name: {"label": label, "status": PHASE_PENDING, "detail": "", "started": None, "finished": None}
+            for name, label in phases
+        }
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._last_publish = 0.0
+        self._dirty = False
+
+    @property
+    def enabled(self) -> bool:
+        """True si el board publica un comentario en GitHub."""
+        return self.sink is not None
+
+    def start_phase(self, name: str, detail: str = "") -> None:
+        """Marcar una fase como en ejecución."""
+        self._set(name, PHASE_RUNNING, detail, started=time.time())
+
+    def complete_phase(self, name: str, detail: str = "") -> None:
+        """Marcar una fase como completada."""
+        self._set(name, PHASE_DONE, detail, finished=time.time())
+
+    def warn_phase(self, name: str, detail: str = "") -> None:
+        """Marcar una fase como completada con advertencias."""
+        self._set(name, PHASE_WARNING, detail, finished=time.time())
+
+    def fail_phase(self, name: str, detail: str = "") -> None:
+        """Marcar una fase como fallida."""
+        self._set(name, PHASE_FAILED, detail, finished=time.time())
+
+    def skip_phase(self, name: str, detail: str = "") -> None:
+        """Marcar una fase como omitida."""
+        self._set(name, PHASE_SKIPPED, detail)
+
+    def phase_durations(self) -> Dict[str, float]:
+        """Obtener la duración en segundos de cada fase terminada."""
+        with self._lock:
+            return {
+                name: phase["finished"] - phase["started"]
+                for name, phase in self.phases.items()
+                if phase["started"] and phase["finished"]
+            }
+
+    def _set(self, name: str, status: str, detail: str, started: Optional[float] = None, finished: Optional[float] = None) -> None:
+        with self._lock:
+            phase = self.phases[name]
+            phase["status"] = status
+            if detail:
+                phase["detail"] = detail
+            if started:
+                phase["started"] = started
+                phase["finished"] = None
+            if finished:
+                phase["finished"] = finished
+                phase["started"] = phase["started"] or finished
+            self._dirty = True
+        self.publish()
+
+    def render(self) -> str:
+        """Construir el cuerpo markdown del comentario de estado."""
+        now = time.time()
+        lines = [
+            status_marker(self.adw_id),
+            f"🤖 **ADW Workflow Status** (ID: `{self.adw_id}`)",
+            "",
+            "| Phase | Status | Time | Details |",
+            "|---|---|---|---|",
+        ]
+        with self._lock:
+            for phase in self.phases.values():
+                elapsed = ""
+                if phase["started"]:
+                    elapsed = _format_duration((phase["finished"] or now) - phase["started"])
+                icon = _PHASE_ICONS[phase["status"]]
+                detail = phase["detail"].replace("\n", " ").replace("|", "\\|")
+                lines.append(f"| {phase['label']} | {icon} {phase['status']} | {elapsed} | {detail} |")
+        lines.append("")
+        lines.append(f"_Total elapsed: {_format_duration(now - self.started_at)}_")
+        return "\n".join(lines)
+
+    def publish(self, force: bool = False) -> None:
+        """
+        Publicar el estado respetando el intervalo de debounce.
+
+        Args:
+            force: Publicar de inmediato aunque no haya vencido el intervalo
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if not self._dirty and not force:
+                return
+            wait = self._last_publish + self.debounce - time.time()
+            if wait > 0 and not force:
+                # Programar una publicación al vencer el intervalo (trailing edge)
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._publish_now)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        self._publish_now()
+
+    def flush(self) -> None:
+        """Publicar de inmediato el estado pendiente."""
+        self.publish(force=True)
+
+    def _publish_now(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dirty = False
+            self._last_publish = time.time()
+        body = self.render()
+        try:
+            self.sink(self.issue_number, self.adw_id, body)
+        except Exception as e:
+            logger.warning(f"Failed to publish status comment: {e}")
 
 
 def create_pull_request(branch: str, title: str, body: str, base: str = "main") -> Dict[str, Any]:
@@ -188,7 +683,7 @@ def create_pull_request(branch: str, title: str, body: str, base: str = "main")
         "title": pr_data["title"]
     }
 
-    print(f"Created PR #{result['number']}: {result['url']}")
+    logger.info(f"Created PR #{result['number']}: {result['url']}")
 
     return result
 
@@ -208,14 +703,12 @@ def get_pr_for_branch(branch: str) -> Optional[Dict[str, Any]]:
     endpoint = f"/repos/{owner}/{repo}/pulls"
 
     try:
-        response = make_github_request("GET", endpoint, params={
+        prs = get_json_cached(endpoint, params={
             "head": f"{owner}:{branch}",
             "state": "open",
             "per_page": 1
         })
 
-        prs = response.json()
-
         if not prs:
             return None
 
@@ -231,6 +724,65 @@ def get_pr_for_branch(branch: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def parse_pr_url(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extraer el PR de la salida del agente de /pull_request.
+
+    Si el repositorio está configurado solo se aceptan PRs de ese repositorio
+    (la salida puede mencionar otros); si no, se toma la última URL.
+
+    Args:
+        text: Salida del agente
+
+    Returns:
+        dict: Número y url del PR, o None si no hay una URL de PR
+    """
+    matches = PR_URL_PATTERN.findall(text or "")
+    override = _repo_var.get()
+    owner, name = (override[0], override[1]) if override else (GITHUB_REPO_OWNER, GITHUB_REPO_NAME)
+    if owner and name:
+        matches = [
+            match for match in matches
+            if (match[0].lower(), match[1].lower()) == (owner.lower(), name.lower())
+        ]
+    if not matches:
+        return None
+
+    owner, repo, number = matches[-1]
+    return {"number": int(number), "url": f"https://github.com/{owner}/{repo}/pull/{number}"}
+
+
+def wait_for_pr_for_branch(
+    branch: str,
+    attempts: int = GITHUB_PR_LOOKUP_ATTEMPTS,
+    initial_delay: float = GITHUB_PR_LOOKUP_DELAY
+) -> Optional[Dict[str, Any]]:
+    """
+    Buscar el PR de una rama con backoff exponencial acotado.
+
+    El listado de PRs de GitHub puede tardar en reflejar un PR recién creado; se
+    consulta de inmediato y luego esperando initial_delay, 2x, 4x... segundos.
+
+    Args:
+        branch: Nombre de rama a buscar
+        attempts: Consultas máximas
+        initial_delay: Espera antes del segundo intento
+
+    Returns:
+        dict: Datos del PR si se encuentra, None si no aparece tras todos los intentos
+    """
+    delay = initial_delay
+    for attempt in range(attempts):
+        pr_info = get_pr_for_branch(branch)
+        if pr_info:
+            return pr_info
+        if attempt < attempts - 1:
+            time.sleep(delay)
+            delay *= 2
+    logger.warning(f"No PR found for branch {branch} after {attempts} lookups")
+    return None
+
+
 def update_pull_request(pr_number: int, title: Optional[str] = None, body: Optional[str] = None) -> None:
     """
     Actualizar un pull request existente.
@@ -258,7 +810,7 @@ def update_pull_request(pr_number: int, title: Optional[str] = None, body: Optio
 
     make_github_request("PATCH", endpoint, json=data)
 
-    print(f"Updated PR #{pr_number}")
+    logger.info(f"Updated PR #{pr_number}")
 
 
 def close_issue(issue_number: int, comment: Optional[str] = None) -> None:
@@ -280,7 +832,7 @@ def close_issue(issue_number: int, comment: Optional[str] = None) -> None:
     endpoint = f"/repos/{owner}/{repo}/issues/{issue_number}"
     make_github_request("PATCH", endpoint, json={"state": "closed"})
 
-    print(f"Closed issue #{issue_number}")
+    logger.info(f"Closed issue #{issue_number}")
 
 
 def add_label(issue_number: int, label: str) -> None:
@@ -299,7 +851,7 @@ def add_label(issue_number: int, label: str) -> None:
     endpoint = f"/repos/{owner}/{repo}/issues/{issue_number}/labels"
     make_github_request("POST", endpoint, json={"labels": [label]})
 
-    print(f"Added label '{label}' to issue #{issue_number}")
+    logger.info(f"Added label '{label}' to issue #{issue_number}")
 
 
 def commit_screenshots_to_repo(
@@ -308,7 +860,11 @@ def commit_screenshots_to_repo(
     branch_name: str
 ) -> Optional[List[str]]:
     """
-    Copiar screenshots del directorio de agentes al repositorio y hacer commit.
+    Optimizar los screenshots del directorio de agentes, guardarlos en el
+    repositorio direccionados por contenido y hacer commit.
+
+    Las imágenes que ya están en el repositorio no se vuelven a agregar; el
+    manifest de la ejecución registra los nombres originales y los bytes ahorrados.
 
     Args:
         adw_id: ID del workflow ADW
@@ -316,76 +872,66 @@ def commit_screenshots_to_repo(
         branch_name: Nombre de la rama actual
 
     Returns:
-        Lista de rutas relativas de screenshots comprometidos, o None si no hay screenshots
+        Lista de rutas relativas de los objetos de cada screenshot, o None si no hay screenshots
     """
-    # Verificar si el directorio fuente existe y tiene archivos PNG
+    # Verificar si el directorio fuente existe
     if not screenshots_source_dir.exists():
-        print(f"No screenshots directory found at {screenshots_source_dir}")
-        return None
-
-    screenshot_files = list(screenshots_source_dir.glob("*.png"))
-    if not screenshot_files:
-        print(f"No PNG screenshots found in {screenshots_source_dir}")
+        logger.info(f"No screenshots directory found at {screenshots_source_dir}")
         return None
 
-    # Crear directorio de destino en .github/adw-screenshots/{adw_id}/
     project_root = screenshots_source_dir.parent.parent.parent.parent  # agents/{adw_id}/reviewer/review_img -> project root
-    dest_dir = project_root / ".github" / "adw-screenshots" / adw_id
-    dest_dir.mkdir(parents=True, exist_ok=True)
-
-    print(f"Copying {len(screenshot_files)} screenshots to {dest_dir}")
-
-    # Copiar cada screenshot
-    screenshot_paths = []
-    for screenshot_file in screenshot_files:
-        dest_file = dest_dir / screenshot_file.name
-        shutil.copy2(screenshot_file, dest_file)
-        relative_path = str(dest_file.relative_to(project_root)).replace("\\", "/")
-        screenshot_paths.append(relative_path)
+    manifest = store_screenshots(screenshots_source_dir, project_root, adw_id)
+    if not manifest:
+        logger.info(f"No PNG screenshots found in {screenshots_source_dir}")
+        return None
 
-    # Hacer commit de los screenshots
+    screenshot_paths = [entry["path"] for entry in manifest["screenshots"]]
+    logger.info(
+        f"Stored {len(screenshot_paths)} screenshots: {manifest['original_bytes']} bytes captured, "
+        f"{manifest['new_bytes']} bytes added to the repository "
+        f"({len(manifest['new_objects'])} new objects, {manifest['saved_bytes']} bytes saved)"
+    )
+
+    # Hacer commit de los objetos y del manifest
+    # (se agregan todos los objetos referenciados: los ya commiteados no cambian nada)
+    commit_message = (
+        f"chore: add review screenshots for {branch_name}\n\n"
+        f"{len(screenshot_paths)} screenshots from ADW review phase "
+        f"({len(manifest['new_objects'])} new, {manifest['saved_bytes']} bytes saved).\n\n"
+        f"Co-Authored-By: Claude Sonnet 4.5 <noreply@anthropic.com>"
+    )
     try:
-        subprocess.run(
-            ["git", "add", str(dest_dir)],
-            cwd=str(project_root),
-            check=True,
-            capture_output=True,
-            encoding='utf-8'
-        )
-
-        commit_message = f"chore: add review screenshots for {branch_name}\n\n{len(screenshot_paths)} screenshots from ADW review phase.\n\nCo-Authored-By: Claude Sonnet 4.5 <noreply@anthropic.com>"
-
-        subprocess.run(
-            ["git", "commit", "-m", commit_message],
-            cwd=str(project_root),
-            check=True,
-            capture_output=True,
-            encoding='utf-8'
+        commit_paths(
+            project_root,
+            [manifest_path(adw_id).as_posix(), *sorted(set(screenshot_paths))],
+            commit_message
         )
-
-        print(f"Committed {len(screenshot_paths)} screenshots to repository")
-        return screenshot_paths
-
-    except subprocess.CalledProcessError as e:
-        error_output = e.stderr if e.stderr else str(e)
-        print(f"Failed to commit screenshots: {error_output}")
+    except GitError as e:
+        logger.error(f"Failed to commit screenshots: {e}")
         return None
 
+    logger.info(f"Committed {len(screenshot_paths)} screenshots to repository")
+    return screenshot_paths
 
-def post_pr_comment_with_screenshots(
-    pr_number: int,
+
+def build_pr_screenshot_comment(
     screenshot_paths: List[str],
     branch_name: str,
-    review_data: Optional[Dict[str, Any]] = None
-) -> None:
+    review_data: Optional[Dict[str, Any]] = None,
+    captions: Optional[List[str]] = None
+) -> str:
     """
-    Publicar comentario en PR con screenshots embebidos.
+    Construir el comentario markdown de PR con screenshots embebidos.
 
     Args:
-        pr_number: Número de PR
         screenshot_paths: Lista de rutas relativas de screenshots en el repo
         branch_name: Nombre de la rama
         review_data: Datos de revisión opcionales (para incluir summary e issues)
+        captions: Nombres originales alineados con screenshot_paths (los objetos
+            direccionados por contenido se nombran por hash)
+
+    Returns:
+        str: Cuerpo del comentario
     """
     owner, repo = get_repo_info()
 
@@ -419,9 +965,9 @@ def post_pr_comment_with_screenshots(
     comment_parts.append("### Screenshots")
     comment_parts.append("")
 
-    for screenshot_path in screenshot_paths:
+    for index, screenshot_path in enumerate(screenshot_paths):
         # Extraer caption desde el nombre del archivo (ej: "01_desktop_nav.png" -> "Desktop Nav")
-        filename = Path(screenshot_path).stem  # Sin extensión
+        filename = Path(captions[index] if captions else screenshot_path).stem  # Sin extensión
         # Remover prefijo numérico si existe (01_, 02_, etc.)
         caption = filename
         if len(filename) > 2 and filename[:2].isdigit() and filename[2] == '_':
@@ -438,11 +984,29 @@ def post_pr_comment_with_screenshots(
         comment_parts.append(f"![{caption}]({raw_url})")
         comment_parts.append("")
 
-    comment_body = "\n".join(comment_parts)
+    return "\n".join(comment_parts)
+
+
+def post_pr_comment_with_screenshots(
+    pr_number: int,
+    screenshot_paths: List[str],
+    branch_name: str,
+    review_data: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Publicar comentario en PR con screenshots embebidos.
+
+    Args:
+        pr_number: Número de PR
+        screenshot_paths: Lista de rutas relativas de screenshots en el repo
+        branch_name: Nombre de la rama
+        review_data: Datos de revisión opcionales (para incluir summary e issues)
+    """
+    comment_body = build_pr_screenshot_comment(screenshot_paths, branch_name, review_data)
 
     # Publicar comentario
     post_comment(pr_number, comment_body)
-    print(f"Posted screenshot comment on PR #{pr_number}")
+    logger.info(f"Posted screenshot comment on PR #{pr_number}")
 
 
 if __name__ == "__main__":
@@ -467,6 +1031,7 @@ if __name__ == "__main__":
         # Probar acceso al repositorio
         response = make_github_request("GET", f"/repos/{owner}/{repo}")
         print("[OK] Repository access confirmed")
+        print(f"[OK] HTTP client stats: {get_request_stats()}")
 
         print("\nAll tests passed!")
 
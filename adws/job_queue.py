@@ -0,0 +1,855 @@
+"""
+Cola de trabajos persistente y pool de workers para flujos de trabajo ADW.
+
+El webhook escribe cada disparo en una cola SQLite local y responde de inmediato.
+Un pool de workers de concurrencia fija drena la cola ejecutando el script de
+workflow como subproceso, de modo que una ráfaga de issues no lanza N pipelines
+en paralelo y un reinicio del servidor no pierde los trabajos pendientes.
+
+Cada trabajo pertenece a un repositorio (columna repo, vacía en modo de un solo
+repositorio): el servidor arranca un pool por repositorio que solo toma sus
+trabajos, con su propio límite de concurrencia, checkout y entorno.
+
+Los trabajos se toman con un lease de tiempo limitado que el worker renueva con
+heartbeats mientras el workflow corre. Así varios hosts pueden drenar la misma
+cola (ver adw_worker.py): si un worker se cae su lease vence y el primer pool que
+intente tomar un trabajo lo devuelve a la cola para que lo ejecute otro. Un
+worker que pierde su lease detiene el workflow, y la cancelación de un trabajo
+que corre en otro host se pide por la base y se aplica en su próximo heartbeat.
+Un trabajo que se devuelve a la cola tras empezar (lease vencido, reinicio o
+apagado del nodo) vuelve en modo resume: el nodo que lo toma lo reanuda desde su
+journal, o lo ejecuta desde cero si no tiene el journal de esa ejecución.
+"""
+
+import os
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Set
+
+from journal import RunJournal
+from run_logging import get_logger
+from utils import new_process_group_kwargs, terminate_process_tree
+from worktree import remove_worktree
+
+logger = get_logger("job_queue")
+
+# Estados de un trabajo
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# Modos de ejecución de un trabajo
+MODE_RUN = "run"
+MODE_RESUME = "resume"
+
+# Resultado de renovar un lease
+LEASE_OK = "ok"
+LEASE_LOST = "lost"
+LEASE_CANCEL = "cancel"
+LEASE_SUPERSEDE = "supersede"
+
+# Valores de cancel_requested
+CANCEL_REQUESTED = 1
+SUPERSEDE_REQUESTED = 2
+
+# Resultado de enviar un disparo a la cola
+SUBMIT_ACCEPTED = "accepted"
+SUBMIT_DUPLICATE = "duplicate"
+SUBMIT_COALESCED = "coalesced"
+
+# Raíz del proyecto (padre del directorio adws/)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Configuración de la cola
+QUEUE_DB_PATH = os.getenv("ADW_QUEUE_DB") or str(PROJECT_ROOT / "agents" / "adw_queue.sqlite3")
+# La base está en un volumen compartido por varios hosts: WAL necesita memoria
+# compartida entre los procesos, así que se usa el journal clásico (DELETE)
+QUEUE_SHARED = os.getenv("ADW_QUEUE_SHARED", "false").lower() in ("1", "true", "yes")
+MAX_WORKERS = int(os.getenv("ADW_MAX_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("ADW_QUEUE_POLL_INTERVAL", "5"))
+# Días que se recuerdan los X-GitHub-Delivery ya procesados
+DELIVERY_RETENTION_DAYS = int(os.getenv("ADW_DELIVERY_RETENTION_DAYS", "7"))
+# Un nuevo disparo para un issue cancela la ejecución en curso del mismo issue
+PREEMPT_ENABLED = os.getenv("ADW_PREEMPT", "true").lower() in ("1", "true", "yes")
+# Segundos entre SIGTERM y SIGKILL al cancelar un workflow
+CANCEL_GRACE_SECONDS = float(os.getenv("ADW_CANCEL_GRACE_SECONDS", "30"))
+# Duración del lease de un trabajo; el worker lo renueva cada LEASE_SECONDS / 3
+LEASE_SECONDS = float(os.getenv("ADW_LEASE_SECONDS", "60"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    adw_id TEXT NOT NULL UNIQUE,
+    repo TEXT NOT NULL DEFAULT '',
+    issue_number INTEGER NOT NULL,
+    workflow_script TEXT NOT NULL,
+    reason TEXT,
+    state TEXT NOT NULL,
+    mode TEXT NOT NULL DEFAULT 'run',
+    exit_code INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_issue ON jobs (issue_number, state);
+CREATE TABLE IF NOT EXISTS deliveries (
+    delivery_id TEXT PRIMARY KEY,
+    adw_id TEXT NOT NULL,
+    received_at TEXT NOT NULL
+);
+"""
+
+# Columnas agregadas después de la versión inicial del esquema
+_MIGRATIONS = {
+    "mode": "ALTER TABLE jobs ADD COLUMN mode TEXT NOT NULL DEFAULT 'run'",
+    "repo": "ALTER TABLE jobs ADD COLUMN repo TEXT NOT NULL DEFAULT ''",
+    "lease_owner": "ALTER TABLE jobs ADD COLUMN lease_owner TEXT",
+    "lease_expires_at": "ALTER TABLE jobs ADD COLUMN lease_expires_at REAL",
+    "cancel_requested": "ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0",
+}
+
+# Índices sobre columnas agregadas por migración
+_POST_MIGRATION_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_jobs_repo ON jobs (repo, state, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_repo_issue ON jobs (repo, issue_number, state);
+"""
+
+
+# Devolver a la cola un trabajo que ya empezó: se reanuda desde su journal
+_REQUEUE_SET = "state = ?, mode = ?, started_at = NULL, lease_owner = NULL, lease_expires_at = NULL"
+
+
+def _now() -> str:
+    """Retornar la marca de tiempo actual en formato ISO."""
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def make_worker_id() -> str:
+    """Identificador de un pool de workers para sus leases: host:pid:sufijo."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _owner_is_dead(owner: Optional[str]) -> bool:
+    """
+    Indicar si el dueño de un lease es un proceso de este host que ya no existe.
+
+    Los dueños de otros hosts no se pueden comprobar: se espera a que venza su lease.
+    """
+    host, _, rest = (owner or "").partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, OSError):
+        return False
+    return False
+
+
+class JobQueue:
+    """Cola FIFO de trabajos ADW respaldada por SQLite."""
+
+    def __init__(self, db_path: str = QUEUE_DB_PATH):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(f"PRAGMA journal_mode={'DELETE' if QUEUE_SHARED else 'WAL'}")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.executescript(_POST_MIGRATION_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva (una por operación, segura entre hilos)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(
+        self,
+        issue_number: int,
+        adw_id: str,
+        workflow_script: str,
+        reason: str = "",
+        repo: str = ""
+    ) -> Dict[str, Any]:
+        """
+        Agregar un trabajo a la cola.
+
+        Args:
+            issue_number: Número de issue a procesar
+            adw_id: ID del workflow ADW asignado al trabajo
+            workflow_script: Script de workflow a ejecutar (relativo a adws/)
+            reason: Motivo del disparo (para diagnóstico)
+            repo: Repositorio del issue (owner/nombre; vacío en modo de un solo repositorio)
+
+        Returns:
+            dict: Trabajo encolado
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (adw_id, repo, issue_number, workflow_script, reason, state, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (adw_id, repo, issue_number, workflow_script, reason, JOB_PENDING, _now())
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (cursor.lastrowid,)).fetchone()
+        return dict(row)
+
+    def _find_delivery(self, conn: sqlite3.Connection, delivery_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Obtener el trabajo asociado a un X-GitHub-Delivery ya procesado."""
+        if not delivery_id:
+            return None
+        row = conn.execute(
+            "SELECT jobs.* FROM deliveries JOIN jobs ON jobs.adw_id = deliveries.adw_id "
+            "WHERE deliveries.delivery_id = ?",
+            (delivery_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def _record_delivery(self, conn: sqlite3.Connection, delivery_id: Optional[str], adw_id: str) -> None:
+        """Recordar un X-GitHub-Delivery y olvidar los que superan la retención."""
+        if not delivery_id:
+            return
+        conn.execute(
+            "INSERT OR IGNORE INTO deliveries (delivery_id, adw_id, received_at) VALUES (?, ?, ?)",
+            (delivery_id, adw_id, _now())
+        )
+        cutoff = (datetime.now() - timedelta(days=DELIVERY_RETENTION_DAYS)).isoformat(timespec="seconds")
+        conn.execute("DELETE FROM deliveries WHERE received_at < ?", (cutoff,))
+
+    def submit(
+        self,
+        issue_number: int,
+        adw_id: str,
+        workflow_script: str,
+        reason: str = "",
+        delivery_id: Optional[str] = None,
+        repo: str = ""
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Encolar un disparo del webhook sin duplicar ejecuciones.
+
+        - Una entrega ya procesada (mismo X-GitHub-Delivery) retorna su trabajo.
+        - Si el issue ya tiene un trabajo pendiente, el disparo se une a ese trabajo:
+          por issue hay como máximo uno en ejecución y uno pendiente.
+
+        Args:
+            issue_number: Número de issue a procesar
+            adw_id: ID a asignar si se crea un trabajo nuevo
+            workflow_script: Script de workflow a ejecutar (relativo a adws/)
+            reason: Motivo del disparo (para diagnóstico)
+            delivery_id: Header X-GitHub-Delivery de la entrega
+            repo: Repositorio del issue (owner/nombre; vacío en modo de un solo repositorio)
+
+        Returns:
+            tuple: (trabajo, SUBMIT_ACCEPTED | SUBMIT_DUPLICATE | SUBMIT_COALESCED)
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = self._find_delivery(conn, delivery_id)
+            if existing:
+                conn.execute("COMMIT")
+                return existing, SUBMIT_DUPLICATE
+
+            pending = conn.execute(
+                "SELECT * FROM jobs WHERE repo = ? AND issue_number = ? AND state = ? ORDER BY id LIMIT 1",
+                (repo, issue_number, JOB_PENDING)
+            ).fetchone()
+            if pending:
+                self._record_delivery(conn, delivery_id, pending["adw_id"])
+                conn.execute("COMMIT")
+                return dict(pending), SUBMIT_COALESCED
+
+            cursor = conn.execute(
+                "INSERT INTO jobs (adw_id, repo, issue_number, workflow_script, reason, state, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (adw_id, repo, issue_number, workflow_script, reason, JOB_PENDING, _now())
+            )
+            self._record_delivery(conn, delivery_id, adw_id)
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (cursor.lastrowid,)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return dict(row), SUBMIT_ACCEPTED
+
+    def resume(
+        self,
+        issue_number: int,
+        adw_id: str,
+        workflow_script: str,
+        reason: str = "",
+        delivery_id: Optional[str] = None,
+        repo: str = ""
+    ) -> Dict[str, Any]:
+        """
+        Encolar la reanudación de una ejecución desde su journal.
+
+        Si el trabajo ya está pendiente o en ejecución se retorna sin cambios.
+
+        Args:
+            issue_number: Número de issue de la ejecución
+            adw_id: ID del workflow ADW a reanudar
+            workflow_script: Script de workflow a ejecutar (relativo a adws/)
+            reason: Motivo del disparo (para diagnóstico)
+            delivery_id: Header X-GitHub-Delivery (una redelivery no reencola de nuevo)
+            repo: Repositorio del issue (si el trabajo no existía)
+
+        Returns:
+            dict: Trabajo encolado (o el existente si ya estaba activo)
+        """
+        with self._connect() as conn:
+            existing = self._find_delivery(conn, delivery_id)
+            if existing:
+                return existing
+            self._record_delivery(conn, delivery_id, adw_id)
+            row = conn.execute("SELECT * FROM jobs WHERE adw_id = ?", (adw_id,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO jobs (adw_id, repo, issue_number, workflow_script, reason, state, mode, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (adw_id, repo, issue_number, workflow_script, reason, JOB_PENDING, MODE_RESUME, _now())
+                )
+            elif row["state"] in (JOB_DONE, JOB_FAILED, JOB_CANCELLED):
+                conn.execute(
+                    "UPDATE jobs SET state = ?, mode = ?, reason = ?, exit_code = NULL, started_at = NULL, "
+                    "finished_at = NULL, lease_owner = NULL, lease_expires_at = NULL, cancel_requested = 0 "
+                    "WHERE adw_id = ?",
+                    (JOB_PENDING, MODE_RESUME, reason, adw_id)
+                )
+            row = conn.execute("SELECT * FROM jobs WHERE adw_id = ?", (adw_id,)).fetchone()
+        return dict(row)
+
+    def claim(self, repo: str = "", owner: str = "", lease_seconds: float = LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """
+        Tomar el trabajo pendiente más antiguo de un repositorio con un lease.
+
+        Antes se devuelven a la cola los trabajos del repositorio cuyo lease venció
+        (su worker se cayó o perdió la conexión). Se saltean los issues que ya
+        tienen un trabajo en ejecución.
+
+        Args:
+            repo: Repositorio cuyos trabajos se toman
+            owner: Identificador del worker (ver make_worker_id)
+            lease_seconds: Duración del lease; se renueva con heartbeat()
+
+        Returns:
+            dict: Trabajo tomado, o None si la cola está vacía
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = conn.execute(
+                f"UPDATE jobs SET {_REQUEUE_SET} WHERE repo = ? AND state = ? AND lease_expires_at < ?",
+                (JOB_PENDING, MODE_RESUME, repo, JOB_RUNNING, now)
+            ).rowcount
+            if expired:
+                logger.warning(f"Requeued {expired} jobs whose worker lease expired")
+            # No ejecutar dos trabajos del mismo issue a la vez
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE repo = ? AND state = ? AND issue_number NOT IN "
+                "(SELECT issue_number FROM jobs WHERE repo = ? AND state = ?) ORDER BY id LIMIT 1",
+                (repo, JOB_PENDING, repo, JOB_RUNNING)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            started_at = _now()
+            conn.execute(
+                "UPDATE jobs SET state = ?, started_at = ?, lease_owner = ?, lease_expires_at = ?, "
+                "cancel_requested = 0 WHERE id = ?",
+                (JOB_RUNNING, started_at, owner, now + lease_seconds, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job = dict(row)
+        job["state"] = JOB_RUNNING
+        job["started_at"] = started_at
+        job["lease_owner"] = owner
+        return job
+
+    def heartbeat(self, job_id: int, owner: str, lease_seconds: float = LEASE_SECONDS) -> str:
+        """
+        Renovar el lease de un trabajo en ejecución.
+
+        Returns:
+            str: LEASE_OK, LEASE_CANCEL o LEASE_SUPERSEDE si se pidió cancelarlo, o LEASE_LOST si el
+            trabajo ya no pertenece a este worker (el lease venció y otro lo tomó)
+        """
+        with self._connect() as conn:
+            renewed = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                (time.time() + lease_seconds, job_id, JOB_RUNNING, owner)
+            ).rowcount
+            if not renewed:
+                return LEASE_LOST
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row["cancel_requested"] == SUPERSEDE_REQUESTED:
+            return LEASE_SUPERSEDE
+        return LEASE_CANCEL if row["cancel_requested"] else LEASE_OK
+
+    def finish(self, job_id: int, exit_code: int, cancelled: bool = False, owner: Optional[str] = None) -> bool:
+        """
+        Marcar un trabajo como terminado según su código de salida.
+
+        Args:
+            job_id: ID del trabajo
+            exit_code: Código de salida del workflow
+            cancelled: El trabajo se canceló
+            owner: Worker dueño del lease; si ya no lo es, el resultado se descarta
+
+        Returns:
+            bool: True si se registró el resultado
+        """
+        if cancelled:
+            state = JOB_CANCELLED
+        else:
+            state = JOB_DONE if exit_code == 0 else JOB_FAILED
+        query = (
+            "UPDATE jobs SET state = ?, exit_code = ?, finished_at = ?, lease_owner = NULL, "
+            "lease_expires_at = NULL WHERE id = ?"
+        )
+        params: List[Any] = [state, exit_code, _now(), job_id]
+        if owner is not None:
+            query += " AND state = ? AND lease_owner = ?"
+            params += [JOB_RUNNING, owner]
+        with self._connect() as conn:
+            return conn.execute(query, params).rowcount > 0
+
+    def release(self, job_id: int, owner: str) -> bool:
+        """Devolver a la cola un trabajo en ejecución de este worker (ej. al apagar el host)."""
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET {_REQUEUE_SET} WHERE id = ? AND state = ? AND lease_owner = ?",
+                (JOB_PENDING, MODE_RESUME, job_id, JOB_RUNNING, owner)
+            ).rowcount > 0
+
+    def request_cancel(self, adw_id: str, superseded: bool = False) -> bool:
+        """
+        Pedir la cancelación de un trabajo en ejecución (en este u otro host).
+
+        Args:
+            adw_id: ADW ID del trabajo
+            superseded: Otra ejecución del issue lo reemplaza
+
+        Returns:
+            bool: True si el trabajo estaba en ejecución
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET cancel_requested = ? WHERE adw_id = ? AND state = ?",
+                (SUPERSEDE_REQUESTED if superseded else CANCEL_REQUESTED, adw_id, JOB_RUNNING)
+            ).rowcount > 0
+
+    def cancel(self, adw_id: str) -> bool:
+        """
+        Cancelar un trabajo pendiente.
+
+        Returns:
+            bool: True si el trabajo estaba pendiente y se canceló
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ? WHERE adw_id = ? AND state = ?",
+                (JOB_CANCELLED, _now(), adw_id, JOB_PENDING)
+            )
+        return cursor.rowcount > 0
+
+    def active_jobs_for_issue(self, issue_number: int, repo: str = "") -> List[Dict[str, Any]]:
+        """Listar los trabajos pendientes o en ejecución de un issue."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE repo = ? AND issue_number = ? AND state IN (?, ?) ORDER BY id",
+                (repo, issue_number, JOB_PENDING, JOB_RUNNING)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_interrupted(self, repo: str = "") -> int:
+        """
+        Devolver a la cola los trabajos de un repositorio que quedaron en ejecución tras un reinicio.
+
+        Solo se reencolan los trabajos sin lease (de versiones anteriores), con el
+        lease vencido o tomados por un proceso de este host que ya terminó; los
+        que corren en otros hosts siguen con su worker. Vuelven en modo resume.
+
+        Returns:
+            int: Cantidad de trabajos reencolados
+        """
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, lease_owner, lease_expires_at FROM jobs WHERE repo = ? AND state = ?",
+                (repo, JOB_RUNNING)
+            ).fetchall()
+            interrupted = [
+                row["id"] for row in rows
+                if row["lease_expires_at"] is None or row["lease_expires_at"] < now or _owner_is_dead(row["lease_owner"])
+            ]
+            for job_id in interrupted:
+                conn.execute(
+                    f"UPDATE jobs SET {_REQUEUE_SET} WHERE id = ? AND state = ?",
+                    (JOB_PENDING, MODE_RESUME, job_id, JOB_RUNNING)
+                )
+        return len(interrupted)
+
+    def get_job(self, adw_id: str) -> Optional[Dict[str, Any]]:
+        """Obtener un trabajo por su ADW ID."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE adw_id = ?", (adw_id,)).fetchone()
+        return dict(row) if row else None
+
+    def latest_job(self, issue_number: int, repo: str = "") -> Optional[Dict[str, Any]]:
+        """Obtener el trabajo más reciente de un issue."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE repo = ? AND issue_number = ? ORDER BY id DESC LIMIT 1",
+                (repo, issue_number)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(
+        self,
+        state: Optional[str] = None,
+        limit: int = 50,
+        repo: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Listar los trabajos más recientes, opcionalmente filtrados por estado y repositorio."""
+        conditions, params = [], []
+        if state:
+            conditions.append("state = ?")
+            params.append(state)
+        if repo is not None:
+            conditions.append("repo = ?")
+            params.append(repo)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM jobs {where}ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self, repo: Optional[str] = None) -> Dict[str, int]:
+        """
+        Obtener estadísticas de la cola.
+
+        Args:
+            repo: Limitar a un repositorio (None para todos)
+
+        Returns:
+            dict: Profundidad de la cola y contadores accepted/started/finished/failed/cancelled
+        """
+        with self._connect() as conn:
+            if repo is None:
+                rows = conn.execute("SELECT state, COUNT(*) AS total FROM jobs GROUP BY state")
+            else:
+                rows = conn.execute(
+                    "SELECT state, COUNT(*) AS total FROM jobs WHERE repo = ? GROUP BY state", (repo,)
+                )
+            counts = {row["state"]: row["total"] for row in rows}
+        pending = counts.get(JOB_PENDING, 0)
+        running = counts.get(JOB_RUNNING, 0)
+        done = counts.get(JOB_DONE, 0)
+        failed = counts.get(JOB_FAILED, 0)
+        cancelled = counts.get(JOB_CANCELLED, 0)
+        return {
+            "depth": pending,
+            "running": running,
+            "accepted": pending + running + done + failed + cancelled,
+            "started": running + done + failed,
+            "finished": done + failed,
+            "failed": failed,
+            "cancelled": cancelled,
+        }
+
+
+def build_workflow_command(job: Dict[str, Any]) -> List[str]:
+    """Construir el comando para ejecutar el script de workflow de un trabajo."""
+    workflow_path = Path(__file__).parent / job["workflow_script"]
+    if job.get("mode") == MODE_RESUME:
+        return ["uv", "run", str(workflow_path), "resume", job["adw_id"]]
+    return ["uv", "run", str(workflow_path), str(job["issue_number"]), job["adw_id"]]
+
+
+class WorkerPool:
+    """Pool de workers de concurrencia fija que drena los trabajos de un repositorio de una JobQueue."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        max_workers: int = MAX_WORKERS,
+        poll_interval: float = POLL_INTERVAL,
+        repo: str = "",
+        root: Path = PROJECT_ROOT,
+        env: Optional[Dict[str, str]] = None,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = LEASE_SECONDS
+    ):
+        """
+        Args:
+            queue: Cola de trabajos compartida
+            max_workers: Workflows del repositorio en paralelo (0 para solo encolar,
+                cuando los trabajos los ejecutan nodos con adw_worker.py)
+            poll_interval: Segundos entre consultas a la cola sin notificaciones
+            repo: Repositorio cuyos trabajos toma el pool (vacío en modo de un solo repositorio)
+            root: Checkout del repositorio (directorio de trabajo y logs de los workflows)
+            env: Variables de entorno agregadas al lanzar cada workflow
+            worker_id: Dueño de los leases del pool (por defecto host:pid:sufijo)
+            lease_seconds: Duración de los leases; se renuevan cada lease_seconds / 3
+        """
+        self.queue = queue
+        self.max_workers = max(0, max_workers)
+        self.poll_interval = poll_interval
+        self.repo = repo
+        self.root = root
+        self.env = env or {}
+        self.worker_id = worker_id or make_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = max(0.1, lease_seconds / 3)
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._active: Dict[str, subprocess.Popen] = {}
+        self._jobs: Dict[str, int] = {}
+        self._cancelled: Set[str] = set()
+        self._requeued: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Reencolar trabajos interrumpidos y lanzar los hilos worker."""
+        label = f" for {self.repo}" if self.repo else ""
+        requeued = self.queue.requeue_interrupted(self.repo)
+        if requeued:
+            logger.warning(f"Requeued {requeued} interrupted jobs{label}")
+
+        self._stop.clear()
+        prefix = f"adw-worker-{self.repo.replace('/', '-')}" if self.repo else "adw-worker"
+        for index in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"{prefix}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Worker pool started with {self.max_workers} workers{label} ({self.worker_id})")
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Dejar de tomar trabajos y esperar a los workers.
+
+        Con timeout=None se espera a que terminen los trabajos en curso (sus leases
+        se siguen renovando). Los que sigan corriendo al cortar el proceso se
+        reencolan al vencer su lease o en el próximo arranque de este host.
+        """
+        self._stop.set()
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
+
+    def release_all(self) -> List[str]:
+        """
+        Devolver a la cola los trabajos en curso de este pool y terminar sus workflows.
+
+        Se usa al forzar el apagado de un nodo: otro worker los toma sin esperar
+        a que venza el lease.
+
+        Returns:
+            list: ADW IDs devueltos a la cola
+        """
+        with self._lock:
+            running = [(adw_id, self._jobs[adw_id], process) for adw_id, process in self._active.items()]
+        released = []
+        for adw_id, job_id, process in running:
+            if self.queue.release(job_id, self.worker_id):
+                released.append(adw_id)
+                with self._lock:
+                    self._requeued.add(adw_id)
+            terminate_process_tree(process, grace=0)
+        if released:
+            logger.warning(f"Released {len(released)} running jobs back to the queue: {', '.join(released)}")
+        return released
+
+    def notify(self) -> None:
+        """Despertar a los workers inactivos tras encolar un trabajo."""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def active_jobs(self) -> List[str]:
+        """Listar los ADW IDs que se están ejecutando en este momento."""
+        with self._lock:
+            return list(self._active)
+
+    def cancel(self, adw_id: str, grace: float = CANCEL_GRACE_SECONDS, superseded: bool = False) -> bool:
+        """
+        Cancelar un trabajo pendiente o en ejecución.
+
+        Al workflow en curso se le envía SIGTERM para que detenga sus fases y
+        registre la cancelación; si no termina dentro de grace se fuerza su cierre.
+        superseded indica que otra ejecución del issue lo reemplaza (se registra
+        así en la cola cuando el trabajo corre en otro nodo).
+
+        Returns:
+            bool: True si había un trabajo pendiente o en ejecución con ese ADW ID
+        """
+        with self._lock:
+            process = self._active.get(adw_id)
+            if process is not None:
+                self._cancelled.add(adw_id)
+        if process is None:
+            # Pendiente, o en ejecución en otro nodo: su worker lo cancela en el próximo heartbeat
+            return self.queue.cancel(adw_id) or self.queue.request_cancel(adw_id, superseded=superseded)
+
+        logger.info(f"Cancelling job {adw_id}")
+        threading.Thread(
+            target=terminate_process_tree,
+            args=(process, grace),
+            name=f"adw-cancel-{adw_id}",
+            daemon=True
+        ).start()
+        return True
+
+    def preempt(self, issue_number: int, except_adw_id: Optional[str] = None) -> List[str]:
+        """
+        Cancelar las ejecuciones en curso de un issue que quedaron obsoletas por un
+        disparo más reciente.
+
+        Returns:
+            list: ADW IDs cancelados
+        """
+        if not PREEMPT_ENABLED:
+            return []
+        cancelled = []
+        for job in self.queue.active_jobs_for_issue(issue_number, self.repo):
+            adw_id = job["adw_id"]
+            if job["state"] == JOB_RUNNING and adw_id != except_adw_id and self.cancel(adw_id, superseded=True):
+                cancelled.append(adw_id)
+        return cancelled
+
+    def _worker_loop(self) -> None:
+        """Tomar trabajos de la cola hasta que se detenga el pool."""
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.repo, owner=self.worker_id, lease_seconds=self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Error claiming job: {e}")
+                job = None
+
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=self.poll_interval)
+                continue
+
+            self._run_job(job)
+
+    def _wait_with_heartbeats(self, job: Dict[str, Any], process: subprocess.Popen) -> int:
+        """
+        Esperar al workflow renovando el lease del trabajo.
+
+        Si el lease se perdió (venció y otro worker tomó el trabajo) se termina el
+        workflow; si se pidió la cancelación (o el reemplazo) desde otro nodo se cancela.
+        """
+        adw_id = job["adw_id"]
+        while True:
+            try:
+                return process.wait(timeout=self.heartbeat_interval)
+            except subprocess.TimeoutExpired:
+                pass
+            try:
+                status = self.queue.heartbeat(job["id"], self.worker_id, self.lease_seconds)
+            except Exception as e:
+                # Un error transitorio de la base no corta el workflow; el lease aún tiene margen
+                logger.error(f"Error renewing lease of job {adw_id}: {e}")
+                continue
+            if status == LEASE_LOST:
+                logger.warning(f"Lost lease of job {adw_id}, stopping its workflow")
+                with self._lock:
+                    self._requeued.add(adw_id)
+                terminate_process_tree(process, grace=CANCEL_GRACE_SECONDS)
+                return process.wait()
+            if status in (LEASE_CANCEL, LEASE_SUPERSEDE):
+                with self._lock:
+                    already = adw_id in self._cancelled
+                if not already:
+                    self.cancel(adw_id, superseded=status == LEASE_SUPERSEDE)
+
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        """Ejecutar un trabajo renovando su lease y registrar su resultado en la cola."""
+        adw_id = job["adw_id"]
+        if job.get("mode") == MODE_RESUME and RunJournal(adw_id, self.root).load() is None:
+            # Recuperado en un nodo que no tiene el journal de la ejecución: empezar de cero
+            logger.info(f"No journal of {adw_id} in this checkout, running it from scratch")
+            job = {**job, "mode": MODE_RUN}
+        cmd = build_workflow_command(job)
+
+        # La salida del workflow se guarda en agents/{adw_id}/trigger/output.log del checkout
+        log_dir = self.root / "agents" / adw_id / "trigger"
+        log_dir.mkdir(parents=True, exist_ok=True)
+        log_file = log_dir / "output.log"
+
+        logger.info(f"Starting job for issue #{job['issue_number']} with ADW ID: {adw_id}")
+        start_time = time.monotonic()
+
+        process = None
+        try:
+            with open(log_file, "a", encoding="utf-8") as log:
+                process = subprocess.Popen(
+                    cmd,
+                    cwd=str(self.root),
+                    env={**os.environ, **self.env},
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    # Grupo de procesos propio para poder cancelar el workflow completo
+                    **new_process_group_kwargs()
+                )
+                with self._lock:
+                    self._active[adw_id] = process
+                    self._jobs[adw_id] = job["id"]
+                exit_code = self._wait_with_heartbeats(job, process)
+        except Exception as e:
+            logger.error(f"Failed to run job {adw_id}: {e}")
+            exit_code = -1
+        finally:
+            with self._lock:
+                # Otro hilo pudo haber tomado el mismo adw_id (ej. una reanudación)
+                if process is not None and self._active.get(adw_id) is process:
+                    self._active.pop(adw_id)
+                    self._jobs.pop(adw_id, None)
+                cancelled = adw_id in self._cancelled
+                requeued = adw_id in self._requeued
+                self._cancelled.discard(adw_id)
+                self._requeued.discard(adw_id)
+
+        if not requeued:
+            # Ejecución terminada: eliminar su worktree (conservando journal y logs en
+            # el checkout) antes de cerrar el trabajo, así la rama del issue queda libre
+            # para la próxima ejecución. Uno devuelto a la cola lo retoma otro worker.
+            remove_worktree(adw_id, force=True, root=self.root, keep_artifacts=True)
+
+        recorded = self.queue.finish(job["id"], exit_code, cancelled=cancelled, owner=self.worker_id)
+        elapsed = time.monotonic() - start_time
+        if not recorded:
+            logger.warning(f"Job {adw_id} stopped after {elapsed:.1f}s; its lease belongs to another worker, result discarded")
+            return
+        outcome = "was cancelled" if cancelled else f"finished with exit code {exit_code}"
+        logger.info(f"Job {adw_id} {outcome} in {elapsed:.1f}s")
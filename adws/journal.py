@@ -0,0 +1,129 @@
+"""
+Journal de ejecución de un flujo ADW para reanudar desde la última fase completada.
+
+Cada fase completada agrega una línea con sus outputs (tipo de issue, rama, plan,
+JSON de la revisión, documentación, etc.) a agents/{adw_id}/journal.jsonl. El
+archivo es de solo agregado: una ejecución reanudada vuelve a leerlo, restaura el
+contexto y retoma el grafo de fases en la primera fase incompleta.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Set
+
+from utils import get_run_root
+
+# Eventos del journal
+EVENT_RUN_STARTED = "run_started"
+EVENT_PHASE_COMPLETED = "phase_completed"
+EVENT_RUN_FINISHED = "run_finished"
+
+# Marca para serializar rutas y recuperarlas como Path
+_PATH_KEY = "__path__"
+
+
+def _encode(value: Any) -> Any:
+    """Convertir un output de fase a un valor serializable en JSON."""
+    if isinstance(value, Path):
+        return {_PATH_KEY: str(value)}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    """Inverso de _encode."""
+    if isinstance(value, dict):
+        if set(value) == {_PATH_KEY}:
+            return Path(value[_PATH_KEY])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+class JournalState:
+    """Estado reconstruido a partir de un journal."""
+
+    def __init__(self, issue_number: int, completed: Set[str], outputs: Dict[str, Any], finished: Optional[str]):
+        self.issue_number = issue_number
+        self.completed = completed
+        self.outputs = outputs
+        self.finished = finished
+
+
+class RunJournal:
+    """Journal de solo agregado de las fases completadas de un adw_id."""
+
+    def __init__(self, adw_id: str, root: Optional[Path] = None):
+        """
+        Args:
+            adw_id: ID del workflow ADW
+            root: Checkout del repositorio (por defecto la raíz del proyecto)
+        """
+        self.adw_id = adw_id
+        self.path = get_run_root(adw_id, root) / "agents" / adw_id / "journal.jsonl"
+        self._lock = threading.Lock()
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Agregar un evento al journal y forzarlo a disco."""
+        record["ts"] = time.time()
+        line = json.dumps(_encode(record)) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def run_started(self, issue_number: int, resumed: bool = False) -> None:
+        """Registrar el inicio (o la reanudación) de una ejecución."""
+        self._append({"event": EVENT_RUN_STARTED, "issue_number": issue_number, "resumed": resumed})
+
+    def phase_completed(self, phase: str, outputs: Dict[str, Any]) -> None:
+        """Registrar una fase completada junto con sus outputs."""
+        self._append({"event": EVENT_PHASE_COMPLETED, "phase": phase, "outputs": outputs})
+
+    def run_finished(self, status: str) -> None:
+        """Registrar el final de una ejecución (success, failed, aborted o cancelled)."""
+        self._append({"event": EVENT_RUN_FINISHED, "status": status})
+
+    def load(self) -> Optional[JournalState]:
+        """
+        Reconstruir el estado de la ejecución.
+
+        Returns:
+            JournalState: Fases completadas y outputs acumulados, o None si no hay journal
+        """
+        if not self.path.exists():
+            return None
+
+        issue_number = None
+        completed: Set[str] = set()
+        outputs: Dict[str, Any] = {}
+        finished = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = _decode(json.loads(line))
+                except json.JSONDecodeError:
+                    # Una línea truncada por una caída a mitad de escritura
+                    continue
+                event = record.get("event")
+                if event == EVENT_RUN_STARTED:
+                    issue_number = record["issue_number"]
+                    finished = None
+                elif event == EVENT_PHASE_COMPLETED:
+                    completed.add(record["phase"])
+                    outputs.update(record.get("outputs") or {})
+                elif event == EVENT_RUN_FINISHED:
+                    finished = record.get("status")
+
+        if issue_number is None:
+            return None
+        return JournalState(issue_number, completed, outputs, finished)
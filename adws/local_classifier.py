@@ -0,0 +1,236 @@
+"""
+Clasificación de issues y nombres de rama locales, sin invocar al agente.
+
+Los issues de este repositorio siguen títulos convencionales (`feat:`, `fix:`,
+`bug:`) y etiquetas. Estas reglas deterministas responden en microsegundos cuando
+la señal es clara; si es ambigua retornan un resultado no confiable y el workflow
+recurre a /classify_issue o /generate_branch_name.
+
+Orden de las reglas:
+1. Prefijo convencional del título (`feat:`, `fix(ui):`, `chore:`...)
+2. Etiquetas del issue (bug, enhancement, documentation...)
+3. Palabras clave del título y del cuerpo, con un margen mínimo entre tipos
+"""
+
+import os
+import re
+import unicodedata
+from typing import Optional, Dict, Any, List, NamedTuple
+
+# Permite desactivar la ruta rápida y usar siempre el agente
+LOCAL_CLASSIFIER_ENABLED = os.getenv("ADW_LOCAL_CLASSIFIER", "true").lower() in ("1", "true", "yes")
+
+# Prefijo convencional del título -> comando slash
+TITLE_PREFIXES: Dict[str, str] = {
+    "feat": "/feature",
+    "feature": "/feature",
+    "fix": "/bug",
+    "bug": "/bug",
+    "bugfix": "/bug",
+    "hotfix": "/bug",
+    "chore": "/chore",
+    "refactor": "/chore",
+    "docs": "/chore",
+    "doc": "/chore",
+    "ci": "/chore",
+    "build": "/chore",
+    "test": "/chore",
+    "tests": "/chore",
+    "style": "/chore",
+    "perf": "/chore",
+}
+
+# Etiqueta -> comando slash
+LABELS: Dict[str, str] = {
+    "bug": "/bug",
+    "defect": "/bug",
+    "regression": "/bug",
+    "enhancement": "/feature",
+    "feature": "/feature",
+    "feature request": "/feature",
+    "chore": "/chore",
+    "documentation": "/chore",
+    "refactor": "/chore",
+    "maintenance": "/chore",
+    "dependencies": "/chore",
+}
+
+# Palabras clave (sin acentos, en minúsculas) -> comando slash y peso
+KEYWORDS: Dict[str, Dict[str, int]] = {
+    "/bug": {
+        "bug": 2, "error": 2, "falla": 2, "fallo al": 2, "no funciona": 3, "roto": 2, "rompe": 2,
+        "crash": 3, "pasos para reproducir": 3, "comportamiento esperado": 2,
+        "actualmente": 1, "comportamiento correcto": 2, "arreglar": 2, "corregir": 2,
+        "indefinidamente": 1, "no se oculta": 2, "no reinicia": 2, "fix": 2, "broken": 2,
+        "steps to reproduce": 3, "expected behavior": 2,
+    },
+    "/feature": {
+        "agregar": 2, "anadir": 2, "implementar": 2, "nuevo": 1, "nueva": 1, "mostrar": 1,
+        "permitir": 2, "boton para": 2, "crear": 1, "integrar": 2, "soporte para": 2,
+        "add": 2, "implement": 2, "new": 1, "support": 1, "allow": 2,
+    },
+    "/chore": {
+        "refactor": 3, "refactorizar": 3, "dependencias": 2, "limpiar": 2, "renombrar": 2,
+        "documentacion": 1, "actualizar version": 2, "cleanup": 3, "rename": 2, "upgrade": 2,
+        "dependencies": 2,
+    },
+}
+
+# Un único patrón con todas las palabras clave, para recorrer el texto una sola vez
+_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(
+        re.escape(keyword)
+        for keyword in sorted({k for keywords in KEYWORDS.values() for k in keywords}, key=len, reverse=True)
+    ) + r")\b"
+)
+
+# Puntaje mínimo del tipo ganador y margen sobre el segundo para confiar en las palabras clave
+KEYWORD_MIN_SCORE = 3
+KEYWORD_MIN_MARGIN = 2
+
+# Palabras que no aportan al nombre de rama
+SLUG_STOPWORDS = {
+    "a", "al", "de", "del", "el", "la", "las", "los", "en", "y", "o", "un", "una", "con", "por",
+    "para", "que", "se", "su", "sus", "lo", "es", "the", "an", "and", "or", "of", "to", "in",
+    "on", "for", "with", "is",
+}
+SLUG_MAX_WORDS = 6
+SLUG_MAX_LENGTH = 50
+
+# Comando slash -> prefijo del nombre de rama
+BRANCH_PREFIXES = {"/feature": "feature", "/bug": "bug", "/chore": "chore"}
+
+_PREFIX_RE = re.compile(r"^\s*`?([a-zA-Z]+)(?:\([^)]*\))?!?\s*:\s*")
+
+
+class LocalClassification(NamedTuple):
+    """Resultado del clasificador local."""
+
+    command: Optional[str]  # /feature, /bug, /chore o None si no hay señal
+    confident: bool
+    reason: str
+
+
+def _normalize(text: str) -> str:
+    """Pasar a minúsculas y quitar acentos."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def _title_prefix(title: str) -> Optional[str]:
+    """Obtener el prefijo convencional del título (ej. 'feat' en 'feat(ui): ...')."""
+    match = _PREFIX_RE.match(title or "")
+    return match.group(1).lower() if match else None
+
+
+def _strip_prefix(title: str) -> str:
+    """Quitar el prefijo convencional y los backticks del título."""
+    return _PREFIX_RE.sub("", (title or "").strip()).strip("` ")
+
+
+def keyword_scores(text: str) -> Dict[str, int]:
+    """Puntaje de palabras clave por tipo de issue sobre un texto ya normalizado."""
+    found = set(_KEYWORD_RE.findall(text))
+    return {
+        command: sum(weight for keyword, weight in keywords.items() if keyword in found)
+        for command, keywords in KEYWORDS.items()
+    }
+
+
+def classify_issue_locally(issue: Dict[str, Any]) -> LocalClassification:
+    """
+    Clasificar un issue con reglas deterministas.
+
+    Args:
+        issue: Issue con "title", "body" y opcionalmente "labels" ([{"name": ...}])
+
+    Returns:
+        LocalClassification: Comando, si el resultado es confiable y la regla aplicada
+    """
+    prefix = _title_prefix(issue.get("title", ""))
+    if prefix in TITLE_PREFIXES:
+        return LocalClassification(TITLE_PREFIXES[prefix], True, f"title prefix '{prefix}:'")
+
+    label_commands = {
+        LABELS[_normalize(label.get("name", ""))]
+        for label in issue.get("labels") or []
+        if _normalize(label.get("name", "")) in LABELS
+    }
+    if len(label_commands) == 1:
+        command = label_commands.pop()
+        return LocalClassification(command, True, "issue label")
+
+    scores = keyword_scores(_normalize(f"{issue.get('title', '')}\n{issue.get('body') or ''}"))
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    confident = (
+        not label_commands  # etiquetas contradictorias: que decida el agente
+        and best_score >= KEYWORD_MIN_SCORE
+        and best_score - second_score >= KEYWORD_MIN_MARGIN
+    )
+    reason = "keywords " + ", ".join(f"{command}={score}" for command, score in ranked)
+    return LocalClassification(best if best_score else None, confident, reason)
+
+
+def slugify(text: str, max_words: int = SLUG_MAX_WORDS, max_length: int = SLUG_MAX_LENGTH) -> str:
+    """Convertir un texto en un slug ASCII corto para nombres de rama."""
+    words = [
+        word for word in re.findall(r"[a-z0-9]+", _normalize(text))
+        if word not in SLUG_STOPWORDS
+    ][:max_words]
+    slug = "-".join(words)
+    if len(slug) > max_length:
+        slug = slug[:max_length].rsplit("-", 1)[0]
+    return slug
+
+
+def generate_branch_name_locally(
+    issue_number: int,
+    title: str,
+    adw_id: str,
+    issue_type: Optional[str] = None
+) -> Optional[str]:
+    """
+    Generar el nombre de rama a partir del título del issue.
+
+    El nombre termina con el adw_id: dos ejecuciones del mismo issue no comparten
+    rama, así una no reinicia los commits de la otra.
+
+    Args:
+        issue_number: Número de issue
+        title: Título del issue
+        adw_id: ID del workflow ADW
+        issue_type: Tipo del issue (/feature, /bug, /chore) para el prefijo, si se conoce
+
+    Returns:
+        str: Nombre de rama (ej. feature-issue-12-chat-texto-tiempo-real-a3f9k2m), o
+        None si el título no da un slug útil y conviene usar el agente
+    """
+    slug = slugify(_strip_prefix(title))
+    if len(slug.split("-")) < 2:
+        return None
+    prefix = BRANCH_PREFIXES.get(issue_type or "")
+    name = f"issue-{issue_number}-{slug}-{adw_id}"
+    return f"{prefix}-{name}" if prefix else name
+
+
+def parse_issues_markdown(text: str) -> List[Dict[str, Any]]:
+    """
+    Leer los issues de un archivo con el formato de issues.md.
+
+    Returns:
+        list: Issues con "number", "title" y "body"
+    """
+    issues = []
+    sections = re.split(r"^## Issue (\d+)[^\n]*$", text, flags=re.MULTILINE)
+    for number, section in zip(sections[1::2], sections[2::2]):
+        title = re.search(r"\*\*Título:\*\*\s*`([^`]*)`", section)
+        body = re.search(r"\*\*Cuerpo:\*\*\s*```\n(.*?)\n```", section, re.DOTALL)
+        if title:
+            issues.append({
+                "number": int(number),
+                "title": title.group(1),
+                "body": body.group(1) if body else "",
+                "labels": [],
+            })
+    return issues
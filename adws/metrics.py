@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Métricas de latencia, tokens y costo de los flujos ADW en formato Prometheus.
+
+Los workflows corren como subprocesos del pool de workers, así que cada proceso
+agrega eventos a un archivo JSONL compartido (agents/adw_metrics.jsonl): una línea
+por llamada al agente, por fase del pipeline, por request a la API de GitHub y
+por comando git.
+El webhook lee ese archivo de forma incremental (solo las líneas nuevas desde la
+última lectura), acumula histogramas por comando slash, modelo y fase, y los
+expone en GET /metrics junto con el estado de la cola. Cuando el servidor atiende
+varios repositorios, los workflows registran ADW_REPO en cada evento y las series
+llevan el label repo.
+
+El archivo se rota al superar ADW_METRICS_MAX_BYTES (lo hace la retención en cada
+pasada) y se conservan ADW_METRICS_KEEP archivos rotados. El agregador guarda lo
+acumulado junto con la posición leída en agents/adw_metrics_state.json, así al
+reiniciar el servidor sigue desde esa posición en vez de releer el archivo, y
+al detectar una rotación termina de leer el archivo rotado sin perder totales.
+
+Uso:
+    python adws/metrics.py          # imprimir las métricas en formato Prometheus
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+from utils import get_project_root
+
+# Configuración
+METRICS_ENABLED = os.getenv("ADW_METRICS", "true").lower() in ("1", "true", "yes")
+METRICS_FILE = os.getenv("ADW_METRICS_FILE") or str(get_project_root() / "agents" / "adw_metrics.jsonl")
+# Repositorio del workflow (owner/nombre), lo fija el servidor al lanzarlo
+METRICS_REPO = os.getenv("ADW_REPO", "")
+# Tamaño a partir del cual se rota el archivo y cantidad de archivos rotados conservados
+METRICS_MAX_BYTES = int(os.getenv("ADW_METRICS_MAX_BYTES") or str(64 * 1024 ** 2))
+METRICS_KEEP = max(1, int(os.getenv("ADW_METRICS_KEEP") or "3"))
+# Segundos mínimos entre dos escrituras del estado del agregador
+STATE_SAVE_INTERVAL = 30.0
+STATE_VERSION = 1
+
+# Tipos de evento
+EVENT_AGENT_CALL = "agent_call"
+EVENT_PHASE = "phase"
+EVENT_GITHUB_REQUEST = "github_request"
+EVENT_GIT_OP = "git_op"
+
+# Límites superiores de los buckets de cada histograma
+DURATION_BUCKETS = [1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600]
+GITHUB_LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+GIT_DURATION_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+TOKEN_BUCKETS = [1_000, 5_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_000_000]
+COST_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10]
+
+# Tipos de token reportados en el campo usage del mensaje de resultado
+TOKEN_TYPES = ["input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"]
+
+_write_lock = threading.Lock()
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# Valor de un gauge: un número o una lista de (labels, valor)
+GaugeValue = Union[float, List[Tuple[Dict[str, str], float]]]
+
+
+def record_event(event: str, **fields: Any) -> None:
+    """
+    Agregar un evento al archivo de métricas compartido.
+
+    Nunca lanza excepciones: una métrica perdida no debe detener un workflow.
+    """
+    if not METRICS_ENABLED:
+        return
+    record = {"event": event, "ts": time.time(), **fields}
+    if METRICS_REPO:
+        record["repo"] = METRICS_REPO
+    line = json.dumps(record) + "\n"
+    try:
+        os.makedirs(os.path.dirname(METRICS_FILE), exist_ok=True)
+        with _write_lock:
+            # Una sola escritura en modo append por línea, segura entre procesos
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError:
+        pass
+
+
+def rotate_metrics_file(
+    path: str = METRICS_FILE,
+    max_bytes: int = METRICS_MAX_BYTES,
+    keep: int = METRICS_KEEP
+) -> bool:
+    """
+    Rotar el archivo de métricas si supera max_bytes: archivo -> archivo.1 -> ... -> archivo.{keep}.
+
+    Los workflows abren el archivo en cada evento, así que los siguientes eventos
+    van al archivo nuevo; el agregador termina de leer el rotado.
+
+    Returns:
+        bool: True si se rotó
+    """
+    with _write_lock:
+        try:
+            if os.path.getsize(path) < max_bytes:
+                return False
+        except OSError:
+            return False
+        keep = max(1, keep)
+        try:
+            os.remove(f"{path}.{keep}")
+        except FileNotFoundError:
+            pass
+        for index in range(keep - 1, 0, -1):
+            try:
+                os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+            except FileNotFoundError:
+                pass
+        os.replace(path, f"{path}.1")
+    return True
+
+
+def record_agent_call(
+    slash_command: str,
+    model: str,
+    success: bool,
+    wall_seconds: float,
+    cost_usd: Optional[float] = None,
+    usage: Optional[Dict[str, int]] = None,
+    cached: bool = False
+) -> None:
+    """Registrar una llamada a Claude Code (o un acierto de la caché de fases)."""
+    record_event(
+        EVENT_AGENT_CALL,
+        slash_command=slash_command,
+        model=model,
+        success=success,
+        cached=cached,
+        wall_seconds=wall_seconds,
+        cost_usd=cost_usd,
+        usage={token_type: (usage or {}).get(token_type, 0) for token_type in TOKEN_TYPES},
+    )
+
+
+def record_phase(phase: str, status: str, seconds: float) -> None:
+    """Registrar la duración de una fase del pipeline (success, failed, aborted o cancelled)."""
+    record_event(EVENT_PHASE, phase=phase, status=status, seconds=seconds)
+
+
+def record_github_request(method: str, status: int, seconds: float) -> None:
+    """Registrar la latencia de un request a la API de GitHub (status 0 si no hubo respuesta)."""
+    record_event(EVENT_GITHUB_REQUEST, method=method, status=status, seconds=seconds)
+
+
+def record_git_op(op: str, success: bool, seconds: float) -> None:
+    """Registrar la duración de un comando git por subcomando."""
+    record_event(EVENT_GIT_OP, op=op, success=success, seconds=seconds)
+
+
+class Histogram:
+    """Histograma acumulativo con labels, al estilo de Prometheus."""
+
+    def __init__(self, name: str, help_text: str, buckets: List[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series: Dict[LabelSet, Dict[str, Any]] = {}
+
+    def observe(self, labels: Dict[str, str], value: float) -> None:
+        """Agregar una observación."""
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][index] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def to_state(self) -> Dict[str, Any]:
+        """Serializar las series para el estado persistido del agregador."""
+        return {"buckets": self.buckets, "series": [[list(key), series] for key, series in self.series.items()]}
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restaurar las series de un estado persistido.
+
+        Raises:
+            ValueError: Si el estado es de otros buckets
+        """
+        if state["buckets"] != self.buckets:
+            raise ValueError(f"Buckets of {self.name} changed")
+        self.series = {
+            tuple(tuple(pair) for pair in key): series for key, series in state["series"]
+        }
+
+    def render(self) -> List[str]:
+        """Renderizar en formato de exposición de texto de Prometheus."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_number(bound)),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_number(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+def _format_number(value: float) -> str:
+    """Formatear un número sin decimales innecesarios."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labels: LabelSet) -> str:
+    """Formatear labels como {k="v",...} escapando los valores."""
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsAggregator:
+    """
+    Agregador incremental del archivo de métricas.
+
+    Recuerda la posición leída para procesar solo las líneas nuevas en cada
+    scrape. Si el archivo se rota termina de leer el rotado y sigue con el nuevo
+    desde el inicio, conservando lo acumulado; si se trunca lo vuelve a leer.
+    """
+
+    def __init__(self, path: str = METRICS_FILE, state_path: Optional[str] = None, persist: bool = True):
+        """
+        Args:
+            path: Archivo JSONL de eventos
+            state_path: Estado persistido (por defecto {archivo}_state.json junto al archivo)
+            persist: Guardar el estado al procesar líneas nuevas (False para solo leerlo)
+        """
+        self.path = path
+        self.state_path = state_path or os.path.splitext(path)[0] + "_state.json"
+        self.persist = persist
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._reset()
+        self._load_state()
+
+    def _reset(self) -> None:
+        """Descartar lo acumulado y volver al inicio del archivo."""
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self.agent_duration = Histogram(
+            "adw_agent_call_duration_seconds", "Wall time of Claude Code calls by slash command and model.",
+            DURATION_BUCKETS
+        )
+        self.agent_tokens = Histogram(
+            "adw_agent_call_tokens", "Tokens per Claude Code call by slash command, model and token type.",
+            TOKEN_BUCKETS
+        )
+        self.agent_cost = Histogram(
+            "adw_agent_call_cost_usd", "Cost in USD per Claude Code call by slash command and model.",
+            COST_BUCKETS
+        )
+        self.phase_duration = Histogram(
+            "adw_phase_duration_seconds", "Duration of workflow phases by phase and status.",
+            DURATION_BUCKETS
+        )
+        self.github_latency = Histogram(
+            "adw_github_request_duration_seconds", "Latency of GitHub API requests by method and status.",
+            GITHUB_LATENCY_BUCKETS
+        )
+        self.git_duration = Histogram(
+            "adw_git_operation_duration_seconds", "Duration of git commands by subcommand and result.",
+            GIT_DURATION_BUCKETS
+        )
+        self.agent_calls: Dict[LabelSet, int] = {}
+        self.malformed_lines = 0
+
+    def _histograms(self) -> Dict[str, Histogram]:
+        """Histogramas por nombre de métrica."""
+        return {
+            histogram.name: histogram
+            for histogram in (
+                self.agent_duration, self.agent_tokens, self.agent_cost, self.phase_duration, self.github_latency,
+                self.git_duration
+            )
+        }
+
+    def _load_state(self) -> None:
+        """Restaurar lo acumulado y la posición leída; si el estado no sirve se relee el archivo."""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != STATE_VERSION:
+                return
+            for name, histogram in self._histograms().items():
+                histogram.load_state(state["histograms"][name])
+            self.agent_calls = {tuple(tuple(pair) for pair in key): count for key, count in state["agent_calls"]}
+            self.malformed_lines = state["malformed_lines"]
+            self._inode = state["inode"]
+            self._offset = state["offset"]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring metrics state {self.state_path}: {e}")
+            self._reset()
+
+    def _save_state(self, force: bool = False) -> None:
+        """Guardar lo acumulado y la posición leída (como mucho cada STATE_SAVE_INTERVAL segundos)."""
+        if not self.persist or (not force and time.monotonic() - self._last_save < STATE_SAVE_INTERVAL):
+            return
+        state = {
+            "version": STATE_VERSION,
+            "inode": self._inode,
+            "offset": self._offset,
+            "malformed_lines": self.malformed_lines,
+            "agent_calls": [[list(key), count] for key, count in self.agent_calls.items()],
+            "histograms": {name: histogram.to_state() for name, histogram in self._histograms().items()},
+        }
+        partial = f"{self.state_path}.partial"
+        try:
+            with open(partial, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(partial, self.state_path)
+            self._last_save = time.monotonic()
+        except OSError as e:
+            print(f"Could not save metrics state: {e}")
+
+    def save(self) -> None:
+        """Guardar el estado ahora (ej. al detener el servidor)."""
+        with self._lock:
+            self._save_state(force=True)
+
+    def _read_from(self, path: str, offset: int) -> int:
+        """Procesar las líneas completas de path desde offset y retornar la nueva posición."""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        # Procesar solo líneas completas; una línea a medio escribir queda para el próximo scrape
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                self._observe(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                self.malformed_lines += 1
+        return offset + end
+
+    def _rotated_file(self, inode: int) -> Optional[str]:
+        """Archivo rotado que conserva el inode leído hasta ahora, si sigue existiendo."""
+        for index in range(1, METRICS_KEEP + 1):
+            candidate = f"{self.path}.{index}"
+            try:
+                if os.stat(candidate).st_ino == inode:
+                    return candidate
+            except FileNotFoundError:
+                continue
+        return None
+
+    def refresh(self) -> None:
+        """Procesar las líneas agregadas desde la última lectura."""
+        with self._lock:
+            start = (self._inode, self._offset)
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                stat = None
+
+            if self._inode is not None and (stat is None or stat.st_ino != self._inode):
+                # Se rotó: terminar de leer el archivo anterior y seguir con el nuevo
+                rotated = self._rotated_file(self._inode)
+                if rotated:
+                    self._read_from(rotated, self._offset)
+                self._inode, self._offset = None, 0
+
+            if stat is not None:
+                if stat.st_size < self._offset:
+                    # Truncado en el lugar: lo que queda es contenido nuevo
+                    self._offset = 0
+                self._inode = stat.st_ino
+                self._offset = self._read_from(self.path, self._offset)
+
+            if (self._inode, self._offset) != start:
+                self._save_state()
+
+    def _observe(self, record: Dict[str, Any]) -> None:
+        """Acumular un evento."""
+        event = record.get("event")
+        repo = {"repo": record["repo"]} if record.get("repo") else {}
+        if event == EVENT_AGENT_CALL:
+            labels = {**repo, "command": record["slash_command"], "model": record["model"]}
+            call_key = tuple(sorted({
+                **labels,
+                "result": "cached" if record.get("cached") else ("success" if record["success"] else "error"),
+            }.items()))
+            self.agent_calls[call_key] = self.agent_calls.get(call_key, 0) + 1
+            if record.get("cached"):
+                return
+
+            self.agent_duration.observe(labels, record["wall_seconds"])
+            for token_type, count in (record.get("usage") or {}).items():
+                self.agent_tokens.observe({**labels, "type": token_type}, count)
+            if record.get("cost_usd") is not None:
+                self.agent_cost.observe(labels, record["cost_usd"])
+        elif event == EVENT_PHASE:
+            self.phase_duration.observe(
+                {**repo, "phase": record["phase"], "status": record["status"]}, record["seconds"]
+            )
+        elif event == EVENT_GITHUB_REQUEST:
+            self.github_latency.observe(
+                {**repo, "method": record["method"], "status": str(record["status"])}, record["seconds"]
+            )
+        elif event == EVENT_GIT_OP:
+            self.git_duration.observe(
+                {**repo, "op": record["op"], "result": "success" if record["success"] else "error"},
+                record["seconds"]
+            )
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, GaugeValue]]] = None) -> str:
+        """
+        Renderizar todas las métricas en formato de texto de Prometheus.
+
+        Args:
+            gauges: Métricas instantáneas adicionales: nombre -> (ayuda, valor),
+                donde el valor es un número o una lista de (labels, valor)
+
+        Returns:
+            str: Cuerpo de la respuesta de /metrics
+        """
+        self.refresh()
+        lines: List[str] = []
+        with self._lock:
+            # Los totales de tokens y costo son los _sum de los histogramas
+            lines.append("# HELP adw_agent_calls_total Claude Code calls by slash command, model and result.")
+            lines.append("# TYPE adw_agent_calls_total counter")
+            for key, value in sorted(self.agent_calls.items()):
+                lines.append(f"adw_agent_calls_total{_format_labels(key)} {value}")
+
+            for histogram in (
+                self.agent_duration, self.agent_tokens, self.agent_cost, self.phase_duration, self.github_latency,
+                self.git_duration
+            ):
+                lines.extend(histogram.render())
+
+            lines.append("# HELP adw_metrics_malformed_lines_total Lines of the metrics file that could not be parsed.")
+            lines.append("# TYPE adw_metrics_malformed_lines_total counter")
+            lines.append(f"adw_metrics_malformed_lines_total {self.malformed_lines}")
+
+        for name, (help_text, value) in (gauges or {}).items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, list):
+                for labels, sample in value:
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_number(sample)}")
+            else:
+                lines.append(f"{name} {_format_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    print(MetricsAggregator(persist=False).render(), end="")
@@ -0,0 +1,308 @@
+"""
+Outbox persistente y ordenado para comentarios y etiquetas de GitHub.
+
+El workflow encola comentarios y etiquetas en una base SQLite local y sigue con la
+siguiente fase de inmediato; un hilo en segundo plano los envía en orden (por issue
+o PR) reintentando con backoff. Si el proceso termina antes de enviarlos, quedan en
+la base y los entrega el siguiente sender que arranque (otro workflow o el servidor
+de webhooks).
+"""
+
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable
+
+import github
+from run_logging import get_logger
+from utils import get_project_root
+
+# Los mensajes de este módulo van al log de la ejecución en curso
+logger = get_logger("outbox")
+
+# Operaciones soportadas
+OP_COMMENT = "comment"
+OP_LABEL = "label"
+OP_STATUS = "status"
+
+# Estados de una entrada
+ENTRY_PENDING = "pending"
+ENTRY_SENDING = "sending"
+ENTRY_SENT = "sent"
+ENTRY_FAILED = "failed"
+
+# Configuración del outbox
+OUTBOX_DB_PATH = os.getenv("ADW_OUTBOX_DB") or str(get_project_root() / "agents" / "adw_outbox.sqlite3")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("ADW_OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_FLUSH_TIMEOUT = float(os.getenv("ADW_OUTBOX_FLUSH_TIMEOUT", "60"))
+# Horas que se conserva una entrada ya enviada antes de borrarla
+OUTBOX_SENT_RETENTION_HOURS = float(os.getenv("ADW_OUTBOX_SENT_RETENTION_HOURS", "24"))
+# Tiempo tras el cual una entrada "sending" de un proceso caído se vuelve a enviar
+OUTBOX_SEND_LEASE = 600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    adw_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    target INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_by TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox (state, target, id);
+"""
+
+
+def _deliver_comment(target: int, payload: Dict[str, Any]) -> None:
+    github.post_comment(target, payload["body"])
+
+
+def _deliver_label(target: int, payload: Dict[str, Any]) -> None:
+    github.add_label(target, payload["label"])
+
+
+def _deliver_status(target: int, payload: Dict[str, Any]) -> None:
+    github.upsert_status_comment(target, payload["adw_id"], payload["body"])
+
+
+# Operación -> función que la entrega a GitHub
+DELIVERY_HANDLERS: Dict[str, Callable[[int, Dict[str, Any]], None]] = {
+    OP_COMMENT: _deliver_comment,
+    OP_LABEL: _deliver_label,
+    OP_STATUS: _deliver_status,
+}
+
+
+class Outbox:
+    """Cola durable de operaciones de GitHub con un sender en segundo plano."""
+
+    def __init__(
+        self,
+        adw_id: Optional[str] = None,
+        db_path: str = OUTBOX_DB_PATH,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS
+    ):
+        self.adw_id = adw_id
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.sender_id = uuid.uuid4().hex[:12]
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva (una por operación, segura entre hilos)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, op: str, target: int, payload: Dict[str, Any], adw_id: Optional[str] = None) -> int:
+        """
+        Encolar una operación de GitHub.
+
+        Args:
+            op: Operación (OP_COMMENT, OP_LABEL, OP_STATUS)
+            target: Número de issue o PR
+            payload: Datos de la operación
+            adw_id: ID del workflow ADW que la originó (por defecto: el del outbox)
+
+        Returns:
+            int: ID de la entrada en el outbox
+        """
+        adw_id = adw_id or self.adw_id or ""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO outbox (adw_id, op, target, payload, state, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (adw_id, op, target, json.dumps(payload), ENTRY_PENDING, now, now)
+            )
+        self._notify()
+        return cursor.lastrowid
+
+    def post_comment(self, issue_number: int, comment: str) -> int:
+        """Encolar un comentario en un issue o PR."""
+        return self.enqueue(OP_COMMENT, issue_number, {"body": comment})
+
+    def add_label(self, issue_number: int, label: str) -> int:
+        """Encolar una etiqueta para un issue."""
+        return self.enqueue(OP_LABEL, issue_number, {"label": label})
+
+    def post_status(self, issue_number: int, adw_id: str, body: str) -> int:
+        """
+        Encolar la versión más reciente del comentario de estado de un adw_id.
+
+        Las versiones anteriores que todavía no se enviaron se descartan, de modo
+        que un GitHub lento recibe una sola edición con el estado final.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM outbox WHERE op = ? AND target = ? AND adw_id = ? AND state = ?",
+                (OP_STATUS, issue_number, adw_id, ENTRY_PENDING)
+            )
+        return self.enqueue(OP_STATUS, issue_number, {"adw_id": adw_id, "body": body}, adw_id)
+
+    def pending_count(self, adw_id: Optional[str] = None) -> int:
+        """Contar las entradas aún no entregadas (opcionalmente de un adw_id)."""
+        query = "SELECT COUNT(*) FROM outbox WHERE state IN (?, ?)"
+        params: list = [ENTRY_PENDING, ENTRY_SENDING]
+        if adw_id is not None:
+            query += " AND adw_id = ?"
+            params.append(adw_id)
+        with self._connect() as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def start(self) -> None:
+        """Lanzar el hilo sender si no está corriendo."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # El sender hereda el contexto de logging (adw_id) de quien lo lanza
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._send_loop,), name="adw-outbox", daemon=True
+        )
+        self._thread.start()
+
+    def flush(self, timeout: float = OUTBOX_FLUSH_TIMEOUT) -> bool:
+        """
+        Esperar a que se entreguen las entradas pendientes.
+
+        Si el outbox pertenece a un adw_id solo se esperan sus entradas.
+
+        Args:
+            timeout: Segundos máximos de espera
+
+        Returns:
+            bool: True si no quedaron entradas pendientes
+        """
+        adw_id = self.adw_id
+        self.start()
+        deadline = time.monotonic() + timeout
+        while self.pending_count(adw_id) > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.2)
+        return True
+
+    def close(self, timeout: float = OUTBOX_FLUSH_TIMEOUT) -> None:
+        """Intentar vaciar el outbox y detener el sender. Lo no entregado queda persistido."""
+        if not self.flush(timeout):
+            logger.warning(f"Outbox still has {self.pending_count(self.adw_id)} pending entries; they will be retried later")
+        self._stop.set()
+        self._notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _notify(self) -> None:
+        """Despertar al sender."""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _claim_next(self) -> Optional[Dict[str, Any]]:
+        """
+        Tomar la próxima entrada a enviar.
+
+        Solo es candidata la entrada más antigua de cada issue/PR, para conservar el
+        orden de los comentarios de un mismo destino sin que un destino con
+        reintentos bloquee a los demás.
+
+        Returns:
+            dict: Entrada tomada, o un dict con "wait" si la próxima aún no vence, o None
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Recuperar entradas de senders que murieron a mitad de envío
+            conn.execute(
+                "UPDATE outbox SET state = ?, claimed_by = NULL WHERE state = ? AND next_attempt_at < ?",
+                (ENTRY_PENDING, ENTRY_SENDING, now - OUTBOX_SEND_LEASE)
+            )
+            row = conn.execute(
+                "SELECT * FROM outbox AS o WHERE o.state = ? AND o.id = ("
+                "  SELECT MIN(id) FROM outbox WHERE target = o.target AND state IN (?, ?)"
+                ") ORDER BY o.next_attempt_at, o.id LIMIT 1",
+                (ENTRY_PENDING, ENTRY_PENDING, ENTRY_SENDING)
+            ).fetchone()
+            if row is None or row["next_attempt_at"] > now:
+                conn.execute("COMMIT")
+                return {"wait": row["next_attempt_at"] - now} if row else None
+            conn.execute(
+                "UPDATE outbox SET state = ?, claimed_by = ?, next_attempt_at = ? WHERE id = ?",
+                (ENTRY_SENDING, self.sender_id, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return dict(row)
+
+    def _send_loop(self) -> None:
+        """Enviar entradas hasta que se detenga el outbox."""
+        while not self._stop.is_set():
+            try:
+                entry = self._claim_next()
+            except sqlite3.Error as e:
+                logger.error(f"Outbox database error: {e}")
+                entry = {"wait": 1.0}
+
+            if entry is None or "wait" in entry:
+                wait = entry["wait"] if entry else 5.0
+                with self._wakeup:
+                    self._wakeup.wait(timeout=max(0.05, min(wait, 5.0)))
+                continue
+
+            self._send(entry)
+
+    def _send(self, entry: Dict[str, Any]) -> None:
+        """Entregar una entrada y registrar el resultado."""
+        handler = DELIVERY_HANDLERS.get(entry["op"])
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown outbox operation: {entry['op']}")
+            handler(entry["target"], json.loads(entry["payload"]))
+        except Exception as e:
+            attempts = entry["attempts"] + 1
+            if attempts >= self.max_attempts:
+                state, delay = ENTRY_FAILED, 0.0
+                logger.error(f"Giving up on outbox entry {entry['id']} ({entry['op']} #{entry['target']}): {e}")
+            else:
+                state, delay = ENTRY_PENDING, min(300.0, 2.0 ** attempts)
+                logger.warning(f"Outbox entry {entry['id']} failed, retrying in {delay:.0f}s: {e}")
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE outbox SET state = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                    "claimed_by = NULL WHERE id = ?",
+                    (state, attempts, time.time() + delay, str(e), entry["id"])
+                )
+            return
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET state = ?, attempts = ?, sent_at = ?, claimed_by = NULL WHERE id = ?",
+                (ENTRY_SENT, entry["attempts"] + 1, now, entry["id"])
+            )
+            # Olvidar las entradas enviadas que superan la retención
+            conn.execute(
+                "DELETE FROM outbox WHERE state = ? AND sent_at < ?",
+                (ENTRY_SENT, now - OUTBOX_SENT_RETENTION_HOURS * 3600)
+            )
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Caché direccionada por contenido de resultados de fases deterministas.
+
+Volver a disparar `adw` sobre un issue sin cambios repite la clasificación, el
+nombre de rama y el plan. Antes de lanzar Claude, execute_template busca el
+resultado en esta caché con una clave derivada de (comando slash, args, modelo,
+contexto extra y, para los planificadores, el hash del árbol del repositorio).
+
+Solo se cachean los comandos de CACHE_POLICY; el resto (/implement, /commit,
+/review, /document, /pull_request...) tiene efectos secundarios y nunca se
+cachea. Para los planificadores también se guardan los archivos que crearon
+(la spec en specs/) y se restauran en el worktree en cada acierto.
+
+La base SQLite es compartida entre ejecuciones y se poda por LRU al superar
+ADW_PHASE_CACHE_MAX_ENTRIES o ADW_PHASE_CACHE_MAX_BYTES.
+
+Uso:
+    python adws/phase_cache.py stats
+    python adws/phase_cache.py clear
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from git_ops import git_output
+from utils import get_project_root
+
+# Configuración de la caché
+PHASE_CACHE_ENABLED = os.getenv("ADW_PHASE_CACHE", "true").lower() in ("1", "true", "yes")
+PHASE_CACHE_DB_PATH = os.getenv("ADW_PHASE_CACHE_DB") or str(get_project_root() / "agents" / "adw_phase_cache.sqlite3")
+PHASE_CACHE_MAX_ENTRIES = int(os.getenv("ADW_PHASE_CACHE_MAX_ENTRIES", "500"))
+PHASE_CACHE_MAX_BYTES = int(os.getenv("ADW_PHASE_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Comandos excluidos explícitamente aunque figuren en CACHE_POLICY (ej. "/feature,/bug")
+PHASE_CACHE_SKIP = {
+    command.strip() for command in os.getenv("ADW_PHASE_CACHE_SKIP", "").split(",") if command.strip()
+}
+
+# Comando slash -> política de caché.
+#   tree: la clave incluye el hash del árbol del repositorio (el resultado depende del código)
+#   artifacts: guardar y restaurar los archivos que el comando crea o modifica
+CACHE_POLICY: Dict[str, Dict[str, bool]] = {
+    "/classify_issue": {"tree": False, "artifacts": False},
+    "/generate_branch_name": {"tree": False, "artifacts": False},
+    "/feature": {"tree": True, "artifacts": True},
+    "/bug": {"tree": True, "artifacts": True},
+    "/chore": {"tree": True, "artifacts": True},
+}
+
+# Tamaño máximo de un archivo producido por una fase para guardarlo en la caché
+MAX_ARTIFACT_BYTES = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    slash_command TEXT NOT NULL,
+    model TEXT NOT NULL,
+    output TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (last_used_at);
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content BLOB NOT NULL,
+    PRIMARY KEY (key, path)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    slash_command TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    stores INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def cache_policy(slash_command: str) -> Optional[Dict[str, bool]]:
+    """Obtener la política de caché de un comando, o None si no se cachea."""
+    if not PHASE_CACHE_ENABLED or slash_command in PHASE_CACHE_SKIP:
+        return None
+    return CACHE_POLICY.get(slash_command)
+
+
+def tree_hash(cwd: Path) -> str:
+    """
+    Hash del contenido del repositorio: el árbol de HEAD más los cambios sin commitear.
+
+    Args:
+        cwd: Raíz del checkout (worktree de la ejecución o raíz del proyecto)
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    digest = hashlib.sha256(git_output(["rev-parse", "HEAD^{tree}"], cwd).strip().encode())
+    status = git_output(["status", "--porcelain", "-uall"], cwd)
+    if status:
+        digest.update(status.encode())
+        digest.update(git_output(["diff", "HEAD"], cwd).encode())
+    return digest.hexdigest()
+
+
+def cache_key(slash_command: str, args: List[str], model: str, context: Optional[str] = None, tree: Optional[str] = None) -> str:
+    """Construir la clave de caché de una llamada a un comando slash."""
+    material = json.dumps(
+        {"command": slash_command, "args": args, "model": model, "context": context, "tree": tree},
+        sort_keys=True
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def snapshot_changes(cwd: Path) -> Dict[str, Tuple[float, int]]:
+    """
+    Registrar los archivos modificados o sin seguimiento del checkout.
+
+    Returns:
+        dict: Ruta relativa -> (mtime, tamaño), para detectar qué escribió una fase
+    """
+    snapshot = {}
+    for line in git_output(["status", "--porcelain", "-uall"], cwd).splitlines():
+        path = line[3:].strip().strip('"')
+        if " -> " in path:
+            path = path.split(" -> ", 1)[1]
+        file_path = cwd / path
+        if file_path.is_file():
+            stat = file_path.stat()
+            snapshot[path] = (stat.st_mtime, stat.st_size)
+    return snapshot
+
+
+def changed_files(before: Dict[str, Tuple[float, int]], cwd: Path) -> Dict[str, bytes]:
+    """
+    Leer los archivos que cambiaron desde un snapshot.
+
+    Los directorios de artefactos de ADW (agents/, trees/) se ignoran.
+
+    Returns:
+        dict: Ruta relativa -> contenido
+    """
+    files = {}
+    for path, stat in snapshot_changes(cwd).items():
+        if path.startswith(("agents/", "trees/")) or before.get(path) == stat:
+            continue
+        if stat[1] > MAX_ARTIFACT_BYTES:
+            continue
+        files[path] = (cwd / path).read_bytes()
+    return files
+
+
+class PhaseCache:
+    """Caché SQLite de resultados de comandos slash con poda LRU."""
+
+    def __init__(
+        self,
+        db_path: str = PHASE_CACHE_DB_PATH,
+        max_entries: int = PHASE_CACHE_MAX_ENTRIES,
+        max_bytes: int = PHASE_CACHE_MAX_BYTES
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva (una por operación, segura entre hilos)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _count(self, conn: sqlite3.Connection, slash_command: str, counter: str, amount: int = 1) -> None:
+        """Incrementar un contador de métricas de un comando."""
+        conn.execute("INSERT OR IGNORE INTO counters (slash_command) VALUES (?)", (slash_command,))
+        conn.execute(
+            f"UPDATE counters SET {counter} = {counter} + ? WHERE slash_command = ?",
+            (amount, slash_command)
+        )
+
+    def get(self, key: str, slash_command: str) -> Optional[Dict[str, Any]]:
+        """
+        Buscar un resultado y registrar el acierto o fallo.
+
+        Returns:
+            dict: {"output": str, "artifacts": {ruta: bytes}}, o None si no está
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT output FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(conn, slash_command, "misses")
+                return None
+            conn.execute(
+                "UPDATE entries SET last_used_at = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key)
+            )
+            self._count(conn, slash_command, "hits")
+            artifacts = {
+                artifact["path"]: artifact["content"]
+                for artifact in conn.execute("SELECT path, content FROM artifacts WHERE key = ?", (key,))
+            }
+        return {"output": row["output"], "artifacts": artifacts}
+
+    def put(self, key: str, slash_command: str, model: str, output: str, artifacts: Optional[Dict[str, bytes]] = None) -> None:
+        """Guardar un resultado (y los archivos que produjo) y podar la caché."""
+        artifacts = artifacts or {}
+        size_bytes = len(output.encode("utf-8")) + sum(len(content) for content in artifacts.values())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, slash_command, model, output, size_bytes, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, slash_command, model, output, size_bytes, now, now)
+            )
+            conn.executemany(
+                "INSERT INTO artifacts (key, path, content) VALUES (?, ?, ?)",
+                [(key, path, content) for path, content in artifacts.items()]
+            )
+            self._count(conn, slash_command, "stores")
+            self._evict(conn)
+            conn.execute("COMMIT")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Eliminar las entradas menos usadas recientemente hasta respetar los límites."""
+        total_entries, total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM entries"
+        ).fetchone()
+        if total_entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        for row in conn.execute("SELECT key, slash_command, size_bytes FROM entries ORDER BY last_used_at").fetchall():
+            if total_entries <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (row["key"],))
+            conn.execute("DELETE FROM artifacts WHERE key = ?", (row["key"],))
+            self._count(conn, row["slash_command"], "evictions")
+            total_entries -= 1
+            total_bytes -= row["size_bytes"]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Obtener métricas de la caché.
+
+        Returns:
+            dict: Entradas, bytes y contadores hits/misses/stores/evictions por comando
+        """
+        with self._connect() as conn:
+            entries, size_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM entries"
+            ).fetchone()
+            commands = {
+                row["slash_command"]: {
+                    "hits": row["hits"],
+                    "misses": row["misses"],
+                    "stores": row["stores"],
+                    "evictions": row["evictions"],
+                }
+                for row in conn.execute("SELECT * FROM counters ORDER BY slash_command")
+            }
+        return {"entries": entries, "bytes": size_bytes, "commands": commands}
+
+    def clear(self) -> None:
+        """Vaciar la caché (los contadores se conservan)."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM artifacts")
+
+
+def restore_artifacts(artifacts: Dict[str, bytes], cwd: Path) -> List[str]:
+    """
+    Escribir en el checkout los archivos guardados junto a un resultado cacheado.
+
+    Returns:
+        list: Rutas relativas restauradas
+    """
+    root = cwd.resolve()
+    restored = []
+    for path, content in artifacts.items():
+        target = (root / path).resolve()
+        if root not in target.parents:
+            # Nunca escribir fuera del checkout
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        restored.append(path)
+    return restored
+
+
+def main() -> None:
+    """Punto de entrada de línea de comandos."""
+    if len(sys.argv) < 2 or sys.argv[1] not in ("stats", "clear"):
+        print("Usage: python phase_cache.py stats|clear")
+        sys.exit(1)
+
+    cache = PhaseCache()
+    if sys.argv[1] == "clear":
+        cache.clear()
+        print("Phase cache cleared")
+        return
+
+    stats = cache.stats()
+    print(f"Entries: {stats['entries']} ({stats['bytes'] / 1024:.1f} KiB)")
+    print(f"{'command':<24} {'hits':>6} {'misses':>7} {'stores':>7} {'evicted':>8} {'hit rate':>9}")
+    for command, counters in stats["commands"].items():
+        lookups = counters["hits"] + counters["misses"]
+        hit_rate = f"{counters['hits'] / lookups:.0%}" if lookups else "-"
+        print(
+            f"{command:<24} {counters['hits']:>6} {counters['misses']:>7} "
+            f"{counters['stores']:>7} {counters['evictions']:>8} {hit_rate:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
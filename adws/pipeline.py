@@ -0,0 +1,235 @@
+"""
+Ejecutor de fases de un flujo ADW expresado como grafo de dependencias.
+
+Cada fase declara las claves de contexto que necesita (inputs) y las que produce
+(outputs). Una fase depende de las fases que producen sus inputs; el scheduler
+ejecuta en paralelo las fases cuyas dependencias ya terminaron y, al finalizar,
+reporta el camino crítico y el tiempo ahorrado frente a una ejecución secuencial.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List, Callable, Set
+
+
+class PhaseAborted(Exception):
+    """Una fase detuvo el workflow de forma controlada (ya reportó el motivo)."""
+
+
+class PipelineCancelled(Exception):
+    """El pipeline se detuvo porque se solicitó su cancelación."""
+
+
+class Phase:
+    """Nodo del grafo: una función que recibe el contexto y retorna sus outputs."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Dict[str, Any]],
+        inputs: Optional[List[str]] = None,
+        outputs: Optional[List[str]] = None
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = inputs or []
+        self.outputs = outputs or []
+
+
+class PipelineReport:
+    """Tiempos de una ejecución del pipeline."""
+
+    def __init__(self, timings: Dict[str, Dict[str, float]], dependencies: Dict[str, Set[str]], wall_seconds: float):
+        self.timings = timings
+        self.dependencies = dependencies
+        self.wall_seconds = wall_seconds
+
+    def durations(self) -> Dict[str, float]:
+        """Duración en segundos de cada fase ejecutada."""
+        return {name: t["end"] - t["start"] for name, t in self.timings.items() if "end" in t}
+
+    def critical_path(self) -> List[str]:
+        """
+        Calcular el camino crítico: la cadena de dependencias de mayor duración.
+
+        Returns:
+            list: Nombres de las fases del camino crítico, en orden
+        """
+        durations = self.durations()
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+
+        def longest(name: str) -> float:
+            if name not in finish:
+                deps = [dep for dep in self.dependencies.get(name, set()) if dep in durations]
+                best = max(deps, key=longest, default=None)
+                previous[name] = best
+                finish[name] = durations[name] + (longest(best) if best else 0.0)
+            return finish[name]
+
+        if not durations:
+            return []
+        last = max(durations, key=longest)
+        path = []
+        while last:
+            path.append(last)
+            last = previous[last]
+        return list(reversed(path))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar el reporte (duraciones, camino crítico y ahorro por paralelismo)."""
+        durations = self.durations()
+        critical = self.critical_path()
+        serial_seconds = sum(durations.values())
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "serial_seconds": round(serial_seconds, 3),
+            "saved_seconds": round(serial_seconds - self.wall_seconds, 3),
+            "critical_path": critical,
+            "critical_path_seconds": round(sum(durations[name] for name in critical), 3),
+            "phases": {name: round(seconds, 3) for name, seconds in durations.items()},
+        }
+
+
+class Pipeline:
+    """Grafo de fases con un scheduler que ejecuta en paralelo las independientes."""
+
+    def __init__(self, phases: List[Phase], initial_keys: Optional[List[str]] = None):
+        """
+        Args:
+            phases: Fases del pipeline
+            initial_keys: Claves de contexto disponibles antes de ejecutar
+
+        Raises:
+            ValueError: Si un input no tiene productor o el grafo tiene ciclos
+        """
+        self.phases = {phase.name: phase for phase in phases}
+        initial = set(initial_keys or [])
+
+        producers: Dict[str, str] = {}
+        for phase in phases:
+            for output in phase.outputs:
+                if output in producers:
+                    raise ValueError(f"Output '{output}' produced by both {producers[output]} and {phase.name}")
+                producers[output] = phase.name
+
+        self.dependencies: Dict[str, Set[str]] = {}
+        for phase in phases:
+            deps = set()
+            for key in phase.inputs:
+                if key in producers:
+                    deps.add(producers[key])
+                elif key not in initial:
+                    raise ValueError(f"Phase {phase.name} needs '{key}' but nothing produces it")
+            self.dependencies[phase.name] = deps
+
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        """Verificar que el grafo no tenga ciclos."""
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected at phase {name}")
+            visiting.add(name)
+            for dep in self.dependencies[name]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.phases:
+            visit(name)
+
+    def run(
+        self,
+        context: Dict[str, Any],
+        max_workers: int = 4,
+        completed: Optional[Set[str]] = None,
+        on_phase_start: Optional[Callable[[str], None]] = None,
+        on_phase_complete: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        on_phase_error: Optional[Callable[[str, BaseException], None]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> PipelineReport:
+        """
+        Ejecutar el pipeline.
+
+        Args:
+            context: Contexto compartido; se completa con los outputs de cada fase
+            max_workers: Máximo de fases ejecutándose en paralelo
+            completed: Fases ya completadas (sus outputs deben estar en el contexto)
+            on_phase_start: Callback al iniciar cada fase
+            on_phase_complete: Callback con los outputs de cada fase completada
+            on_phase_error: Callback cuando una fase lanza una excepción
+            cancel_event: Al activarse no se programan más fases
+
+        Returns:
+            PipelineReport: Tiempos de las fases ejecutadas
+
+        Raises:
+            PipelineCancelled: Si se activó cancel_event antes de completar todas las fases
+            Exception: La primera excepción lanzada por una fase, tras esperar a las
+            que ya estaban en curso
+        """
+        done: Set[str] = set(completed or [])
+        timings: Dict[str, Dict[str, float]] = {}
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        start_wall = time.monotonic()
+
+        def execute(name: str) -> Dict[str, Any]:
+            timings[name] = {"start": time.monotonic()}
+            if on_phase_start:
+                on_phase_start(name)
+            try:
+                return self.phases[name].func(context) or {}
+            finally:
+                timings[name]["end"] = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="adw-phase") as executor:
+            while True:
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                if error is None and not cancelled:
+                    scheduled = set(running.values())
+                    for name in self.phases:
+                        if name in done or name in scheduled:
+                            continue
+                        if self.dependencies[name] <= done:
+                            # Cada fase hereda el contexto (adw_id de los logs) del hilo que la programa
+                            running[executor.submit(contextvars.copy_context().run, execute, name)] = name
+
+                if not running:
+                    break
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        outputs = future.result()
+                    except BaseException as e:
+                        if on_phase_error:
+                            on_phase_error(name, e)
+                        if error is None:
+                            error = e
+                        continue
+
+                    missing = [key for key in self.phases[name].outputs if key not in outputs]
+                    if missing and error is None:
+                        error = RuntimeError(f"Phase {name} did not produce {', '.join(missing)}")
+                    context.update(outputs)
+                    done.add(name)
+                    if on_phase_complete and not missing:
+                        on_phase_complete(name, outputs)
+
+        report = PipelineReport(timings, self.dependencies, time.monotonic() - start_wall)
+        # Los errores de las fases interrumpidas son consecuencia de la cancelación
+        if cancel_event is not None and cancel_event.is_set() and done < set(self.phases):
+            raise PipelineCancelled("Pipeline cancelled")
+        if error is not None:
+            raise error
+        return report
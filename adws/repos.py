@@ -0,0 +1,240 @@
+"""
+Repositorios atendidos por el servidor de webhooks.
+
+Sin ADW_REPOS_CONFIG el servidor atiende un solo repositorio: el de
+GITHUB_REPO_OWNER/GITHUB_REPO_NAME sobre su propio checkout, como siempre. Con
+ADW_REPOS_CONFIG apuntando a un JSON:
+
+    {"repos": [
+        {"full_name": "owner/app", "path": "/srv/adw/app", "max_workers": 2,
+         "pat_env": "APP_GITHUB_PAT"},
+        {"full_name": "owner/site", "path": "/srv/adw/site"}
+    ]}
+
+cada webhook se enruta por repository.full_name a la configuración de su
+repositorio: un pool de workers propio (max_workers, por defecto ADW_MAX_WORKERS),
+su checkout (donde quedan trees/, agents/ y las bases SQLite por repositorio), su
+outbox y su retención. Los workflows corren con ADW_PROJECT_ROOT apuntando al
+checkout y GITHUB_REPO_OWNER/GITHUB_REPO_NAME/GITHUB_PAT del repositorio, y
+registran sus métricas en el archivo compartido del servidor con el label repo.
+Cada checkout necesita sus propios comandos slash en .claude/commands.
+
+Los nodos de adw_worker.py usan la misma configuración (con las rutas de sus
+propios checkouts) para ejecutar los trabajos de la cola compartida.
+"""
+
+import contextvars
+import json
+import os
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable
+
+import github
+from data_types import RepoConfig
+from job_queue import JobQueue, WorkerPool, MAX_WORKERS
+from metrics import METRICS_FILE
+from outbox import Outbox
+from retention import RetentionManager
+from utils import get_project_root
+
+REPOS_CONFIG_PATH = os.getenv("ADW_REPOS_CONFIG", "")
+
+# Clave del repositorio en modo de un solo repositorio (columna repo de la cola)
+DEFAULT_REPO_KEY = ""
+
+
+def load_repos(path: str = REPOS_CONFIG_PATH) -> Dict[str, RepoConfig]:
+    """
+    Cargar los repositorios configurados.
+
+    Args:
+        path: JSON de ADW_REPOS_CONFIG (vacío para el modo de un solo repositorio)
+
+    Returns:
+        dict: Clave (full_name en minúsculas, o "" sin configuración) -> RepoConfig
+
+    Raises:
+        ValueError: Si el archivo es inválido, repite un repositorio o un checkout no existe
+    """
+    if not path:
+        owner, name = github.GITHUB_REPO_OWNER, github.GITHUB_REPO_NAME
+        full_name = f"{owner}/{name}" if owner and name else ""
+        return {DEFAULT_REPO_KEY: RepoConfig(full_name=full_name, path=str(get_project_root()))}
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("repos", []) if isinstance(data, dict) else data
+    repos: Dict[str, RepoConfig] = {}
+    for entry in entries:
+        repo = RepoConfig(**entry)
+        key = repo.full_name.lower()
+        if "/" not in key:
+            raise ValueError(f"Invalid repository name in {path}: {repo.full_name!r} (expected owner/name)")
+        if key in repos:
+            raise ValueError(f"Repository {repo.full_name} configured twice in {path}")
+        if not Path(repo.path).is_dir():
+            raise ValueError(f"Checkout of {repo.full_name} not found: {repo.path}")
+        repos[key] = repo
+    if not repos:
+        raise ValueError(f"No repositories configured in {path}")
+    return repos
+
+
+def repo_store_path(root: Path, filename: str) -> str:
+    """Ruta de una base SQLite propia del repositorio, en agents/ de su checkout."""
+    return str(root / "agents" / filename)
+
+
+def workflow_env(repo: RepoConfig) -> Dict[str, str]:
+    """
+    Variables de entorno de los workflows de un repositorio configurado.
+
+    Las bases por repositorio se fijan explícitamente para que no se hereden las
+    del servidor (un outbox compartido enviaría comentarios al repositorio equivocado).
+    """
+    owner, name = repo.full_name.split("/", 1)
+    root = Path(repo.path).resolve()
+    env = {
+        "ADW_PROJECT_ROOT": str(root),
+        "ADW_REPO": repo.full_name,
+        "GITHUB_REPO_OWNER": owner,
+        "GITHUB_REPO_NAME": name,
+        "GITHUB_REPO_URL": f"https://github.com/{repo.full_name}",
+        "ADW_METRICS_FILE": METRICS_FILE,
+        "ADW_OUTBOX_DB": repo_store_path(root, "adw_outbox.sqlite3"),
+        "ADW_PHASE_CACHE_DB": repo_store_path(root, "adw_phase_cache.sqlite3"),
+        "ADW_CONTEXT_INDEX_DB": repo_store_path(root, "adw_context_index.sqlite3"),
+        "ADW_SPEC_INDEX_DB": repo_store_path(root, "adw_spec_index.sqlite3"),
+    }
+    pat = os.getenv(repo.pat_env) if repo.pat_env else None
+    if pat:
+        env["GITHUB_PAT"] = pat
+    env.update(repo.env)
+    return env
+
+
+class RepoRuntime:
+    """Pool de workers, outbox y retención de un repositorio."""
+
+    def __init__(
+        self,
+        key: str,
+        config: RepoConfig,
+        queue: JobQueue,
+        is_active: Callable[[str], bool]
+    ):
+        """
+        Args:
+            key: Clave del repositorio en la cola ("" en modo de un solo repositorio)
+            config: Configuración del repositorio
+            queue: Cola de trabajos compartida
+            is_active: Función que indica si un adw_id sigue pendiente o en ejecución
+        """
+        self.key = key
+        self.config = config
+        self.root = Path(config.path).resolve()
+        max_workers = config.max_workers if config.max_workers is not None else MAX_WORKERS
+
+        if key == DEFAULT_REPO_KEY:
+            # Un solo repositorio: las bases y el entorno del servidor, sin cambios
+            self.pool = WorkerPool(queue, max_workers=max_workers)
+            self.outbox = Outbox()
+            self.retention = RetentionManager(is_active=is_active)
+        else:
+            self.pool = WorkerPool(
+                queue, max_workers=max_workers, repo=key, root=self.root, env=workflow_env(config)
+            )
+            self.outbox = Outbox(db_path=repo_store_path(self.root, "adw_outbox.sqlite3"))
+            self.retention = RetentionManager(
+                db_path=repo_store_path(self.root, "adw_retention.sqlite3"),
+                is_active=is_active,
+                archive_dir=self.root / "agents" / "archive",
+                root=self.root
+            )
+
+    def _start_outbox(self) -> None:
+        """Arrancar el sender del outbox apuntando al repositorio (el hilo copia este contexto)."""
+        if self.key != DEFAULT_REPO_KEY:
+            owner, name = self.config.full_name.split("/", 1)
+            pat = os.getenv(self.config.pat_env) if self.config.pat_env else None
+            github.use_repo(owner, name, pat or "")
+        self.outbox.start()
+
+    def start(self, retention: bool = True) -> None:
+        """Arrancar el pool, el sender del outbox y (opcionalmente) la retención."""
+        self.pool.start()
+        contextvars.copy_context().run(self._start_outbox)
+        if retention:
+            self.retention.start()
+
+    def stop(self, drain: bool = False) -> None:
+        """
+        Detener la retención, el pool y el outbox.
+
+        Args:
+            drain: Esperar a que terminen los workflows en curso antes de cerrar el outbox
+        """
+        self.retention.stop()
+        self.pool.stop(timeout=None if drain else 5)
+        self.outbox.close(timeout=5)
+
+    def status(self) -> Dict[str, Any]:
+        """Estado del repositorio para /queue y /health."""
+        return {
+            "repo": self.config.full_name or None,
+            "path": str(self.root),
+            "max_workers": self.pool.max_workers,
+            "active": self.pool.active_jobs(),
+            "stats": self.pool.queue.stats(self.key),
+            "outbox_pending": self.outbox.pending_count(),
+        }
+
+
+class RepoRouter:
+    """Enrutamiento de los webhooks al repositorio que corresponde."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        is_active: Callable[[str], bool],
+        repos: Optional[Dict[str, RepoConfig]] = None
+    ):
+        """
+        Args:
+            queue: Cola de trabajos compartida
+            is_active: Función que indica si un adw_id sigue pendiente o en ejecución
+            repos: Repositorios configurados (por defecto los de ADW_REPOS_CONFIG)
+        """
+        self.queue = queue
+        self.runtimes: Dict[str, RepoRuntime] = {
+            key: RepoRuntime(key, config, queue, is_active)
+            for key, config in (repos if repos is not None else load_repos()).items()
+        }
+
+    @property
+    def multi_repo(self) -> bool:
+        """Indicar si el servidor atiende repositorios configurados en ADW_REPOS_CONFIG."""
+        return DEFAULT_REPO_KEY not in self.runtimes
+
+    def route(self, payload: Dict[str, Any]) -> Optional[RepoRuntime]:
+        """
+        Obtener el repositorio de un webhook por repository.full_name.
+
+        En modo de un solo repositorio todos los webhooks van a ese repositorio.
+
+        Returns:
+            RepoRuntime: Repositorio del webhook, o None si no está configurado
+        """
+        if not self.multi_repo:
+            return self.runtimes[DEFAULT_REPO_KEY]
+        full_name = ((payload.get("repository") or {}).get("full_name") or "").lower()
+        return self.runtimes.get(full_name)
+
+    def for_job(self, adw_id: str) -> Optional[RepoRuntime]:
+        """Repositorio de un trabajo de la cola por su adw_id."""
+        job = self.queue.get_job(adw_id)
+        return self.runtimes.get(job["repo"]) if job else None
+
+    def all(self) -> List[RepoRuntime]:
+        """Todos los repositorios atendidos."""
+        return list(self.runtimes.values())
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Retención de los artefactos de ejecución en agents/.
+
+Cada ejecución deja en agents/{adw_id}/ (y en trees/{adw_id}/agents/{adw_id}/ si
+usó worktree) la salida cruda de cada agente, prompts, capturas de la revisión y
+logs. Este módulo comprime cada ejecución terminada en un único archivo
+agents/archive/{adw_id}.tar.gz, guarda un resumen pequeño (issue, estado, fases,
+duración, tokens, tamaño) en una base SQLite para análisis, y borra los archivos
+más viejos que la edad máxima o que excedan el tamaño total permitido. Los
+resúmenes se conservan aunque se borre el archivo comprimido.
+
+El barrido es incremental: el índice SQLite recuerda cada ejecución conocida y
+cuándo volver a revisarla, así que cada pasada solo lista el primer nivel de
+agents/ y trees/ (y solo si cambió) y lee el journal de las ejecuciones que
+vencen, sin recorrer el árbol completo.
+
+Uso:
+    python adws/retention.py sweep            # una pasada de retención
+    python adws/retention.py stats            # resumen del índice
+    python adws/retention.py restore <adw_id> # descomprimir un archivo para reanudar
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tarfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+from journal import RunJournal
+from metrics import rotate_metrics_file
+from utils import get_project_root
+
+# Estados de una ejecución en el índice
+RUN_LIVE = "live"
+RUN_ARCHIVED = "archived"
+RUN_EXPIRED = "expired"
+
+# Configuración de la retención
+RETENTION_ENABLED = os.getenv("ADW_RETENTION", "true").lower() in ("1", "true", "yes")
+RETENTION_DB_PATH = os.getenv("ADW_RETENTION_DB") or str(get_project_root() / "agents" / "adw_retention.sqlite3")
+RETENTION_INTERVAL = float(os.getenv("ADW_RETENTION_INTERVAL") or "300")
+# Horas que una ejecución terminada queda sin comprimir (para inspeccionarla o reanudarla)
+ARCHIVE_AFTER_HOURS = float(os.getenv("ADW_RETENTION_ARCHIVE_AFTER_HOURS") or "24")
+# Días que se conserva el archivo comprimido de una ejecución
+MAX_AGE_DAYS = float(os.getenv("ADW_RETENTION_MAX_AGE_DAYS") or "30")
+# Tamaño total máximo de los archivos comprimidos (bytes)
+MAX_ARCHIVE_BYTES = int(os.getenv("ADW_RETENTION_MAX_BYTES") or str(1024 ** 3))
+# Ejecuciones comprimidas como máximo por pasada, para no acaparar el disco
+BATCH_SIZE = int(os.getenv("ADW_RETENTION_BATCH") or "5")
+# Horas sin cambios tras las cuales una ejecución sin journal se da por abandonada
+STALE_RUN_HOURS = 72.0
+
+ARCHIVE_DIR = get_project_root() / "agents" / "archive"
+
+# Entradas de agents/ que no son ejecuciones
+RESERVED_NAMES = {"archive", "bench"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    adw_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    issue_number INTEGER,
+    status TEXT,
+    first_seen REAL NOT NULL,
+    finished_at REAL,
+    next_check_at REAL NOT NULL,
+    original_bytes INTEGER,
+    archive_path TEXT,
+    archive_bytes INTEGER,
+    archived_at REAL,
+    expired_at REAL,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_state ON runs (state, next_check_at);
+"""
+
+
+def run_dirs(adw_id: str, root: Optional[Path] = None) -> List[Path]:
+    """Directorios de artefactos de una ejecución (raíz del proyecto y worktree)."""
+    root = root or get_project_root()
+    candidates = [root / "agents" / adw_id, root / "trees" / adw_id / "agents" / adw_id]
+    return [path for path in candidates if path.is_dir()]
+
+
+def _scan_dirs(dirs: List[Path]) -> Tuple[int, int, float]:
+    """Contar archivos, bytes y la modificación más reciente de unos directorios."""
+    files = total = 0
+    newest = 0.0
+    for base in dirs:
+        for dirpath, _, filenames in os.walk(base):
+            for name in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                files += 1
+                total += stat.st_size
+                newest = max(newest, stat.st_mtime)
+    return files, total, newest
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    """Leer un JSON opcional; None si no existe o está dañado."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_summary(adw_id: str, dirs: List[Path], root: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Armar el resumen de una ejecución a partir de sus artefactos.
+
+    Args:
+        adw_id: ID del workflow ADW
+        dirs: Directorios de artefactos de la ejecución
+        root: Checkout del repositorio (por defecto la raíz del proyecto)
+
+    Returns:
+        dict: Fases completadas, duración del pipeline, tokens por tipo y
+        archivos y bytes por agente
+    """
+    summary: Dict[str, Any] = {"agents": {}}
+    state = RunJournal(adw_id, root).load()
+    if state:
+        summary["phases_completed"] = sorted(state.completed)
+        summary["branch_name"] = state.outputs.get("branch_name")
+
+    tokens: Dict[str, int] = {}
+    calls = 0
+    for base in dirs:
+        report = _read_json(base / "pipeline_report.json")
+        if report:
+            summary["wall_seconds"] = report.get("wall_seconds")
+            summary["critical_path"] = report.get("critical_path")
+            summary["phase_seconds"] = report.get("phases")
+
+        metrics_file = base / "session_metrics.jsonl"
+        if metrics_file.exists():
+            with open(metrics_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    calls += 1
+                    for key, value in record.items():
+                        if key.endswith("_tokens") and isinstance(value, int):
+                            tokens[key] = tokens.get(key, 0) + value
+
+        for entry in os.scandir(base):
+            if entry.is_dir():
+                files, size, _ = _scan_dirs([Path(entry.path)])
+                agent = summary["agents"].setdefault(entry.name, {"files": 0, "bytes": 0})
+                agent["files"] += files
+                agent["bytes"] += size
+
+    summary["agent_calls"] = calls
+    summary["tokens"] = tokens
+    return summary
+
+
+class RetentionManager:
+    """Índice incremental de ejecuciones y barrido de compresión, edad y tamaño."""
+
+    def __init__(
+        self,
+        db_path: str = RETENTION_DB_PATH,
+        is_active: Optional[Callable[[str], bool]] = None,
+        archive_dir: Path = ARCHIVE_DIR,
+        root: Optional[Path] = None
+    ):
+        """
+        Args:
+            db_path: Base SQLite del índice
+            is_active: Función que indica si un adw_id sigue pendiente o en ejecución
+            archive_dir: Directorio de los archivos comprimidos
+            root: Checkout cuyas ejecuciones se retienen (por defecto la raíz del proyecto)
+        """
+        self.db_path = db_path
+        self.root = root or get_project_root()
+        self.is_active = is_active or (lambda adw_id: False)
+        self.archive_dir = archive_dir
+        self._dir_mtimes: Dict[Path, float] = {}
+        self._worktrees: List[str] = []
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva (una por operación, segura entre hilos)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def discover(self) -> int:
+        """
+        Registrar las ejecuciones nuevas de agents/ y trees/.
+
+        Solo se lista el primer nivel de agents/, trees/ y trees/*/agents/, y solo
+        de los directorios cuyo mtime cambió desde la pasada anterior (crear o
+        borrar una entrada lo actualiza).
+
+        Returns:
+            int: Cantidad de ejecuciones nuevas
+        """
+        root = self.root
+        if self._changed(root / "trees"):
+            self._worktrees = [entry.name for entry in os.scandir(root / "trees") if entry.is_dir()]
+
+        names = set()
+        for base in [root / "agents", *(root / "trees" / name / "agents" for name in self._worktrees)]:
+            if not self._changed(base):
+                continue
+            for entry in os.scandir(base):
+                if entry.is_dir() and not entry.name.startswith(".") and entry.name not in RESERVED_NAMES:
+                    names.add(entry.name)
+
+        if not names:
+            return 0
+        now = time.time()
+        with self._connect() as conn:
+            before = conn.total_changes
+            # Una ejecución ya comprimida que vuelve a tener artefactos (ej. reanudada) se
+            # vuelve a indexar; al comprimirla de nuevo se fusiona con su archivo anterior
+            conn.executemany(
+                "INSERT INTO runs (adw_id, state, first_seen, next_check_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (adw_id) DO UPDATE SET state = excluded.state, next_check_at = excluded.next_check_at "
+                "WHERE runs.state != ?",
+                [(name, RUN_LIVE, now, now, RUN_LIVE) for name in sorted(names) if run_dirs(name, root)]
+            )
+            return conn.total_changes - before
+
+    def _changed(self, path: Path) -> bool:
+        """Indicar si el mtime de un directorio cambió desde la última consulta."""
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if self._dir_mtimes.get(path) == mtime:
+            return False
+        self._dir_mtimes[path] = mtime
+        return True
+
+    def _due_runs(self, limit: int) -> List[str]:
+        """Ejecuciones sin comprimir cuya revisión venció."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT adw_id FROM runs WHERE state = ? AND next_check_at <= ? ORDER BY next_check_at LIMIT ?",
+                (RUN_LIVE, time.time(), limit)
+            ).fetchall()
+        return [row["adw_id"] for row in rows]
+
+    def _reschedule(self, adw_id: str, next_check_at: float, **fields: Any) -> None:
+        """Posponer la próxima revisión de una ejecución."""
+        assignments = ", ".join(f"{key} = ?" for key in ["next_check_at", *fields])
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE runs SET {assignments} WHERE adw_id = ?",
+                (next_check_at, *fields.values(), adw_id)
+            )
+
+    def check_run(self, adw_id: str, force: bool = False) -> bool:
+        """
+        Comprimir una ejecución si terminó hace más de ARCHIVE_AFTER_HOURS.
+
+        Args:
+            adw_id: ID del workflow ADW
+            force: Comprimir aunque no haya pasado el tiempo de espera
+
+        Returns:
+            bool: True si se comprimió
+        """
+        now = time.time()
+        dirs = run_dirs(adw_id, self.root)
+        if not dirs:
+            # Los artefactos desaparecieron (borrados a mano): no hay nada que retener
+            with self._connect() as conn:
+                conn.execute("DELETE FROM runs WHERE adw_id = ? AND state = ?", (adw_id, RUN_LIVE))
+            return False
+        if self.is_active(adw_id):
+            self._reschedule(adw_id, now + RETENTION_INTERVAL)
+            return False
+
+        journal = RunJournal(adw_id, self.root)
+        state = journal.load()
+        if state is not None and state.finished is None:
+            # En curso o interrumpida: se revisa de nuevo más tarde
+            self._reschedule(adw_id, now + RETENTION_INTERVAL, issue_number=state.issue_number)
+            return False
+
+        if state is not None:
+            status, finished_at = state.finished, journal.path.stat().st_mtime
+            wait_hours = ARCHIVE_AFTER_HOURS
+        else:
+            status, finished_at = "unknown", _scan_dirs(dirs)[2] or now
+            wait_hours = max(ARCHIVE_AFTER_HOURS, STALE_RUN_HOURS)
+
+        archive_at = finished_at + wait_hours * 3600
+        if not force and archive_at > now:
+            self._reschedule(
+                adw_id, archive_at, status=status, finished_at=finished_at,
+                issue_number=state.issue_number if state else None
+            )
+            return False
+
+        self.archive_run(adw_id, dirs, status, finished_at, state.issue_number if state else None)
+        return True
+
+    def archive_run(
+        self,
+        adw_id: str,
+        dirs: List[Path],
+        status: str,
+        finished_at: float,
+        issue_number: Optional[int] = None
+    ) -> Path:
+        """
+        Comprimir los artefactos de una ejecución en un único tar.gz y borrarlos.
+
+        El archivo se escribe con otro nombre y se renombra al final, de modo que una
+        caída a mitad de camino no deja un archivo incompleto ni borra los originales.
+
+        Returns:
+            Path: Ruta del archivo comprimido
+        """
+        summary = build_summary(adw_id, dirs, self.root)
+        _, original_bytes, _ = _scan_dirs(dirs)
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = self.archive_dir / f"{adw_id}.tar.gz"
+        partial_path = archive_path.with_name(archive_path.name + ".partial")
+        root = self.root
+        with tarfile.open(partial_path, "w:gz") as tar:
+            if archive_path.exists():
+                # Conservar lo comprimido en una pasada anterior de la misma ejecución
+                with tarfile.open(archive_path, "r:gz") as previous:
+                    for member in previous:
+                        tar.addfile(member, previous.extractfile(member) if member.isfile() else None)
+                original_bytes += self._archived_bytes(adw_id)
+            for base in dirs:
+                tar.add(str(base), arcname=base.relative_to(root).as_posix())
+        os.replace(partial_path, archive_path)
+        archive_bytes = archive_path.stat().st_size
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE runs SET state = ?, status = ?, issue_number = ?, finished_at = ?, original_bytes = ?, "
+                "archive_path = ?, archive_bytes = ?, archived_at = ?, summary = ? WHERE adw_id = ?",
+                (
+                    RUN_ARCHIVED, status, issue_number, finished_at, original_bytes,
+                    str(archive_path), archive_bytes, time.time(), json.dumps(summary), adw_id
+                )
+            )
+
+        for base in dirs:
+            shutil.rmtree(base, ignore_errors=True)
+        print(f"Archived run {adw_id}: {original_bytes} -> {archive_bytes} bytes")
+        return archive_path
+
+    def _archived_bytes(self, adw_id: str) -> int:
+        """Bytes originales ya comprimidos de una ejecución."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT original_bytes FROM runs WHERE adw_id = ?", (adw_id,)).fetchone()
+        return (row["original_bytes"] or 0) if row else 0
+
+    def enforce_limits(self) -> int:
+        """
+        Borrar los archivos comprimidos más viejos que MAX_AGE_DAYS y, si el total
+        sigue excediendo MAX_ARCHIVE_BYTES, los más antiguos hasta entrar en el límite.
+
+        El resumen de cada ejecución se conserva en el índice.
+
+        Returns:
+            int: Cantidad de archivos borrados
+        """
+        cutoff = time.time() - MAX_AGE_DAYS * 86400
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT adw_id, archive_path, archive_bytes, finished_at FROM runs WHERE state = ? "
+                "ORDER BY finished_at, archived_at",
+                (RUN_ARCHIVED,)
+            ).fetchall()
+
+        total = sum(row["archive_bytes"] or 0 for row in rows)
+        expired = []
+        for row in rows:
+            if (row["finished_at"] or 0) < cutoff or total > MAX_ARCHIVE_BYTES:
+                expired.append(row["adw_id"])
+                total -= row["archive_bytes"] or 0
+                try:
+                    os.remove(row["archive_path"])
+                except FileNotFoundError:
+                    pass
+
+        if expired:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE runs SET state = ?, expired_at = ? WHERE adw_id = ?",
+                    [(RUN_EXPIRED, time.time(), adw_id) for adw_id in expired]
+                )
+            print(f"Deleted {len(expired)} expired run archives")
+        return len(expired)
+
+    def sweep(self, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+        """
+        Una pasada incremental: descubrir, comprimir lo vencido y aplicar los límites.
+
+        Returns:
+            dict: Ejecuciones nuevas, comprimidas y archivos borrados en esta pasada,
+            y si se rotó el archivo de métricas
+        """
+        with self._sweep_lock:
+            discovered = self.discover()
+            archived = 0
+            # Revisar hasta varias veces el lote para no quedar trabado en ejecuciones en curso
+            for adw_id in self._due_runs(batch_size * 4):
+                if archived >= batch_size:
+                    break
+                try:
+                    if self.check_run(adw_id):
+                        archived += 1
+                except (OSError, tarfile.TarError) as e:
+                    print(f"Failed to archive run {adw_id}: {e}")
+                    self._reschedule(adw_id, time.time() + RETENTION_INTERVAL)
+            expired = self.enforce_limits()
+            # El archivo de métricas es append-only: rotarlo al superar su tamaño máximo
+            metrics_rotated = rotate_metrics_file()
+        return {"discovered": discovered, "archived": archived, "expired": expired, "metrics_rotated": metrics_rotated}
+
+    def restore(self, adw_id: str) -> List[Path]:
+        """
+        Descomprimir el archivo de una ejecución en su ubicación original (ej. para reanudarla).
+
+        Returns:
+            list: Directorios restaurados
+
+        Raises:
+            FileNotFoundError: Si la ejecución no tiene archivo comprimido
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT archive_path FROM runs WHERE adw_id = ? AND state = ?", (adw_id, RUN_ARCHIVED)
+            ).fetchone()
+        if row is None or not os.path.exists(row["archive_path"]):
+            raise FileNotFoundError(f"No archive for run {adw_id}")
+
+        root = self.root
+        worktree_prefix = f"trees/{adw_id}/"
+        worktree_exists = (root / "trees" / adw_id).is_dir()
+        with tarfile.open(row["archive_path"], "r:gz") as tar:
+            members = []
+            for member in tar.getmembers():
+                parts = Path(member.name).parts
+                if Path(member.name).is_absolute() or ".." in parts or member.issym() or member.islnk():
+                    continue
+                # Sin el worktree, sus artefactos van a la raíz: recrear trees/{adw_id}
+                # como carpeta común haría creer al workflow que el worktree existe
+                if member.name.startswith(worktree_prefix) and not worktree_exists:
+                    member.name = member.name[len(worktree_prefix):]
+                members.append(member)
+            tar.extractall(str(root), members=members)
+        restored = run_dirs(adw_id, self.root)
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE runs SET state = ?, next_check_at = ? WHERE adw_id = ?",
+                (RUN_LIVE, time.time() + ARCHIVE_AFTER_HOURS * 3600, adw_id)
+            )
+        os.remove(row["archive_path"])
+        return restored
+
+    def stats(self) -> Dict[str, int]:
+        """Ejecuciones por estado y bytes originales y comprimidos."""
+        with self._connect() as conn:
+            counts = {
+                row["state"]: row["total"]
+                for row in conn.execute("SELECT state, COUNT(*) AS total FROM runs GROUP BY state")
+            }
+            sizes = conn.execute(
+                "SELECT COALESCE(SUM(original_bytes), 0) AS original, COALESCE(SUM(archive_bytes), 0) AS archive "
+                "FROM runs WHERE state = ?",
+                (RUN_ARCHIVED,)
+            ).fetchone()
+        return {
+            RUN_LIVE: counts.get(RUN_LIVE, 0),
+            RUN_ARCHIVED: counts.get(RUN_ARCHIVED, 0),
+            RUN_EXPIRED: counts.get(RUN_EXPIRED, 0),
+            "archived_original_bytes": sizes["original"],
+            "archive_bytes": sizes["archive"],
+        }
+
+    def summaries(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Resúmenes de las ejecuciones terminadas más recientes."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT adw_id, state, issue_number, status, finished_at, original_bytes, archive_bytes, summary "
+                "FROM runs WHERE summary IS NOT NULL ORDER BY finished_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [{**dict(row), "summary": json.loads(row["summary"])} for row in rows]
+
+    def start(self, interval: float = RETENTION_INTERVAL) -> None:
+        """Lanzar el barrido periódico en un hilo en segundo plano."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="adw-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Detener el barrido periódico."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _loop(self, interval: float) -> None:
+        """Barrer hasta que se detenga el manager."""
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Retention sweep failed: {e}")
+            self._stop.wait(interval)
+
+
+if __name__ == "__main__":
+    manager = RetentionManager()
+    command = sys.argv[1] if len(sys.argv) > 1 else "sweep"
+    if command == "sweep":
+        print(json.dumps(manager.sweep(), indent=2))
+    elif command == "stats":
+        print(json.dumps(manager.stats(), indent=2))
+    elif command == "restore" and len(sys.argv) > 2:
+        for path in manager.restore(sys.argv[2]):
+            print(f"Restored {path}")
+    else:
+        print("Usage: python adws/retention.py [sweep | stats | restore <adw_id>]")
+        sys.exit(1)
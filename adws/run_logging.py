@@ -0,0 +1,228 @@
+"""
+Logging estructurado y no bloqueante para las ejecuciones ADW.
+
+Todos los loggers del espacio de nombres "adw" (el logger del workflow y los de
+agent.py, github.py, etc.) escriben en una cola en memoria; un único hilo
+listener por proceso hace la E/S:
+
+- En consola, con el formato de texto de siempre
+- En agents/{adw_id}/{agent_name}/execution.log, una línea JSON por registro con
+  adw_id, fase y segundos transcurridos desde el inicio de la ejecución
+
+El adw_id y la fase viajan en contextvars, de modo que los registros de los
+módulos compartidos se enrutan al log de la ejecución correcta aunque varias
+ejecuciones compartan el proceso. Los hilos de fases del pipeline heredan el
+contexto del hilo que las programó.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, IO
+
+# Raíz del espacio de nombres de los loggers ADW
+ROOT_LOGGER = "adw"
+
+# Máximo de archivos de log abiertos a la vez por el listener
+MAX_OPEN_FILES = 32
+
+CONSOLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+CONSOLE_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+# Contexto de la ejecución actual
+_adw_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("adw_id", default=None)
+_phase_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("adw_phase", default=None)
+_started_var: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("adw_started", default=None)
+
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_router: Optional["RunFileRouter"] = None
+
+
+def set_run_context(adw_id: str) -> None:
+    """Asociar el contexto actual (y los hilos que se lancen desde él) a una ejecución."""
+    if _adw_id_var.get() != adw_id or _started_var.get() is None:
+        _started_var.set(time.monotonic())
+    _adw_id_var.set(adw_id)
+
+
+def set_phase(phase: Optional[str]) -> None:
+    """Registrar la fase en curso en el contexto actual."""
+    _phase_var.set(phase)
+
+
+class ContextFilter(logging.Filter):
+    """Estampar adw_id, fase y tiempo transcurrido en el hilo que emite el registro."""
+
+    def __init__(self, adw_id: Optional[str] = None):
+        super().__init__()
+        self.adw_id = adw_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "adw_id", None) is None:
+            record.adw_id = self.adw_id or _adw_id_var.get()
+        if not hasattr(record, "phase"):
+            record.phase = _phase_var.get()
+        if not hasattr(record, "elapsed"):
+            started = _started_var.get()
+            record.elapsed = round(time.monotonic() - started, 3) if started is not None else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "adw_id": getattr(record, "adw_id", None),
+            "phase": getattr(record, "phase", None),
+            "elapsed": getattr(record, "elapsed", None),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RunFileRouter(logging.Handler):
+    """Escribir cada registro en el execution.log de la ejecución a la que pertenece."""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(JsonFormatter())
+        self._paths: Dict[str, Path] = {}
+        self._files: "OrderedDict[Path, IO[str]]" = OrderedDict()
+
+    def register(self, adw_id: str, log_file: Path) -> None:
+        """Enviar los registros de adw_id a log_file."""
+        with self.lock:
+            self._paths[adw_id] = log_file
+
+    def _file_for(self, path: Path) -> IO[str]:
+        """Obtener el archivo abierto, cerrando el menos usado si hay demasiados."""
+        handle = self._files.get(path)
+        if handle is not None:
+            self._files.move_to_end(path)
+            return handle
+        if len(self._files) >= MAX_OPEN_FILES:
+            _, oldest = self._files.popitem(last=False)
+            oldest.close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle = self._files[path] = open(path, "a", encoding="utf-8")
+        return handle
+
+    def emit(self, record: logging.LogRecord) -> None:
+        path = self._paths.get(getattr(record, "adw_id", None) or "")
+        if path is None:
+            return
+        try:
+            handle = self._file_for(path)
+            handle.write(self.format(record) + "\n")
+            handle.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        with self.lock:
+            for handle in self._files.values():
+                handle.close()
+            self._files.clear()
+        super().close()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que conserva el mensaje y el traceback por separado."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _ensure_listener() -> RunFileRouter:
+    """Instalar (una vez por proceso) la cola, el listener y sus handlers."""
+    global _listener, _router
+    with _setup_lock:
+        if _listener is not None:
+            return _router
+
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(CONSOLE_FORMAT, datefmt=CONSOLE_DATEFMT))
+        _router = RunFileRouter()
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(logging.INFO)
+        root.handlers.clear()
+        root.addHandler(queue_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, console, _router, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown)
+        return _router
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Obtener un logger de módulo (ej. "agent", "github") conectado a la cola."""
+    _ensure_listener()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def setup_run_logger(adw_id: str, agent_name: str, log_file: Path) -> logging.Logger:
+    """
+    Configurar el logger de una ejecución y asociarle el contexto actual.
+
+    Args:
+        adw_id: ID del workflow ADW
+        agent_name: Nombre del agente o script
+        log_file: Ruta del execution.log de la ejecución
+
+    Returns:
+        logging.Logger: Logger cuyos registros llevan siempre este adw_id
+    """
+    router = _ensure_listener()
+    router.register(adw_id, log_file)
+    set_run_context(adw_id)
+
+    logger = logging.getLogger(f"{ROOT_LOGGER}.{agent_name}.{adw_id}")
+    logger.setLevel(logging.INFO)
+    # Fijar el adw_id aunque el registro se emita desde un hilo sin contexto
+    logger.filters.clear()
+    logger.addFilter(ContextFilter(adw_id))
+    return logger
+
+
+def shutdown() -> None:
+    """Vaciar la cola y cerrar los archivos de log."""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        if _router is not None:
+            _router.close()
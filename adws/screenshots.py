@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Optimización y almacenamiento direccionado por contenido de los screenshots de revisión.
+
+Antes de commitear los screenshots de una ejecución:
+
+1. Cada PNG se recomprime sin pérdida. Con Pillow instalado se usa su optimizador
+   (y se reduce opcionalmente a ADW_SCREENSHOT_MAX_WIDTH píxeles de ancho); sin
+   Pillow se recomprimen los datos IDAT con zlib al nivel máximo y se descartan
+   los chunks de metadatos (tEXt, tIME, ...), así dos capturas con los mismos
+   píxeles normalmente quedan idénticas byte a byte.
+2. El resultado se guarda en .github/adw-screenshots/objects/{sha256}.png: una
+   imagen que ya está en el repositorio (de esta u otra ejecución) no se vuelve a
+   agregar, solo se referencia.
+3. Un manifest por ejecución (.github/adw-screenshots/{adw_id}/manifest.json)
+   mapea cada nombre original a su objeto y registra los bytes ahorrados.
+
+Uso:
+    python adws/screenshots.py report   # ahorro posible sobre los screenshots ya commiteados
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Ubicación de los screenshots dentro del repositorio
+SCREENSHOTS_DIR = Path(".github") / "adw-screenshots"
+OBJECTS_DIRNAME = "objects"
+MANIFEST_NAME = "manifest.json"
+
+# Configuración
+OPTIMIZE_ENABLED = os.getenv("ADW_SCREENSHOT_OPTIMIZE", "true").lower() in ("1", "true", "yes")
+# Ancho máximo en píxeles (0 = conservar el tamaño original; requiere Pillow)
+MAX_WIDTH = int(os.getenv("ADW_SCREENSHOT_MAX_WIDTH") or "0")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Chunks que afectan cómo se ve la imagen; el resto (texto, fechas) se descarta
+RENDER_CHUNKS = {b"IHDR", b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT", b"pHYs"}
+
+# Chunks de PNG animado: esas imágenes se dejan intactas
+ANIMATION_CHUNKS = {b"acTL", b"fcTL", b"fdAT"}
+
+
+def _iter_chunks(data: bytes) -> Iterator[Tuple[bytes, bytes]]:
+    """Recorrer los chunks (tipo, datos) de un PNG; ValueError si está dañado."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG file")
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[offset:offset + 8])
+        end = offset + 12 + length
+        if end > len(data):
+            raise ValueError("Truncated PNG chunk")
+        yield chunk_type, data[offset + 8:offset + 8 + length]
+        offset = end
+        if chunk_type == b"IEND":
+            return
+    raise ValueError("PNG without IEND chunk")
+
+
+def _chunk(chunk_type: bytes, body: bytes) -> bytes:
+    """Serializar un chunk PNG con su CRC."""
+    crc = zlib.crc32(chunk_type + body) & 0xFFFFFFFF
+    return struct.pack(">I", len(body)) + chunk_type + body + struct.pack(">I", crc)
+
+
+def recompress_png(data: bytes) -> bytes:
+    """
+    Recomprimir un PNG sin pérdida usando solo zlib.
+
+    Conserva los datos de píxeles y los chunks que afectan el render, y
+    descarta los metadatos. Si el PNG tiene chunks críticos desconocidos o es
+    animado se retorna sin cambios.
+
+    Args:
+        data: Bytes del PNG
+
+    Returns:
+        bytes: El PNG recomprimido, o el original si no se pudo achicar
+    """
+    header: List[bytes] = []
+    idat: List[bytes] = []
+    for chunk_type, body in _iter_chunks(data):
+        if chunk_type in ANIMATION_CHUNKS:
+            return data
+        if chunk_type == b"IDAT":
+            idat.append(body)
+        elif chunk_type in RENDER_CHUNKS:
+            header.append(_chunk(chunk_type, body))
+        elif chunk_type != b"IEND" and chunk_type[:1].isupper():
+            # Chunk crítico desconocido: no es seguro reescribir la imagen
+            return data
+
+    raw = zlib.decompress(b"".join(idat))
+    compressed = zlib.compress(raw, 9)
+    result = PNG_SIGNATURE + b"".join(header) + _chunk(b"IDAT", compressed) + _chunk(b"IEND", b"")
+    return result if len(result) <= len(data) else data
+
+
+def _optimize_with_pillow(data: bytes, max_width: int) -> bytes:
+    """Optimizar (y reducir si max_width lo pide) con Pillow."""
+    with Image.open(BytesIO(data)) as image:
+        resized = bool(max_width) and image.width > max_width
+        if resized:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.LANCZOS)
+        output = BytesIO()
+        image.save(output, format="PNG", optimize=True)
+    optimized = output.getvalue()
+    # Sin reducir, quedarse con el original si el optimizador no lo achica
+    return optimized if resized or len(optimized) < len(data) else data
+
+
+def optimize_image(data: bytes, max_width: int = MAX_WIDTH) -> bytes:
+    """
+    Optimizar un screenshot PNG.
+
+    Args:
+        data: Bytes del PNG original
+        max_width: Ancho máximo en píxeles (0 para no reducir; se ignora sin Pillow)
+
+    Returns:
+        bytes: PNG optimizado (nunca más grande que el original salvo que se reduzca)
+    """
+    if not OPTIMIZE_ENABLED:
+        return data
+    try:
+        if Image is not None:
+            return _optimize_with_pillow(data, max_width)
+        return recompress_png(data)
+    except (ValueError, OSError, zlib.error) as e:
+        print(f"Could not optimize screenshot, storing it as is: {e}")
+        return data
+
+
+def object_path(digest: str) -> Path:
+    """Ruta relativa al repositorio del objeto de un hash."""
+    return SCREENSHOTS_DIR / OBJECTS_DIRNAME / f"{digest}.png"
+
+
+def store_screenshots(
+    source_dir: Path,
+    repo_root: Path,
+    adw_id: str,
+    max_width: int = MAX_WIDTH
+) -> Optional[Dict[str, Any]]:
+    """
+    Optimizar los PNG de source_dir y guardarlos direccionados por contenido.
+
+    Args:
+        source_dir: Directorio con los screenshots de la revisión
+        repo_root: Raíz del checkout donde se commitean (proyecto o worktree)
+        adw_id: ID del workflow ADW
+        max_width: Ancho máximo en píxeles (0 para no reducir)
+
+    Returns:
+        dict: Manifest de la ejecución (screenshots, bytes originales, bytes
+        nuevos agregados al repositorio y bytes ahorrados), o None si no hay PNGs
+    """
+    files = sorted(source_dir.glob("*.png"))
+    if not files:
+        return None
+
+    entries: List[Dict[str, Any]] = []
+    new_objects: List[str] = []
+    original_bytes = new_bytes = 0
+    for source in files:
+        data = source.read_bytes()
+        optimized = optimize_image(data, max_width)
+        digest = hashlib.sha256(optimized).hexdigest()
+        relative = object_path(digest)
+        destination = repo_root / relative
+
+        reused = destination.exists() or relative.as_posix() in new_objects
+        if not reused:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            partial = destination.with_name(destination.name + ".partial")
+            partial.write_bytes(optimized)
+            os.replace(partial, destination)
+            new_objects.append(relative.as_posix())
+            new_bytes += len(optimized)
+
+        original_bytes += len(data)
+        entries.append({
+            "name": source.name,
+            "path": relative.as_posix(),
+            "sha256": digest,
+            "original_bytes": len(data),
+            "stored_bytes": len(optimized),
+            "reused": reused,
+        })
+
+    manifest = {
+        "adw_id": adw_id,
+        "screenshots": entries,
+        "new_objects": new_objects,
+        "original_bytes": original_bytes,
+        "new_bytes": new_bytes,
+        "saved_bytes": original_bytes - new_bytes,
+    }
+    manifest_file = repo_root / manifest_path(adw_id)
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def manifest_path(adw_id: str) -> Path:
+    """Ruta relativa al repositorio del manifest de una ejecución."""
+    return SCREENSHOTS_DIR / adw_id / MANIFEST_NAME
+
+
+def load_manifest(repo_root: Path, adw_id: str) -> Optional[Dict[str, Any]]:
+    """Leer el manifest de screenshots de una ejecución, si existe."""
+    try:
+        with open(repo_root / manifest_path(adw_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def screenshot_captions(repo_root: Path, adw_id: str, screenshot_paths: List[str]) -> Optional[List[str]]:
+    """
+    Nombres originales de los screenshots, alineados con screenshot_paths.
+
+    Los objetos se nombran por hash, así que el caption del comentario del PR
+    sale del manifest. Retorna None si el manifest no corresponde a esas rutas.
+    """
+    manifest = load_manifest(repo_root, adw_id)
+    if not manifest:
+        return None
+    entries = manifest.get("screenshots", [])
+    if [entry["path"] for entry in entries] != list(screenshot_paths):
+        return None
+    return [entry["name"] for entry in entries]
+
+
+def report(repo_root: Path) -> Dict[str, Any]:
+    """
+    Calcular cuánto ocuparían los screenshots ya commiteados si estuvieran
+    optimizados y deduplicados.
+
+    Returns:
+        dict: Archivos, objetos únicos, bytes actuales y bytes resultantes
+    """
+    base = repo_root / SCREENSHOTS_DIR
+    files = [path for path in sorted(base.glob("*/*.png")) if path.parent.name != OBJECTS_DIRNAME]
+    unique: Dict[str, int] = {}
+    total = 0
+    for path in files:
+        data = path.read_bytes()
+        total += len(data)
+        optimized = optimize_image(data)
+        unique[hashlib.sha256(optimized).hexdigest()] = len(optimized)
+    stored = sum(unique.values())
+    return {
+        "files": len(files),
+        "unique_objects": len(unique),
+        "current_bytes": total,
+        "deduplicated_bytes": stored,
+        "saved_bytes": total - stored,
+        "optimizer": "pillow" if Image is not None else "zlib",
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "report":
+        print(json.dumps(report(Path(__file__).resolve().parent.parent), indent=2))
+    else:
+        print("Usage: python adws/screenshots.py report")
+        sys.exit(1)
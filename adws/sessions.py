@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Continuidad de sesiones de Claude Code entre fases de un flujo ADW.
+
+Por defecto cada comando slash arranca un proceso `claude -p` en frío que vuelve a
+explorar el repositorio. En modo sesión (ADW_SESSION_MODE=resume) las fases que
+comparten contexto se encadenan reanudando el session_id de la fase anterior de la
+misma cadena con `--resume`.
+
+Cada llamada registra tiempo de pared y tokens de entrada en
+agents/{adw_id}/session_metrics.jsonl, tanto en frío como reanudada, para poder
+comparar ambos modos.
+
+Uso:
+    python adws/sessions.py report
+"""
+
+import json
+import os
+import sys
+import threading
+from typing import Optional, Dict, Any, List
+
+from utils import get_run_root, get_project_root
+
+# Modo de sesión: "off" (una sesión nueva por fase) o "resume" (encadenar fases)
+SESSION_MODE = os.getenv("ADW_SESSION_MODE", "off").lower()
+
+# Política de encadenamiento: comando slash -> cadena de sesión.
+# Las fases de la misma cadena reanudan la sesión de la anterior. El reviewer
+# queda fuera de la cadena de build a propósito para revisar con contexto limpio,
+# y la clasificación y el nombre de rama son llamadas baratas sin contexto útil.
+SESSION_CHAINS: Dict[str, str] = {
+    "/feature": "build",
+    "/bug": "build",
+    "/chore": "build",
+    "/implement": "build",
+    "/review": "review",
+    "/document": "review",
+    "/commit": "ship",
+    "/pull_request": "ship",
+}
+
+_lock = threading.Lock()
+
+
+def session_chain(slash_command: str) -> Optional[str]:
+    """Obtener la cadena de sesión de un comando slash, o None si no se encadena."""
+    if SESSION_MODE != "resume":
+        return None
+    return SESSION_CHAINS.get(slash_command)
+
+
+class SessionStore:
+    """Último session_id por cadena para un adw_id, persistido en agents/{adw_id}/sessions.json."""
+
+    def __init__(self, adw_id: str):
+        self.path = get_run_root(adw_id) / "agents" / adw_id / "sessions.json"
+
+    def _load(self) -> Dict[str, str]:
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, chain: str) -> Optional[str]:
+        """Obtener el session_id a reanudar para una cadena."""
+        with _lock:
+            return self._load().get(chain)
+
+    def set(self, chain: str, session_id: str) -> None:
+        """Guardar el session_id más reciente de una cadena."""
+        with _lock:
+            sessions = self._load()
+            sessions[chain] = session_id
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(sessions, f, indent=2)
+
+
+def record_session_call(
+    adw_id: str,
+    slash_command: str,
+    model: str,
+    resumed: bool,
+    wall_ms: int,
+    result_message: Optional[Dict[str, Any]]
+) -> None:
+    """
+    Registrar el costo de una llamada al agente para comparar modos de sesión.
+
+    Args:
+        adw_id: ID del workflow ADW
+        slash_command: Comando slash ejecutado
+        model: Modelo usado
+        resumed: True si la llamada reanudó una sesión previa
+        wall_ms: Tiempo de pared de la llamada en milisegundos
+        result_message: Mensaje de resultado stream-json (None si no llegó)
+    """
+    usage = (result_message or {}).get("usage") or {}
+    record = {
+        "slash_command": slash_command,
+        "model": model,
+        "mode": SESSION_MODE,
+        "resumed": resumed,
+        "wall_ms": wall_ms,
+        "input_tokens": usage.get("input_tokens", 0),
+        "cache_read_input_tokens": usage.get("cache_read_input_tokens", 0),
+        "cache_creation_input_tokens": usage.get("cache_creation_input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+    }
+
+    metrics_file = get_run_root(adw_id) / "agents" / adw_id / "session_metrics.jsonl"
+    metrics_file.parent.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        with open(metrics_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _total_input(record: Dict[str, Any]) -> int:
+    """Tokens de entrada totales, incluyendo lecturas y escrituras de caché."""
+    return (
+        record.get("input_tokens", 0)
+        + record.get("cache_read_input_tokens", 0)
+        + record.get("cache_creation_input_tokens", 0)
+    )
+
+
+def summarize_session_metrics(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Comparar llamadas en frío contra llamadas reanudadas por comando slash.
+
+    Args:
+        records: Registros de session_metrics.jsonl
+
+    Returns:
+        dict: Por comando, promedios de tiempo de pared y tokens de entrada en
+        frío y reanudados, y el ahorro promedio por llamada
+    """
+    summary: Dict[str, Dict[str, Any]] = {}
+    for command in sorted({r["slash_command"] for r in records}):
+        row: Dict[str, Any] = {}
+        for label, resumed in (("cold", False), ("resumed", True)):
+            group = [r for r in records if r["slash_command"] == command and r["resumed"] == resumed]
+            row[label] = {
+                "calls": len(group),
+                "avg_wall_ms": sum(r["wall_ms"] for r in group) / len(group) if group else None,
+                "avg_input_tokens": sum(_total_input(r) for r in group) / len(group) if group else None,
+            }
+        if row["cold"]["calls"] and row["resumed"]["calls"]:
+            row["saved_wall_ms"] = row["cold"]["avg_wall_ms"] - row["resumed"]["avg_wall_ms"]
+            row["saved_input_tokens"] = row["cold"]["avg_input_tokens"] - row["resumed"]["avg_input_tokens"]
+        summary[command] = row
+    return summary
+
+
+def load_session_metrics() -> List[Dict[str, Any]]:
+    """Leer los registros de todas las ejecuciones (raíz del proyecto y worktrees)."""
+    project_root = get_project_root()
+    files = list(project_root.glob("agents/*/session_metrics.jsonl"))
+    files += list(project_root.glob("trees/*/agents/*/session_metrics.jsonl"))
+
+    records = []
+    for metrics_file in files:
+        with open(metrics_file, "r", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def main() -> None:
+    """Imprimir la comparación frío vs reanudado de todas las ejecuciones registradas."""
+    if len(sys.argv) < 2 or sys.argv[1] != "report":
+        print("Usage: python sessions.py report")
+        sys.exit(1)
+
+    summary = summarize_session_metrics(load_session_metrics())
+    if not summary:
+        print("No session metrics recorded yet")
+        return
+
+    print(f"{'command':<16} {'cold calls':>10} {'cold ms':>10} {'cold in':>10} {'res calls':>10} {'res ms':>10} {'res in':>10}")
+    for command, row in summary.items():
+        cold, resumed = row["cold"], row["resumed"]
+        print(
+            f"{command:<16} {cold['calls']:>10} {cold['avg_wall_ms'] or 0:>10.0f} {cold['avg_input_tokens'] or 0:>10.0f} "
+            f"{resumed['calls']:>10} {resumed['avg_wall_ms'] or 0:>10.0f} {resumed['avg_input_tokens'] or 0:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
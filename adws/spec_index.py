@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Índice persistente de specs y documentación por issue y por ejecución.
+
+Los planificadores escriben la spec en specs/{tipo}-{issue}-{slug}.md y el
+documentador escribe en app_docs/{tipo}-{adw_id}-{slug}.md. En vez de buscar
+esos archivos recorriendo los directorios con un patrón (que además confunde el
+issue 3 con bug-30-..., bug-43-... o bug-53-...), las fases registran aquí cada
+archivo que escriben y las búsquedas son consultas exactas por número de issue
+o adw_id sobre una base SQLite.
+
+La primera vez que se abre el índice se cargan las specs y documentos que ya
+existen en el repositorio, así las búsquedas cubren también el historial.
+
+Uso:
+    python adws/spec_index.py show <issue_number>  # spec y docs registrados de un issue
+    python adws/spec_index.py rebuild              # volver a cargar specs/ y app_docs/
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from git_ops import git_output
+from utils import get_project_root
+
+SPEC_INDEX_DB_PATH = os.getenv("ADW_SPEC_INDEX_DB") or str(get_project_root() / "agents" / "adw_spec_index.sqlite3")
+
+SPECS_DIRNAME = "specs"
+DOCS_DIRNAME = "app_docs"
+
+# specs/{tipo}-{issue}-{slug}.md (el número puede tener ceros a la izquierda)
+SPEC_NAME_PATTERN = re.compile(r"^[a-z]+-0*(\d+)-.+\.md$")
+# app_docs/{tipo}-{adw_id}-{slug}.md
+DOC_NAME_PATTERN = re.compile(r"^[a-z]+-([a-z0-9]{7})-.+\.md$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    plan_file TEXT PRIMARY KEY,
+    issue_number INTEGER NOT NULL,
+    adw_id TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plans_issue ON plans (issue_number, updated_at);
+CREATE INDEX IF NOT EXISTS idx_plans_adw ON plans (adw_id);
+CREATE TABLE IF NOT EXISTS docs (
+    doc_file TEXT PRIMARY KEY,
+    adw_id TEXT,
+    issue_number INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_adw ON docs (adw_id);
+CREATE INDEX IF NOT EXISTS idx_docs_issue ON docs (issue_number, updated_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def spec_issue_number(path: str) -> Optional[int]:
+    """Número de issue del nombre de una spec, o None si no sigue la convención."""
+    match = SPEC_NAME_PATTERN.match(Path(path).name)
+    return int(match.group(1)) if match else None
+
+
+def doc_adw_id(path: str) -> Optional[str]:
+    """adw_id del nombre de un documento de app_docs/, o None si no lo tiene."""
+    match = DOC_NAME_PATTERN.match(Path(path).name)
+    return match.group(1) if match else None
+
+
+def _written_files(cwd: Path, dirname: str) -> List[str]:
+    """Archivos .md nuevos o modificados de un directorio del checkout (según git)."""
+    files = []
+    for line in git_output(["status", "--porcelain", "-uall", "--", dirname], cwd).splitlines():
+        path = line[3:].strip().strip('"')
+        if " -> " in path:
+            path = path.split(" -> ", 1)[1]
+        if path.endswith(".md") and (cwd / path).is_file():
+            files.append(path)
+    return files
+
+
+def written_plan(cwd: Path, issue_number: int) -> Optional[str]:
+    """
+    Spec que escribió el planificador en este checkout para el issue.
+
+    Solo considera los archivos de specs/ que git ve como nuevos o modificados
+    y exige que el número del nombre coincida exactamente con el issue.
+
+    Returns:
+        str: Ruta relativa de la spec (la más reciente si hay varias), o None
+    """
+    candidates = [path for path in _written_files(cwd, SPECS_DIRNAME) if spec_issue_number(path) == issue_number]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda path: (cwd / path).stat().st_mtime)
+
+
+def written_doc(cwd: Path, adw_id: str) -> Optional[str]:
+    """Documento de app_docs/ que escribió el documentador de esta ejecución, si hay uno."""
+    written = _written_files(cwd, DOCS_DIRNAME)
+    own = [path for path in written if doc_adw_id(path) == adw_id]
+    candidates = own or written
+    if not candidates:
+        return None
+    return max(candidates, key=lambda path: (cwd / path).stat().st_mtime)
+
+
+class SpecIndex:
+    """Índice SQLite issue/adw_id -> spec y documentación."""
+
+    def __init__(self, db_path: str = SPEC_INDEX_DB_PATH, repo_root: Optional[Path] = None):
+        """
+        Args:
+            db_path: Base SQLite del índice
+            repo_root: Checkout desde el que se cargan las specs existentes la
+                primera vez (por defecto la raíz del proyecto)
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            loaded = conn.execute("SELECT value FROM meta WHERE key = 'backfilled'").fetchone()
+        if not loaded:
+            self.rebuild(repo_root or get_project_root())
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva (una por operación, segura entre hilos)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def rebuild(self, repo_root: Path) -> Dict[str, int]:
+        """
+        Cargar las specs y documentos existentes de un checkout.
+
+        Los registros de ejecuciones (con adw_id) se conservan; los archivos
+        existentes se agregan con su fecha de modificación.
+
+        Returns:
+            dict: Cantidad de specs y documentos cargados
+        """
+        plans = docs = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for path in sorted((repo_root / SPECS_DIRNAME).glob("*.md")):
+                issue_number = spec_issue_number(path.name)
+                if issue_number is None:
+                    continue
+                conn.execute(
+                    "INSERT OR IGNORE INTO plans (plan_file, issue_number, adw_id, updated_at) VALUES (?, ?, NULL, ?)",
+                    (f"{SPECS_DIRNAME}/{path.name}", issue_number, path.stat().st_mtime)
+                )
+                plans += 1
+            for path in sorted((repo_root / DOCS_DIRNAME).glob("*.md")):
+                conn.execute(
+                    "INSERT OR IGNORE INTO docs (doc_file, adw_id, issue_number, updated_at) VALUES (?, ?, NULL, ?)",
+                    (f"{DOCS_DIRNAME}/{path.name}", doc_adw_id(path.name), path.stat().st_mtime)
+                )
+                docs += 1
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', ?)", (str(time.time()),))
+            conn.execute("COMMIT")
+        return {"plans": plans, "docs": docs}
+
+    def record_plan(self, issue_number: int, adw_id: str, plan_file: str) -> None:
+        """Registrar la spec que escribió el planificador de una ejecución."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plans (plan_file, issue_number, adw_id, updated_at) VALUES (?, ?, ?, ?)",
+                (plan_file, issue_number, adw_id, time.time())
+            )
+
+    def record_doc(self, adw_id: str, doc_file: str, issue_number: Optional[int] = None) -> None:
+        """Registrar el documento que escribió el documentador de una ejecución."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO docs (doc_file, adw_id, issue_number, updated_at) VALUES (?, ?, ?, ?)",
+                (doc_file, adw_id, issue_number, time.time())
+            )
+
+    def plan_for_issue(self, issue_number: int) -> Optional[str]:
+        """Spec más reciente de un issue (coincidencia exacta del número)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT plan_file FROM plans WHERE issue_number = ? ORDER BY updated_at DESC LIMIT 1",
+                (issue_number,)
+            ).fetchone()
+        return row["plan_file"] if row else None
+
+    def plan_for_run(self, adw_id: str) -> Optional[str]:
+        """Spec registrada por una ejecución."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT plan_file FROM plans WHERE adw_id = ? ORDER BY updated_at DESC LIMIT 1",
+                (adw_id,)
+            ).fetchone()
+        return row["plan_file"] if row else None
+
+    def doc_for_run(self, adw_id: str) -> Optional[str]:
+        """Documento registrado por una ejecución."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT doc_file FROM docs WHERE adw_id = ? ORDER BY updated_at DESC LIMIT 1",
+                (adw_id,)
+            ).fetchone()
+        return row["doc_file"] if row else None
+
+    def entries_for_issue(self, issue_number: int) -> Dict[str, Any]:
+        """Specs y documentos registrados de un issue, del más reciente al más viejo."""
+        with self._connect() as conn:
+            plans = conn.execute(
+                "SELECT plan_file, adw_id, updated_at FROM plans WHERE issue_number = ? ORDER BY updated_at DESC",
+                (issue_number,)
+            ).fetchall()
+            docs = conn.execute(
+                "SELECT doc_file, adw_id, updated_at FROM docs WHERE issue_number = ? ORDER BY updated_at DESC",
+                (issue_number,)
+            ).fetchall()
+        return {"plans": [dict(row) for row in plans], "docs": [dict(row) for row in docs]}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "show" and sys.argv[2].isdigit():
+        print(json.dumps(SpecIndex().entries_for_issue(int(sys.argv[2])), indent=2))
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        print(json.dumps(SpecIndex().rebuild(get_project_root()), indent=2))
+    else:
+        print("Usage: python adws/spec_index.py show <issue_number> | rebuild")
+        sys.exit(1)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Almacenamiento indexado (y opcionalmente comprimido) de transcripciones de Claude Code.
+
+Cada llamada a un agente deja un único archivo JSONL (raw_output.jsonl, o
+raw_output.jsonl.gz / raw_output.jsonl.zst si hay compresión) y un índice compacto
+raw_output.jsonl.idx con una línea por mensaje:
+
+    offset<TAB>length<TAB>type<TAB>tools<TAB>timestamp
+
+Los offsets son posiciones en bytes sobre el stream sin comprimir. El lector usa el
+índice para saltar directo al mensaje de resultado o recorrer las llamadas a
+herramientas sin decodificar el resto; la vista de arreglo JSON se exporta bajo
+demanda en lugar de escribirse en cada ejecución.
+
+Uso:
+    python adws/transcript.py export <raw_output.jsonl> [output.json]
+    python adws/transcript.py result <raw_output.jsonl>
+    python adws/transcript.py tools <raw_output.jsonl>
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Optional, Dict, Any, List, Iterator, NamedTuple, IO
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional
+    zstandard = None
+
+# Compresión de las transcripciones: none, gzip o zstd
+COMPRESSION = os.getenv("ADW_TRANSCRIPT_COMPRESSION", "none").lower()
+
+INDEX_SUFFIX = ".idx"
+INDEX_HEADER = "#adw-transcript v1"
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class IndexEntry(NamedTuple):
+    """Entrada del índice de una transcripción."""
+
+    offset: int
+    length: int
+    type: str
+    tools: List[str]
+    timestamp: float
+
+
+def _tool_names(message: Dict[str, Any]) -> List[str]:
+    """Extraer los nombres de herramientas usadas en un mensaje del asistente."""
+    content = message.get("message", {}).get("content")
+    if not isinstance(content, list):
+        return []
+    return [
+        block.get("name", "")
+        for block in content
+        if isinstance(block, dict) and block.get("type") == "tool_use"
+    ]
+
+
+def _format_entry(entry: IndexEntry) -> str:
+    """Serializar una entrada del índice como línea TSV."""
+    return f"{entry.offset}\t{entry.length}\t{entry.type}\t{','.join(entry.tools)}\t{entry.timestamp:.3f}\n"
+
+
+def _parse_entry(line: str) -> IndexEntry:
+    """Parsear una línea TSV del índice."""
+    offset, length, msg_type, tools, timestamp = line.rstrip("\n").split("\t")
+    return IndexEntry(int(offset), int(length), msg_type, tools.split(",") if tools else [], float(timestamp))
+
+
+def resolve_transcript_path(path: str) -> str:
+    """
+    Encontrar el archivo de datos real de una transcripción.
+
+    Args:
+        path: Ruta lógica de la transcripción (ej., raw_output.jsonl)
+
+    Returns:
+        str: Ruta existente (con sufijo de compresión si corresponde)
+
+    Raises:
+        FileNotFoundError: Si no existe ninguna variante
+    """
+    for suffix in ("", ".gz", ".zst"):
+        if os.path.exists(path + suffix):
+            return path + suffix
+    raise FileNotFoundError(f"Transcript not found: {path}")
+
+
+def _logical_path(data_path: str) -> str:
+    """Quitar el sufijo de compresión de la ruta de datos."""
+    for suffix in (".gz", ".zst"):
+        if data_path.endswith(suffix):
+            return data_path[:-len(suffix)]
+    return data_path
+
+
+def _open_data(data_path: str, mode: str) -> IO[bytes]:
+    """Abrir el stream binario de datos según su compresión."""
+    if data_path.endswith(".gz"):
+        return gzip.open(data_path, mode)
+    if data_path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; cannot read .zst transcripts")
+        raw = open(data_path, mode)
+        if "w" in mode:
+            return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return open(data_path, mode)
+
+
+class TranscriptWriter:
+    """Escritor incremental de transcripciones con índice de offsets."""
+
+    def __init__(self, path: str, compression: str = COMPRESSION):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown transcript compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            print("zstandard is not installed, falling back to gzip", file=sys.stderr)
+            compression = "gzip"
+
+        self.path = path
+        self.data_path = path + COMPRESSION_SUFFIXES[compression]
+        self.index_path = path + INDEX_SUFFIX
+        self._offset = 0
+
+        # Eliminar variantes de una ejecución anterior para no dejar datos obsoletos
+        for suffix in COMPRESSION_SUFFIXES.values():
+            stale = path + suffix
+            if stale != self.data_path and os.path.exists(stale):
+                os.remove(stale)
+
+        self._data = _open_data(self.data_path, "wb")
+        self._index = open(self.index_path, "w", encoding="utf-8")
+        self._index.write(f"{INDEX_HEADER} compression={compression}\n")
+
+    def write_line(self, line: str, message: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Agregar una línea cruda de stream-json a la transcripción.
+
+        Args:
+            line: Línea tal como la emitió el CLI
+            message: Mensaje ya decodificado (None si la línea no es JSON válido)
+        """
+        if not line.endswith("\n"):
+            line += "\n"
+        data = line.encode("utf-8")
+        self._data.write(data)
+
+        if message is not None:
+            entry = IndexEntry(
+                offset=self._offset,
+                length=len(data),
+                type=str(message.get("type", "")),
+                tools=_tool_names(message),
+                timestamp=time.time()
+            )
+            self._index.write(_format_entry(entry))
+
+        self._offset += len(data)
+
+    def close(self) -> None:
+        """Cerrar los archivos de datos e índice."""
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self) -> "TranscriptWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TranscriptReader:
+    """Lector de transcripciones que usa el índice para acceder a mensajes puntuales."""
+
+    def __init__(self, path: str):
+        self.data_path = resolve_transcript_path(path)
+        self.index_path = _logical_path(self.data_path) + INDEX_SUFFIX
+        self._entries: Optional[List[IndexEntry]] = None
+
+    def entries(self) -> List[IndexEntry]:
+        """Cargar el índice (reconstruyéndolo si falta, ej. en transcripciones antiguas)."""
+        if self._entries is None:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._entries = [_parse_entry(line) for line in f if line.strip() and not line.startswith("#")]
+            else:
+                self._entries = list(self._scan_entries())
+        return self._entries
+
+    def _scan_entries(self) -> Iterator[IndexEntry]:
+        """Construir las entradas del índice recorriendo el archivo de datos."""
+        offset = 0
+        with _open_data(self.data_path, "rb") as stream:
+            for raw in _iter_lines(stream):
+                try:
+                    message = json.loads(raw) if raw.strip() else None
+                except json.JSONDecodeError:
+                    message = None
+                if message is not None:
+                    yield IndexEntry(offset, len(raw), str(message.get("type", "")), _tool_names(message), 0.0)
+                offset += len(raw)
+
+    def _read_entries(self, entries: List[IndexEntry]) -> Iterator[Dict[str, Any]]:
+        """Decodificar los mensajes de las entradas dadas con una sola pasada hacia adelante."""
+        with _open_data(self.data_path, "rb") as stream:
+            position = 0
+            for entry in sorted(entries, key=lambda e: e.offset):
+                if self.data_path.endswith(".zst"):
+                    # El lector zstd solo avanza: descartar bytes hasta el offset
+                    while position < entry.offset:
+                        skipped = stream.read(min(entry.offset - position, 1 << 16))
+                        if not skipped:
+                            return
+                        position += len(skipped)
+                else:
+                    stream.seek(entry.offset)
+                data = stream.read(entry.length)
+                position = entry.offset + len(data)
+                yield json.loads(data)
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Obtener el mensaje de resultado (el último de tipo result) sin leer el resto."""
+        results = [entry for entry in self.entries() if entry.type == "result"]
+        if not results:
+            return None
+        return next(self._read_entries([results[-1]]), None)
+
+    def iter_messages(self) -> Iterator[Dict[str, Any]]:
+        """Iterar todos los mensajes en orden, de a uno."""
+        with _open_data(self.data_path, "rb") as stream:
+            for raw in _iter_lines(stream):
+                if not raw.strip():
+                    continue
+                try:
+                    yield json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+
+    def iter_tool_calls(self) -> Iterator[Dict[str, Any]]:
+        """Iterar de forma perezosa los bloques tool_use de la transcripción."""
+        with_tools = [entry for entry in self.entries() if entry.tools]
+        for message in self._read_entries(with_tools):
+            for block in message.get("message", {}).get("content", []):
+                if isinstance(block, dict) and block.get("type") == "tool_use":
+                    yield block
+
+    def read_text(self) -> str:
+        """Leer la transcripción completa como texto (solo para diagnósticos)."""
+        with _open_data(self.data_path, "rb") as stream:
+            return stream.read().decode("utf-8", errors="replace")
+
+    def export_json(self, json_path: Optional[str] = None) -> str:
+        """
+        Exportar la transcripción como arreglo JSON (formato de json.dump con indent=2).
+
+        Args:
+            json_path: Ruta destino (por defecto: misma ruta con extensión .json)
+
+        Returns:
+            str: Ruta al archivo JSON creado
+        """
+        if json_path is None:
+            json_path = _logical_path(self.data_path).replace(".jsonl", ".json")
+
+        with open(json_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            first = True
+            for message in self.iter_messages():
+                f.write("\n" if first else ",\n")
+                f.write("  " + json.dumps(message, indent=2).replace("\n", "\n  "))
+                first = False
+            f.write("]" if first else "\n]")
+
+        return json_path
+
+
+def _iter_lines(stream: IO[bytes]) -> Iterator[bytes]:
+    """Iterar todas las líneas de un stream binario, incluido el salto de línea."""
+    buffer = b""
+    while True:
+        chunk = stream.read(1 << 16)
+        if not chunk:
+            break
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if buffer:
+        yield buffer
+
+
+def main() -> None:
+    """Punto de entrada de línea de comandos."""
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "result", "tools"):
+        print("Usage: python transcript.py export|result|tools <raw_output.jsonl> [output.json]")
+        sys.exit(1)
+
+    command, path = sys.argv[1], sys.argv[2]
+    reader = TranscriptReader(path)
+
+    if command == "export":
+        json_path = reader.export_json(sys.argv[3] if len(sys.argv) > 3 else None)
+        print(f"Created JSON file: {json_path}")
+    elif command == "result":
+        print(json.dumps(reader.result(), indent=2))
+    else:
+        for block in reader.iter_tool_calls():
+            print(f"{block.get('name')}: {json.dumps(block.get('input'))[:200]}")
+
+
+if __name__ == "__main__":
+    main()
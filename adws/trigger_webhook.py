@@ -1,6 +1,6 @@
 #!/usr/bin/env -S uv run
 # /// script
-# dependencies = ["fastapi", "uvicorn", "python-dotenv"]
+# dependencies = ["fastapi", "uvicorn", "python-dotenv", "requests"]
 # ///
 
 """
@@ -16,14 +16,27 @@ Requisitos de Entorno:
 - PORT: Puerto del servidor (por defecto: 8001)
 - GITHUB_REPO_URL: URL del repositorio de GitHub
 - ANTHROPIC_API_KEY: Clave API de Claude
-- GITHUB_WEBHOOK_SECRET: (opcional) Secreto para validar webhooks
+- GITHUB_WEBHOOK_SECRET: (opcional) Secreto para validar webhooks; también es el token
+  (Authorization: Bearer) de POST /cancel/{adw_id}, que sin secreto solo acepta
+  requests desde localhost
+- ADW_MAX_WORKERS: (opcional) Cantidad de workflows en paralelo (por defecto: 2; 0 para
+  solo encolar y ejecutar los trabajos con nodos adw_worker.py)
+- ADW_QUEUE_DB: (opcional) Ruta de la base SQLite de la cola de trabajos (compartida con
+  los nodos adw_worker.py)
+- ADW_REPOS_CONFIG: (opcional) JSON con los repositorios a atender; los webhooks
+  se enrutan por repository.full_name (ver repos.py)
 """
 
+import hmac
+import ipaddress
 import os
-import subprocess
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any, Dict, Optional
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 import uvicorn
 
@@ -34,14 +47,58 @@ from utils import make_adw_id
 # Cargar variables de entorno
 load_dotenv()
 
+from job_queue import (
+    JobQueue,
+    QUEUE_DB_PATH,
+    SUBMIT_ACCEPTED,
+    SUBMIT_DUPLICATE,
+    SUBMIT_COALESCED,
+    JOB_PENDING,
+    JOB_RUNNING
+)
+from worktree import USE_WORKTREES
+from metrics import MetricsAggregator
+from retention import RETENTION_ENABLED
+from repos import RepoRouter
+
 # Configuración
 PORT = int(os.getenv("PORT", "8001"))
 WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
 
+# Cola persistente de trabajos, compartida por todos los repositorios
+job_queue = JobQueue(QUEUE_DB_PATH)
+
+# Agregador incremental de los eventos de métricas escritos por los workflows
+metrics = MetricsAggregator()
+
+
+def _run_is_active(adw_id: str) -> bool:
+    """Indicar si un adw_id tiene un trabajo pendiente o en ejecución."""
+    job = job_queue.get_job(adw_id)
+    return job is not None and job["state"] in (JOB_PENDING, JOB_RUNNING)
+
+
+# Por repositorio: pool de workers que drena sus trabajos, sender del outbox que
+# entrega comentarios pendientes de workflows terminados y retención de artefactos
+router = RepoRouter(job_queue, is_active=_run_is_active)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arrancar los pools de workers, los outbox y la retención junto con el servidor y detenerlos al salir."""
+    for runtime in router.all():
+        runtime.start(retention=RETENTION_ENABLED)
+    yield
+    for runtime in router.all():
+        runtime.stop()
+    metrics.save()
+
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title="ADW Webhook Trigger",
-    description="GitHub webhook endpoint for AI Development Workflow automation"
+    description="GitHub webhook endpoint for AI Development Workflow automation",
+    lifespan=lifespan
 )
 
 print(f"Starting ADW Webhook Trigger on port {PORT}")
@@ -55,20 +112,24 @@ async def root():
         "status": "running",
         "endpoints": {
             "webhook": "POST /gh-webhook",
-            "health": "GET /health"
+            "health": "GET /health",
+            "queue": "GET /queue",
+            "metrics": "GET /metrics",
+            "runs": "GET /runs",
+            "cancel": "POST /cancel/{adw_id}"
         }
     }
 
 
 @app.get("/health")
-async def health():
+def health():
     """Endpoint de verificación de salud."""
     try:
         # Verificar que el entorno esté configurado
         missing_vars = []
         if not os.getenv("ANTHROPIC_API_KEY"):
             missing_vars.append("ANTHROPIC_API_KEY")
-        if not os.getenv("GITHUB_REPO_URL"):
+        if not router.multi_repo and not os.getenv("GITHUB_REPO_URL"):
             missing_vars.append("GITHUB_REPO_URL")
 
         if missing_vars:
@@ -84,9 +145,12 @@ async def health():
             "port": PORT,
             "configured": {
                 "anthropic_api": bool(os.getenv("ANTHROPIC_API_KEY")),
-                "github_repo": bool(os.getenv("GITHUB_REPO_URL")),
+                "github_repo": router.multi_repo or bool(os.getenv("GITHUB_REPO_URL")),
                 "webhook_secret": bool(WEBHOOK_SECRET)
-            }
+            },
+            "repos": [runtime.config.full_name for runtime in router.all()],
+            "queue": job_queue.stats(),
+            "outbox_pending": sum(runtime.outbox.pending_count() for runtime in router.all())
         }
 
     except Exception as e:
@@ -97,13 +161,287 @@ async def health():
         }
 
 
+@app.get("/queue")
+def queue_status():
+    """Estado de la cola de trabajos y de los pools de workers."""
+    runtimes = router.all()
+    status = {
+        "max_workers": sum(runtime.pool.max_workers for runtime in runtimes),
+        "active": [adw_id for runtime in runtimes for adw_id in runtime.pool.active_jobs()],
+        "stats": job_queue.stats(),
+        "recent": job_queue.list_jobs(limit=20)
+    }
+    if router.multi_repo:
+        status["repos"] = [runtime.status() for runtime in runtimes]
+    return status
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Métricas en formato de exposición de texto de Prometheus."""
+    runtimes = router.all()
+    stats = job_queue.stats()
+    archived = [runtime.retention.stats() for runtime in runtimes]
+    gauges = {
+        "adw_queue_depth": ("Jobs waiting in the queue.", stats["depth"]),
+        "adw_queue_running": ("Jobs currently running.", stats["running"]),
+        "adw_jobs_finished": ("Jobs finished (done or failed).", stats["finished"]),
+        "adw_jobs_failed": ("Jobs that finished with a non-zero exit code.", stats["failed"]),
+        "adw_jobs_cancelled": ("Jobs cancelled or superseded.", stats["cancelled"]),
+        "adw_worker_pool_size": (
+            "Configured worker pool size.", sum(runtime.pool.max_workers for runtime in runtimes)
+        ),
+        "adw_outbox_pending": (
+            "GitHub writes waiting in the outbox.", sum(runtime.outbox.pending_count() for runtime in runtimes)
+        ),
+        "adw_runs_archived": ("Finished runs compressed into agents/archive.", sum(a["archived"] for a in archived)),
+        "adw_archive_bytes": ("Total size of the run archives in bytes.", sum(a["archive_bytes"] for a in archived)),
+    }
+    if router.multi_repo:
+        # Las mismas métricas de la cola por repositorio
+        repo_stats = [
+            ({"repo": runtime.config.full_name}, job_queue.stats(runtime.key), runtime) for runtime in runtimes
+        ]
+        gauges.update({
+            "adw_repo_queue_depth": ("Jobs waiting in the queue by repository.", [
+                (labels, repo["depth"]) for labels, repo, _ in repo_stats
+            ]),
+            "adw_repo_queue_running": ("Jobs currently running by repository.", [
+                (labels, repo["running"]) for labels, repo, _ in repo_stats
+            ]),
+            "adw_repo_jobs_failed": ("Jobs that finished with a non-zero exit code by repository.", [
+                (labels, repo["failed"]) for labels, repo, _ in repo_stats
+            ]),
+            "adw_repo_worker_pool_size": ("Configured worker pool size by repository.", [
+                (labels, runtime.pool.max_workers) for labels, _, runtime in repo_stats
+            ]),
+        })
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/runs")
+def runs_status():
+    """Resúmenes de las ejecuciones terminadas y estado de la retención de artefactos."""
+    if router.multi_repo:
+        return {
+            "repos": {
+                runtime.config.full_name: {
+                    "retention": runtime.retention.stats(),
+                    "recent": runtime.retention.summaries(limit=20)
+                }
+                for runtime in router.all()
+            }
+        }
+    retention = router.all()[0].retention
+    return {
+        "retention": retention.stats(),
+        "recent": retention.summaries(limit=20)
+    }
+
+
+def _authorize_control(request: Request) -> None:
+    """
+    Autorizar un endpoint de control del servidor.
+
+    Con GITHUB_WEBHOOK_SECRET configurado se exige como token Bearer; sin secreto
+    solo se aceptan requests desde localhost.
+
+    Raises:
+        HTTPException: 401 si el token no coincide, 403 si el cliente no es local
+    """
+    if WEBHOOK_SECRET:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), WEBHOOK_SECRET):
+            raise HTTPException(status_code=401, detail="Invalid or missing token")
+        return
+    host = request.client.host if request.client else ""
+    try:
+        local = ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        local = host == "localhost"
+    if not local:
+        raise HTTPException(status_code=403, detail="Cancel is only allowed from localhost without GITHUB_WEBHOOK_SECRET")
+
+
+@app.post("/cancel/{adw_id}")
+def cancel_job(adw_id: str, request: Request):
+    """Cancelar un trabajo pendiente o en ejecución (requiere autorización, ver _authorize_control)."""
+    _authorize_control(request)
+    runtime = router.for_job(adw_id)
+    if runtime is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ADW ID {adw_id}")
+    if not runtime.pool.cancel(adw_id):
+        job = job_queue.get_job(adw_id)
+        return {"status": "ignored", "adw_id": adw_id, "message": f"Job is already {job['state']}"}
+    return {"status": "cancelled", "adw_id": adw_id, "message": f"ADW workflow {adw_id} cancelled"}
+
+
+def _handle_event(event_type: str, delivery_id: Optional[str], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Procesar un evento de webhook ya parseado.
+
+    Consulta y escribe la cola y restaura archivos de la retención, así que corre
+    en el threadpool para no bloquear el event loop del servidor.
+    """
+    # Extraer detalles del evento
+    action = payload.get("action", "")
+    issue = payload.get("issue", {})
+    issue_number = issue.get("number")
+    full_name = (payload.get("repository") or {}).get("full_name", "")
+
+    print(f"Received webhook: repo={full_name}, event={event_type}, action={action}, issue_number={issue_number}")
+
+    # Enrutar al pool, checkout y configuración del repositorio del evento
+    runtime = router.route(payload)
+    if runtime is None:
+        print(f"Ignoring webhook for unconfigured repository '{full_name}'")
+        return {
+            "status": "ignored",
+            "reason": f"Repository '{full_name}' is not configured"
+        }
+    repo_key, pool = runtime.key, runtime.pool
+
+    should_trigger = False
+    resume_adw_id = None
+    cancel_adw_ids = None
+    trigger_reason = ""
+    workflow_script = "adw_plan_build_review_document.py"  # Flujo completo por defecto
+
+    # Verificar si es un evento de issue abierto
+    if event_type == "issues" and action == "opened" and issue_number:
+        should_trigger = True
+        trigger_reason = "New issue opened"
+
+    # Verificar si es un comentario de issue con texto 'adw'
+    elif event_type == "issue_comment" and action == "created" and issue_number:
+        comment = payload.get("comment", {})
+        comment_body = comment.get("body", "").strip().lower()
+
+        print(f"Comment body: '{comment_body}'")
+
+        if comment_body == "adw" or comment_body == "adw review" or comment_body == "adw full" or comment_body == "adw document":
+            should_trigger = True
+            trigger_reason = f"Comment with '{comment_body}' command"
+            workflow_script = "adw_plan_build_review_document.py"
+
+        # 'adw resume [adw_id]' retoma una ejecución desde su última fase completada
+        elif comment_body == "adw resume" or comment_body.startswith("adw resume "):
+            resume_adw_id = comment_body[len("adw resume"):].strip()
+            if not resume_adw_id:
+                latest = job_queue.latest_job(issue_number, repo_key)
+                resume_adw_id = latest["adw_id"] if latest else None
+            elif router.for_job(resume_adw_id) not in (None, runtime):
+                print(f"ADW ID {resume_adw_id} belongs to another repository")
+                resume_adw_id = None
+            if resume_adw_id:
+                should_trigger = True
+                trigger_reason = f"Comment with 'adw resume' command for {resume_adw_id}"
+            else:
+                print(f"No previous run found to resume for issue #{issue_number}")
+
+        # 'adw cancel [adw_id]' detiene una ejecución (sin ID, todas las del issue)
+        elif comment_body == "adw cancel" or comment_body.startswith("adw cancel "):
+            requested = comment_body[len("adw cancel"):].strip()
+            cancel_adw_ids = [requested] if requested else [
+                job["adw_id"] for job in job_queue.active_jobs_for_issue(issue_number, repo_key)
+            ]
+
+    if cancel_adw_ids is not None:
+        cancelled = [
+            adw_id for adw_id in cancel_adw_ids
+            if router.for_job(adw_id) is runtime and pool.cancel(adw_id)
+        ]
+        print(f"Cancelled ADW IDs for issue #{issue_number}: {', '.join(cancelled) or 'none'}")
+        return {
+            "status": "cancelled" if cancelled else "ignored",
+            "issue": issue_number,
+            "adw_ids": cancelled,
+            "message": f"Cancelled {len(cancelled)} ADW workflow(s) for issue #{issue_number}"
+        }
+    elif should_trigger and resume_adw_id:
+        # Si la ejecución ya se comprimió, recuperar su journal y artefactos
+        try:
+            runtime.retention.restore(resume_adw_id)
+            print(f"Restored archived artifacts of ADW ID {resume_adw_id}")
+        except FileNotFoundError:
+            pass
+        job = job_queue.resume(
+            issue_number, resume_adw_id, workflow_script, trigger_reason, delivery_id, repo=repo_key
+        )
+        pool.notify()
+        print(f"Queued resume of ADW ID {resume_adw_id} for issue #{issue_number} (job state: {job['state']})")
+        return {
+            "status": "accepted",
+            "issue": issue_number,
+            "adw_id": resume_adw_id,
+            "workflow": workflow_script,
+            "message": f"ADW workflow {resume_adw_id} resumed for issue #{issue_number}",
+            "reason": trigger_reason,
+            "job_id": job["id"],
+            "queue_depth": job_queue.stats(repo_key)["depth"]
+        }
+    elif should_trigger:
+        # Encolar el trabajo; el pool de workers lo ejecutará con concurrencia acotada.
+        # Una redelivery o un disparo sobre un issue que ya tiene un trabajo
+        # pendiente retorna el adw_id existente en lugar de crear otro.
+        job, submit_status = job_queue.submit(
+            issue_number, make_adw_id(), workflow_script, trigger_reason, delivery_id, repo=repo_key
+        )
+        adw_id = job["adw_id"]
+        stats = job_queue.stats(repo_key)
+
+        if submit_status == SUBMIT_ACCEPTED:
+            pool.notify()
+            print(f"Queued job for issue #{issue_number} with ADW ID: {adw_id} (reason: {trigger_reason})")
+        elif submit_status == SUBMIT_DUPLICATE:
+            print(f"Duplicate delivery {delivery_id}, already handled by ADW ID: {adw_id}")
+        else:
+            print(f"Issue #{issue_number} already has a pending run, coalesced into ADW ID: {adw_id}")
+        # El disparo más reciente reemplaza a la ejecución en curso del mismo issue
+        if submit_status != SUBMIT_DUPLICATE:
+            preempted = pool.preempt(issue_number, except_adw_id=adw_id)
+            if preempted:
+                print(f"Superseded running ADW IDs for issue #{issue_number}: {', '.join(preempted)}")
+        print(f"Queue depth: {stats['depth']}, running: {stats['running']}")
+        logs_dir = f"trees/{adw_id}/agents/{adw_id}/" if USE_WORKTREES else f"agents/{adw_id}/"
+        if router.multi_repo:
+            logs_dir = f"{runtime.root.as_posix()}/{logs_dir}"
+        print(f"Logs will be written to: {logs_dir}*/execution.log")
+
+        # Retornar inmediatamente
+        messages = {
+            SUBMIT_ACCEPTED: f"ADW workflow triggered for issue #{issue_number}",
+            SUBMIT_DUPLICATE: f"Delivery already processed as ADW workflow {adw_id}",
+            SUBMIT_COALESCED: f"Issue #{issue_number} already has a pending ADW workflow {adw_id}",
+        }
+        return {
+            "status": submit_status,
+            "issue": issue_number,
+            "adw_id": adw_id,
+            "workflow": workflow_script,
+            "message": messages[submit_status],
+            "reason": trigger_reason,
+            "logs": logs_dir,
+            "job_id": job["id"],
+            "queue_depth": stats["depth"]
+        }
+    else:
+        print(f"Ignoring webhook: event={event_type}, action={action}, issue_number={issue_number}")
+        return {
+            "status": "ignored",
+            "reason": f"Not a triggering event (event={event_type}, action={action})"
+        }
+
+
 @app.post("/gh-webhook")
 async def github_webhook(request: Request):
     """Manejar eventos de webhook de GitHub."""
     try:
         # Obtener tipo de evento desde el header
         event_type = request.headers.get("X-GitHub-Event", "")
-        print(f"Received webhook request - Event type: '{event_type}'")
+        # ID único de la entrega; se repite cuando GitHub reenvía el mismo evento
+        delivery_id = request.headers.get("X-GitHub-Delivery")
+        print(f"Received webhook request - Event type: '{event_type}', delivery: {delivery_id}")
 
         # Leer el body raw para debugging
         body = await request.body()
@@ -166,79 +504,8 @@ async def github_webhook(request: Request):
                 "message": "Invalid payload format"
             }
 
-        # Extraer detalles del evento
-        action = payload.get("action", "")
-        issue = payload.get("issue", {})
-        issue_number = issue.get("number")
-
-        print(f"Received webhook: event={event_type}, action={action}, issue_number={issue_number}")
-
-        should_trigger = False
-        trigger_reason = ""
-        workflow_script = "adw_plan_build_review_document.py"  # Flujo completo por defecto
-
-        # Verificar si es un evento de issue abierto
-        if event_type == "issues" and action == "opened" and issue_number:
-            should_trigger = True
-            trigger_reason = "New issue opened"
-
-        # Verificar si es un comentario de issue con texto 'adw'
-        elif event_type == "issue_comment" and action == "created" and issue_number:
-            comment = payload.get("comment", {})
-            comment_body = comment.get("body", "").strip().lower()
-
-            print(f"Comment body: '{comment_body}'")
-
-            if comment_body == "adw" or comment_body == "adw review" or comment_body == "adw full" or comment_body == "adw document":
-                should_trigger = True
-                trigger_reason = f"Comment with '{comment_body}' command"
-                workflow_script = "adw_plan_build_review_document.py"
-
-        if should_trigger:
-            # Generar ID de ADW para este flujo de trabajo
-            adw_id = make_adw_id()
-
-            # Construir comando para ejecutar script de workflow
-            script_dir = Path(__file__).parent
-            project_root = script_dir.parent
-            workflow_path = script_dir / workflow_script
-
-            cmd = ["uv", "run", str(workflow_path), str(issue_number), adw_id]
-
-            print(f"Launching background process: {' '.join(cmd)} (reason: {trigger_reason})")
-
-            # Lanzar en segundo plano usando Popen
-            # Ejecutar desde la raíz del proyecto
-            process = subprocess.Popen(
-                cmd,
-                cwd=str(project_root),
-                env=os.environ.copy(),
-                # En Windows, esto ayuda a separar el proceso
-                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if os.name == 'nt' else 0,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-
-            print(f"Background process started for issue #{issue_number} with ADW ID: {adw_id}")
-            print(f"Logs will be written to: agents/{adw_id}/*/execution.log")
-
-            # Retornar inmediatamente
-            return {
-                "status": "accepted",
-                "issue": issue_number,
-                "adw_id": adw_id,
-                "workflow": workflow_script,
-                "message": f"ADW workflow triggered for issue #{issue_number}",
-                "reason": trigger_reason,
-                "logs": f"agents/{adw_id}/"
-            }
-        else:
-            print(f"Ignoring webhook: event={event_type}, action={action}, issue_number={issue_number}")
-            return {
-                "status": "ignored",
-                "reason": f"Not a triggering event (event={event_type}, action={action})"
-            }
+        # El procesamiento usa SQLite y el disco: fuera del event loop
+        return await run_in_threadpool(_handle_event, event_type, delivery_id, payload)
 
     except Exception as e:
         print(f"Error processing webhook: {e}")
@@ -253,6 +520,9 @@ if __name__ == "__main__":
     print(f"Starting server on http://0.0.0.0:{PORT}")
     print(f"Webhook endpoint: POST /gh-webhook")
     print(f"Health check: GET /health")
+    print(f"Queue status: GET /queue")
+    print(f"Metrics: GET /metrics")
+    print(f"Cancel: POST /cancel/{{adw_id}}")
     print(f"\nTo expose this server to GitHub:")
     print(f"  1. Use ngrok: ngrok http {PORT}")
     print(f"  2. Configure webhook in GitHub with the ngrok URL")
@@ -5,9 +5,11 @@ Funciones de utilidad para ADW (Agent Development Workflow)
 import os
 import logging
 import random
+import signal
 import string
-from datetime import datetime
+import subprocess
 from pathlib import Path
+from typing import Optional
 
 
 def make_adw_id() -> str:
@@ -22,11 +24,64 @@ def make_adw_id() -> str:
     return ''.join(random.choices(chars, k=7))
 
 
+def get_project_root() -> Path:
+    """
+    Obtener la raíz del proyecto (padre del directorio adws/).
+
+    ADW_PROJECT_ROOT la reemplaza: el servidor de webhooks la fija al lanzar un
+    workflow sobre el checkout de otro repositorio (ver repos.py).
+
+    Returns:
+        Path: Ruta absoluta de la raíz del proyecto
+    """
+    override = os.getenv("ADW_PROJECT_ROOT")
+    if override:
+        return Path(override).resolve()
+    return Path(__file__).resolve().parent.parent
+
+
+def get_worktree_path(adw_id: str, root: Optional[Path] = None) -> Path:
+    """
+    Obtener la ruta del git worktree asignado a un ADW ID: trees/{adw_id}
+
+    Args:
+        adw_id: El ID del flujo de trabajo ADW
+        root: Checkout del repositorio (por defecto la raíz del proyecto)
+
+    Returns:
+        Path: Ruta del worktree (puede no existir todavía)
+    """
+    return (root or get_project_root()) / "trees" / adw_id
+
+
+def get_run_root(adw_id: str, root: Optional[Path] = None) -> Path:
+    """
+    Obtener el directorio de trabajo de una ejecución ADW.
+
+    Si la ejecución tiene su propio worktree se usa ese directorio, de lo
+    contrario se usa la raíz del proyecto.
+
+    Args:
+        adw_id: El ID del flujo de trabajo ADW
+        root: Checkout del repositorio (por defecto la raíz del proyecto)
+
+    Returns:
+        Path: Directorio raíz de la ejecución
+    """
+    worktree_path = get_worktree_path(adw_id, root)
+    if worktree_path.exists():
+        return worktree_path
+    return root or get_project_root()
+
+
 def setup_logger(adw_id: str, agent_name: str) -> logging.Logger:
     """
     Configurar un logger para un agente ADW que escribe en:
     agents/{adw_id}/{agent_name}/execution.log
 
+    Los logs se escriben dentro del worktree de la ejecución si existe, como
+    líneas JSON, a través del listener no bloqueante de run_logging.
+
     Args:
         adw_id: El ID del flujo de trabajo ADW
         agent_name: Nombre del agente (ej., 'adw_plan_build', 'ops')
@@ -34,43 +89,54 @@ def setup_logger(adw_id: str, agent_name: str) -> logging.Logger:
     Returns:
         logging.Logger: Instancia de logger configurada
     """
-    # Determinar la raíz del proyecto (padre del directorio adws/)
-    current_file = Path(__file__).resolve()
-    project_root = current_file.parent.parent
-
-    # Crear directorio de logs
-    log_dir = project_root / "agents" / adw_id / agent_name
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    # Crear ruta del archivo de log
-    log_file = log_dir / "execution.log"
-
-    # Crear logger
-    logger_name = f"{adw_id}_{agent_name}"
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.INFO)
-
-    # Eliminar handlers existentes para evitar duplicados
-    logger.handlers.clear()
-
-    # Handler de archivo
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-
-    # Handler de consola
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-
-    # Formato
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    # Agregar handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-    return logger
+    from run_logging import setup_run_logger
+
+    # Determinar la raíz de la ejecución (worktree o raíz del proyecto)
+    run_root = get_run_root(adw_id)
+    log_file = run_root / "agents" / adw_id / agent_name / "execution.log"
+    return setup_run_logger(adw_id, agent_name, log_file)
+
+
+def new_process_group_kwargs() -> dict:
+    """
+    Argumentos de subprocess.Popen para lanzar un proceso en su propio grupo.
+
+    Permite luego terminar el proceso junto con todos sus hijos con
+    terminate_process_tree().
+    """
+    if os.name == 'nt':
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def terminate_process_tree(process: subprocess.Popen, grace: float = 10.0) -> None:
+    """
+    Terminar un proceso lanzado con new_process_group_kwargs() y todos sus hijos.
+
+    En POSIX se envía SIGTERM al grupo, se esperan `grace` segundos y luego SIGKILL
+    a lo que quede. En Windows se usa taskkill /T sobre el árbol de procesos.
+
+    Args:
+        process: Proceso líder del grupo
+        grace: Segundos de espera entre SIGTERM y SIGKILL
+    """
+    if os.name == 'nt':
+        if process.poll() is None:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        return
+
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        pass
+
+    # Eliminar hijos que hayan ignorado SIGTERM o quedado huérfanos en el grupo
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -0,0 +1,163 @@
+"""
+Aislamiento de ejecuciones ADW mediante git worktrees.
+
+Cada adw_id obtiene su propio worktree en trees/{adw_id}/, de modo que varias
+ejecuciones pueden crear ramas, escribir specs/app_docs y hacer commits en paralelo
+sin pisarse el checkout compartido de la raíz del proyecto.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from git_ops import run_git
+from utils import get_project_root, get_worktree_path
+
+# Permite desactivar los worktrees y volver al checkout compartido
+USE_WORKTREES = os.getenv("ADW_USE_WORKTREES", "true").lower() in ("1", "true", "yes")
+
+
+def create_worktree(adw_id: str, base_ref: str = "HEAD") -> Path:
+    """
+    Crear (o reutilizar) el worktree de una ejecución ADW.
+
+    El worktree se crea con HEAD desacoplado; la rama del issue se crea después
+    con checkout_branch() una vez generado su nombre. Si el checkout conserva los
+    artefactos de un worktree anterior del adw_id (remove_worktree con
+    keep_artifacts), se copian al nuevo para que el journal siga completo.
+
+    Args:
+        adw_id: ID del workflow ADW
+        base_ref: Referencia desde la que se crea el worktree (por defecto: HEAD)
+
+    Returns:
+        Path: Ruta del worktree
+
+    Raises:
+        RuntimeError: Si git no puede crear el worktree
+    """
+    worktree_path = get_worktree_path(adw_id)
+    if worktree_path.exists():
+        return worktree_path
+
+    root = get_project_root()
+    worktree_path.parent.mkdir(parents=True, exist_ok=True)
+    # Olvidar worktrees borrados a mano que todavía figuran en git
+    run_git(["worktree", "prune"], root, check=False)
+    run_git(["worktree", "add", "--detach", str(worktree_path), base_ref], root)
+
+    artifacts = root / "agents" / adw_id
+    if artifacts.is_dir():
+        # trigger/ lo escribe el worker en el checkout mientras corre el workflow
+        shutil.copytree(
+            artifacts,
+            worktree_path / "agents" / adw_id,
+            ignore=shutil.ignore_patterns("trigger"),
+            dirs_exist_ok=True
+        )
+    print(f"Created worktree for {adw_id} at {worktree_path}")
+    return worktree_path
+
+
+def _release_branch(worktree_path: Path, branch_name: str) -> None:
+    """
+    Desacoplar la rama de cualquier otro worktree que la tenga activa.
+
+    git no permite la misma rama en dos worktrees; la que queda activa en el
+    worktree de una ejecución anterior del issue (reemplazada o interrumpida)
+    se libera dejando ese worktree con HEAD desacoplado.
+    """
+    run_git(["worktree", "prune"], worktree_path, check=False)
+    listing = run_git(["worktree", "list", "--porcelain"], worktree_path).stdout
+    current = worktree_path.resolve()
+    path = None
+    for line in listing.splitlines():
+        if line.startswith("worktree "):
+            path = Path(line[len("worktree "):])
+        elif line == f"branch refs/heads/{branch_name}" and path and path.resolve() != current:
+            run_git(["checkout", "--detach"], path)
+            print(f"Detached branch {branch_name} from worktree {path}")
+
+
+def checkout_branch(worktree_path: Path, branch_name: str) -> None:
+    """
+    Crear la rama del issue dentro de un worktree y cambiar a ella.
+
+    Los nombres de rama son deterministas por issue, así que la rama puede
+    existir de una ejecución anterior (reemplazada o interrumpida): en ese caso
+    se libera del worktree que la tenga activa y se reinicia al commit actual
+    del worktree en vez de fallar.
+
+    Args:
+        worktree_path: Ruta del worktree (o la raíz del proyecto)
+        branch_name: Nombre de la rama
+
+    Raises:
+        RuntimeError: Si la rama no se puede crear
+    """
+    _release_branch(worktree_path, branch_name)
+    run_git(["checkout", "-B", branch_name], worktree_path)
+
+
+def switch_branch(worktree_path: Path, branch_name: str) -> None:
+    """
+    Cambiar a una rama existente dentro de un worktree (ej., al reanudar una ejecución).
+
+    Args:
+        worktree_path: Ruta del worktree (o la raíz del proyecto)
+        branch_name: Nombre de la rama
+
+    Raises:
+        RuntimeError: Si la rama no existe o no se puede cambiar a ella
+    """
+    _release_branch(worktree_path, branch_name)
+    run_git(["checkout", branch_name], worktree_path)
+
+
+def remove_worktree(
+    adw_id: str,
+    force: bool = False,
+    root: Optional[Path] = None,
+    keep_artifacts: bool = False
+) -> bool:
+    """
+    Eliminar el worktree de una ejecución ADW (la rama se conserva).
+
+    Los cambios sin commitear del worktree se pierden; una reanudación posterior
+    crea un worktree nuevo y vuelve a la rama del issue.
+
+    Args:
+        adw_id: ID del workflow ADW
+        force: Eliminar aunque haya cambios sin commitear
+        root: Checkout del repositorio (por defecto la raíz del proyecto)
+        keep_artifacts: Mover antes agents/{adw_id} del worktree al checkout, así
+            el journal y los logs de la ejecución siguen disponibles
+
+    Returns:
+        bool: True si se eliminó el worktree
+    """
+    root = root or get_project_root()
+    worktree_path = get_worktree_path(adw_id, root)
+    if not worktree_path.exists():
+        run_git(["worktree", "prune"], root, check=False)
+        return False
+
+    if keep_artifacts:
+        artifacts = worktree_path / "agents" / adw_id
+        if artifacts.is_dir():
+            shutil.copytree(artifacts, root / "agents" / adw_id, dirs_exist_ok=True)
+
+    args = ["worktree", "remove", str(worktree_path)]
+    if force:
+        args.append("--force")
+
+    try:
+        run_git(args, root)
+    except RuntimeError as e:
+        print(f"Failed to remove worktree {worktree_path}: {e}")
+        return False
+    run_git(["worktree", "prune"], root, check=False)
+
+    print(f"Removed worktree for {adw_id}")
+    return True